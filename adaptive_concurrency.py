@@ -0,0 +1,188 @@
+# adaptive_concurrency.py
+# Sayfalı çekimler için AIMD eşzamanlılık denetleyicisi (sabit Semaphore yerine).
+# - Yanıtlar sağlıklıysa (hata yok, gecikme en iyi gözlenenin LATENCY_TOLERANCE
+#   katını aşmıyor) limit her "tur"da bir artar: başarı başına +1/limit.
+# - 429, zaman aşımı, bağlantı hatası veya 5xx görülünce limit DECREASE_FACTOR ile
+#   çarpılır. Aynı anda düşen bir grup hatanın limiti sıfırlamaması için azaltma
+#   en fazla ortalama gecikme (en az DECREASE_COOLDOWN sn) başına bir kez yapılır.
+# - Son seçilen limit ada göre saklanır; sonraki çekim oradan başlar.
+#
+# Kullanım:
+#   limiter = AdaptiveConcurrency('orders', initial=10, maximum=32)
+#   async with limiter.slot():
+#       response = await trendyol_client.get_async(...)   # istemci sonucu kendisi bildirir
+#   async with limiter.slot() as slot:
+#       ...; slot.observe(status, elapsed)                 # başka HTTP istemcileri için
+#   limiter.summary()
+
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+LATENCY_TOLERANCE = 2.5
+LATENCY_FLOOR = 0.5  # saniye; bunun altındaki gecikme her zaman sağlıklı
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN = 1.0  # saniye
+EWMA_ALPHA = 0.2
+CONGESTION_STATUSES = {429, 500, 502, 503, 504}
+
+# Bu görevde açık olan slot; TrendyolClient sonucu buraya bildirir
+current_slot = contextvars.ContextVar('adaptive_concurrency_slot', default=None)
+
+_last_limits = {}  # ad -> son limit (süreç içi, çekimler arası)
+_active = {}  # ad -> çalışan denetleyici (metrikler için)
+_registry_lock = threading.Lock()
+
+
+class _Slot:
+    __slots__ = ('_limiter', 'observed')
+
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self.observed = False
+
+    def observe(self, status, elapsed, throttled=0):
+        """status: HTTP kodu (None = istek yanıtsız kaldı), elapsed: sn, throttled: araya giren 429 sayısı."""
+        self.observed = True
+        congested = status is None or status in CONGESTION_STATUSES or throttled > 0
+        self._limiter._record(congested, elapsed)
+
+    def failed(self):
+        """Zaman aşımı / bağlantı hatası."""
+        self.observe(None, None)
+
+
+class AdaptiveConcurrency:
+    def __init__(self, name, initial=4, minimum=1, maximum=32):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(_last_limits.get(name, initial), minimum), maximum))
+        self.peak = self.limit
+        self.increases = 0
+        self.decreases = 0
+        self.requests = 0
+        self._in_flight = 0
+        self._waiters = deque()
+        self._avg_latency = None
+        self._best_latency = None
+        self._last_decrease = 0.0
+        with _registry_lock:
+            _active[name] = self
+
+    @property
+    def level(self):
+        return max(int(self.limit), self.minimum)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Limit kadar eşzamanlı giriş; içerideki istek sonucu limiti ayarlar."""
+        while self._in_flight >= self.level:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Uyandırılıp iptal edildiyse sırayı bir sonrakine ver
+                self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self._in_flight += 1
+
+        slot = _Slot(self)
+        token = current_slot.set(slot)
+        started = time.monotonic()
+        try:
+            yield slot
+        except (asyncio.TimeoutError, OSError):
+            if not slot.observed:
+                slot.failed()
+            raise
+        else:
+            if not slot.observed:
+                slot.observe(200, time.monotonic() - started)
+        finally:
+            current_slot.reset(token)
+            self._in_flight -= 1
+            self._wake()
+
+    def _wake(self):
+        free = self.level - self._in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _healthy_latency(self):
+        if self._avg_latency is None or self._avg_latency <= LATENCY_FLOOR:
+            return True
+        return self._avg_latency <= self._best_latency * LATENCY_TOLERANCE
+
+    def _record(self, congested, elapsed):
+        self.requests += 1
+        now = time.monotonic()
+        if elapsed is not None:
+            self._avg_latency = elapsed if self._avg_latency is None else (
+                EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * self._avg_latency
+            )
+            self._best_latency = elapsed if self._best_latency is None else min(self._best_latency, elapsed)
+
+        if congested:
+            cooldown = max(DECREASE_COOLDOWN, self._avg_latency or 0)
+            if now - self._last_decrease >= cooldown and self.limit > self.minimum:
+                previous = self.level
+                self.limit = max(self.minimum, self.limit * DECREASE_FACTOR)
+                self._last_decrease = now
+                self.decreases += 1
+                logger.info(f"[{self.name}] eşzamanlılık {previous} -> {self.level} (yavaşlatma/hata)")
+        elif self._healthy_latency() and self.limit < self.maximum:
+            previous = self.level
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            if self.level > previous:
+                self.increases += 1
+                self.peak = max(self.peak, self.limit)
+                logger.debug(f"[{self.name}] eşzamanlılık {previous} -> {self.level}")
+        _last_limits[self.name] = self.limit
+        self._wake()  # limit arttıysa bekleyenler girebilir
+
+    def summary(self):
+        return {
+            'name': self.name,
+            'level': self.level,
+            'peak': int(self.peak),
+            'increases': self.increases,
+            'decreases': self.decreases,
+            'requests': self.requests,
+            'avg_latency_ms': round(self._avg_latency * 1000, 1) if self._avg_latency is not None else None,
+        }
+
+    def close(self):
+        """Çekim bitti: seçilen seviyeyi loglar, özeti döner."""
+        summary = self.summary()
+        with _registry_lock:
+            if _active.get(self.name) is self:
+                del _active[self.name]
+        logger.info(
+            f"[{self.name}] çekim bitti: son eşzamanlılık {summary['level']}, en yüksek {summary['peak']}, "
+            f"{summary['decreases']} kez geri çekildi, {summary['requests']} istek"
+        )
+        return summary
+
+
+def snapshot():
+    """Çalışan çekimlerin anlık eşzamanlılık seviyesi ve son seçilen seviyeler."""
+    with _registry_lock:
+        running = {name: limiter.summary() for name, limiter in _active.items()}
+    return {
+        'running': running,
+        'last_levels': {name: int(limit) for name, limit in _last_limits.items()},
+    }
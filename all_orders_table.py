@@ -0,0 +1,113 @@
+# all_orders_table.py
+# all_orders: beş statü tablosunun (Created, Picking, Shipped, Delivered, Cancelled)
+# birleşik kopyası. Her statü tablosundaki satır bazlı trigger INSERT/UPDATE/DELETE'i
+# all_orders'a yansıtır; senkronizasyon, taşıma ve ORM yazımları ayrıca bir şey yapmaz.
+# Listeleme ve analiz sorguları her istekte UNION ALL kurmak yerine buradan okur.
+
+import logging
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from models import AllOrder, OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled
+
+logger = logging.getLogger(__name__)
+
+STATUS_MODELS = {
+    'Created': OrderCreated,
+    'Picking': OrderPicking,
+    'Shipped': OrderShipped,
+    'Delivered': OrderDelivered,
+    'Cancelled': OrderCancelled,
+}
+
+# Kaynak tablolardan kopyalanan kolonlar (status_name hariç)
+COPY_COLUMNS = [c for c in AllOrder.__table__.columns.keys() if c != 'status_name']
+
+TRIGGER_FUNCTION = 'all_orders_sync'
+
+
+def _trigger_name(model_cls):
+    return f"trg_{model_cls.__tablename__}_all_orders"
+
+
+def _function_sql():
+    cols = ', '.join(COPY_COLUMNS)
+    new_values = ', '.join(f"NEW.{c}" for c in COPY_COLUMNS)
+    updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in COPY_COLUMNS if c != 'id')
+    return f"""
+CREATE OR REPLACE FUNCTION {TRIGGER_FUNCTION}() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM all_orders WHERE status_name = TG_ARGV[0] AND id = OLD.id;
+        RETURN OLD;
+    END IF;
+    IF TG_OP = 'UPDATE' AND NEW.id <> OLD.id THEN
+        DELETE FROM all_orders WHERE status_name = TG_ARGV[0] AND id = OLD.id;
+    END IF;
+    INSERT INTO all_orders (status_name, {cols})
+    VALUES (TG_ARGV[0], {new_values})
+    ON CONFLICT (status_name, id) DO UPDATE SET {updates};
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def ensure_all_orders_table(engine):
+    """
+    Modele sonradan eklenen kolonları tabloya ekler, trigger fonksiyonunu günceller,
+    eksik trigger'ları kurar. Kolon veya trigger yeni eklendiyse all_orders baştan
+    doldurulur (trigger'sız geçen süre / boş kalan kolonlar için). Uygulama açılışında çağrılır.
+    """
+    with engine.begin() as conn:
+        installed = _add_missing_columns(conn)
+        conn.execute(text(_function_sql()))
+
+        existing = {
+            row[0] for row in conn.execute(text(
+                "SELECT tgname FROM pg_trigger WHERE NOT tgisinternal"
+            ))
+        }
+        for status_name, model_cls in STATUS_MODELS.items():
+            trigger = _trigger_name(model_cls)
+            if trigger in existing:
+                continue
+            conn.execute(text(
+                f"CREATE TRIGGER {trigger} AFTER INSERT OR UPDATE OR DELETE ON {model_cls.__tablename__} "
+                f"FOR EACH ROW EXECUTE FUNCTION {TRIGGER_FUNCTION}('{status_name}')"
+            ))
+            installed = True
+
+        if installed:
+            rebuild_all_orders(conn)
+
+
+def _add_missing_columns(conn):
+    existing = {
+        row[0] for row in conn.execute(text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'all_orders'"
+        ))
+    }
+    added = False
+    for column in AllOrder.__table__.columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=postgresql.dialect())
+        conn.execute(text(f"ALTER TABLE all_orders ADD COLUMN IF NOT EXISTS {column.name} {column_type}"))
+        logger.info(f"all_orders.{column.name} kolonu eklendi.")
+        added = True
+    return added
+
+
+def rebuild_all_orders(conn):
+    """all_orders'ı statü tablolarından tamamen yeniden doldurur."""
+    cols = ', '.join(COPY_COLUMNS)
+    conn.execute(text("TRUNCATE all_orders"))
+    total = 0
+    for status_name, model_cls in STATUS_MODELS.items():
+        total += conn.execute(text(
+            f"INSERT INTO all_orders (status_name, {cols}) "
+            f"SELECT :status_name, {cols} FROM {model_cls.__tablename__}"
+        ), {'status_name': status_name}).rowcount or 0
+    logger.info(f"all_orders yeniden dolduruldu: {total} kayıt.")
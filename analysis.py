@@ -1,10 +1,10 @@
 from flask import Blueprint, render_template, jsonify, request
-from models import db, ReturnOrder, Degisim, Product
-# Çok tablolu sipariş modelleri – lütfen kendi proje dosyanıza göre import edin
-from models import OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled
+from models import db, ReturnOrder, Degisim, Product, DailySalesRollup
 
-from sqlalchemy import func, case, distinct, select, union_all
+from sqlalchemy import func, case, distinct
 from datetime import datetime, timedelta
+from cache_layer import cached_json
+from parallel_queries import run_parallel
 import logging
 
 analysis_bp = Blueprint('analysis', __name__)
@@ -18,154 +18,77 @@ if not logger.handlers:
 
 
 ########################
-# 1) Tüm tabloları birleştiren "union_all" subquery fonksiyonu
+# 2) Günlük Satış İstatistikleri
 ########################
-def all_orders_union(start_date, end_date):
-    """
-    5 tabloyu (Created, Picking, Shipped, Delivered, Cancelled) birleştirerek 
-    tek bir sanal sorgu (alias) döndürür. 
-    Her tabloda şu sütunların aynı isimle var olduğunu varsayıyoruz:
-      id, order_date, status, amount, quantity, product_main_id, merchant_sku, product_color, product_size
-
-    start_date ve end_date'e göre order_date filtresi uygulanır.
-    """
-    # Her tablo için SELECT sorgusu
-    q1 = select(
-        OrderCreated.id.label('id'),
-        OrderCreated.order_date.label('order_date'),
-        OrderCreated.status.label('status'),
-        OrderCreated.amount.label('amount'),
-        OrderCreated.quantity.label('quantity'),
-        OrderCreated.product_main_id.label('product_main_id'),
-        OrderCreated.merchant_sku.label('merchant_sku'),
-        OrderCreated.product_color.label('product_color'),
-        OrderCreated.product_size.label('product_size')
-    ).where(OrderCreated.order_date.between(start_date, end_date))
-
-    q2 = select(
-        OrderPicking.id.label('id'),
-        OrderPicking.order_date.label('order_date'),
-        OrderPicking.status.label('status'),
-        OrderPicking.amount.label('amount'),
-        OrderPicking.quantity.label('quantity'),
-        OrderPicking.product_main_id.label('product_main_id'),
-        OrderPicking.merchant_sku.label('merchant_sku'),
-        OrderPicking.product_color.label('product_color'),
-        OrderPicking.product_size.label('product_size')
-    ).where(OrderPicking.order_date.between(start_date, end_date))
-
-    q3 = select(
-        OrderShipped.id.label('id'),
-        OrderShipped.order_date.label('order_date'),
-        OrderShipped.status.label('status'),
-        OrderShipped.amount.label('amount'),
-        OrderShipped.quantity.label('quantity'),
-        OrderShipped.product_main_id.label('product_main_id'),
-        OrderShipped.merchant_sku.label('merchant_sku'),
-        OrderShipped.product_color.label('product_color'),
-        OrderShipped.product_size.label('product_size')
-    ).where(OrderShipped.order_date.between(start_date, end_date))
-
-    q4 = select(
-        OrderDelivered.id.label('id'),
-        OrderDelivered.order_date.label('order_date'),
-        OrderDelivered.status.label('status'),
-        OrderDelivered.amount.label('amount'),
-        OrderDelivered.quantity.label('quantity'),
-        OrderDelivered.product_main_id.label('product_main_id'),
-        OrderDelivered.merchant_sku.label('merchant_sku'),
-        OrderDelivered.product_color.label('product_color'),
-        OrderDelivered.product_size.label('product_size')
-    ).where(OrderDelivered.order_date.between(start_date, end_date))
-
-    q5 = select(
-        OrderCancelled.id.label('id'),
-        OrderCancelled.order_date.label('order_date'),
-        OrderCancelled.status.label('status'),
-        OrderCancelled.amount.label('amount'),
-        OrderCancelled.quantity.label('quantity'),
-        OrderCancelled.product_main_id.label('product_main_id'),
-        OrderCancelled.merchant_sku.label('merchant_sku'),
-        OrderCancelled.product_color.label('product_color'),
-        OrderCancelled.product_size.label('product_size')
-    ).where(OrderCancelled.order_date.between(start_date, end_date))
-
-    # Hepsini union_all ile birleştir
-    full_union = union_all(q1, q2, q3, q4, q5)
-    # Alias oluşturup döndürüyoruz
-    return full_union.alias('all_orders')
+def _rollup_days(start_date: datetime, end_date: datetime):
+    """Özet gün bazlıdır; aralığın iki ucundaki günler tam sayılır."""
+    return DailySalesRollup.sale_date.between(start_date.date(), end_date.date())
 
 
-########################
-# 2) Günlük Satış İstatistikleri
-########################
 def get_daily_sales(session, start_date: datetime, end_date: datetime):
     """
-    Belirtilen tarih aralığında, 5 tabloyu birleştiren subquery üzerinden günlük satış istatistikleri.
+    Belirtilen tarih aralığında günlük satış istatistikleri (daily_sales_rollup özetinden).
     """
-    try:
-        ao = all_orders_union(start_date, end_date)
-        # ao.c => (id, order_date, status, amount, quantity, product_main_id, merchant_sku, product_color, product_size)
-
-        q = session.query(
-            func.date(ao.c.order_date).label('date'),
-            func.count(ao.c.id).label('order_count'),
-            func.sum(ao.c.amount).label('total_amount'),
-            func.sum(ao.c.quantity).label('total_quantity'),
-            func.avg(ao.c.amount).label('average_order_value'),
-            func.count(case((ao.c.status == 'Delivered', 1), else_=None)).label('delivered_count'),
-            func.count(case((ao.c.status == 'Cancelled', 1), else_=None)).label('cancelled_count')
-        ).group_by(
-            func.date(ao.c.order_date)
-        ).order_by(
-            func.date(ao.c.order_date).desc()
-        )
-
-        results = q.all()
-        return results
-    except Exception as e:
-        logger.error(f"Günlük satış verileri çekilirken hata: {e}")
-        session.rollback()
-        return []
+    r = DailySalesRollup
+    order_count = func.sum(r.order_count)
+    total_amount = func.sum(r.total_amount)
+
+    q = session.query(
+        r.sale_date.label('date'),
+        order_count.label('order_count'),
+        total_amount.label('total_amount'),
+        func.sum(r.total_quantity).label('total_quantity'),
+        (total_amount / func.nullif(order_count, 0)).label('average_order_value'),
+        func.sum(case((r.status == 'Delivered', r.order_count), else_=0)).label('delivered_count'),
+        func.sum(case((r.status == 'Cancelled', r.order_count), else_=0)).label('cancelled_count')
+    ).filter(
+        _rollup_days(start_date, end_date)
+    ).group_by(
+        r.sale_date
+    ).order_by(
+        r.sale_date.desc()
+    )
+
+    results = q.all()
+    return results
 
 ########################
 # 3) Ürün Bazlı Satış Analizi
 ########################
 def get_product_sales(session, start_date: datetime, end_date: datetime):
     """
-    Belirtilen tarih aralığında ürün bazlı satış analizi (5 tablo union).
-    Cancelled hariç tutuyoruz (örnek).
+    Belirtilen tarih aralığında ürün bazlı satış analizi (daily_sales_rollup özetinden).
+    Cancelled ve statüsüz siparişler hariç.
     """
-    try:
-        logger.info("Ürün satışları sorgusu (çok tablo) başlıyor...")
-        ao = all_orders_union(start_date, end_date)
-
-        q = session.query(
-            ao.c.product_main_id.label('product_main_id'),
-            ao.c.merchant_sku.label('merchant_sku'),
-            ao.c.product_color.label('color'),
-            ao.c.product_size.label('size'),
-            func.count(ao.c.id).label('sale_count'),
-            func.sum(ao.c.amount).label('total_revenue'),
-            func.avg(ao.c.amount).label('average_price'),
-            func.sum(ao.c.quantity).label('total_quantity')
-        ).filter(
-            ao.c.status != 'Cancelled'
-        ).group_by(
-            ao.c.product_main_id,
-            ao.c.merchant_sku,
-            ao.c.product_color,
-            ao.c.product_size
-        ).order_by(
-            func.sum(ao.c.amount).desc()
-        ).limit(50)
-
-        results = q.all()
-        logger.info(f"Bulunan ürün satışı sayısı: {len(results)}")
-        return results
-    except Exception as e:
-        logger.exception("Ürün satış verisi (çok tablo) çekilirken hata oluştu:")
-        return []
+    logger.info("Ürün satışları sorgusu (özet tablo) başlıyor...")
+    r = DailySalesRollup
+    sale_count = func.sum(r.order_count)
+    total_revenue = func.sum(r.total_amount)
+
+    q = session.query(
+        func.nullif(r.product_main_id, '').label('product_main_id'),
+        func.nullif(r.merchant_sku, '').label('merchant_sku'),
+        func.nullif(r.product_color, '').label('color'),
+        func.nullif(r.product_size, '').label('size'),
+        sale_count.label('sale_count'),
+        total_revenue.label('total_revenue'),
+        (total_revenue / func.nullif(sale_count, 0)).label('average_price'),
+        func.sum(r.total_quantity).label('total_quantity')
+    ).filter(
+        _rollup_days(start_date, end_date),
+        r.status.notin_(['Cancelled', ''])
+    ).group_by(
+        r.product_main_id,
+        r.merchant_sku,
+        r.product_color,
+        r.product_size
+    ).order_by(
+        total_revenue.desc()
+    ).limit(50)
+
+    results = q.all()
+    logger.info(f"Bulunan ürün satışı sayısı: {len(results)}")
+    return results
 
 
 ########################
@@ -175,29 +98,24 @@ def get_return_stats(session, start_date: datetime, end_date: datetime):
     """
     ReturnOrder tablosundaki iade analizleri (tek tablo, aynen kalıyor).
     """
-    try:
-        from sqlalchemy import inspect
-        inspector = inspect(db.engine)
-        if not inspector.has_table('return_orders'):
-            logger.warning("ReturnOrder tablosu veritabanında bulunamadı")
-            return []
-
-        result = session.query(
-            func.coalesce(ReturnOrder.return_reason, 'Belirtilmemiş').label('return_reason'),
-            func.count(ReturnOrder.id).label('return_count'),
-            func.count(distinct(ReturnOrder.order_number)).label('unique_orders'),
-            func.coalesce(func.avg(ReturnOrder.refund_amount), 0).label('average_refund')
-        ).filter(
-            ReturnOrder.return_date.between(start_date, end_date)
-        ).group_by(
-            ReturnOrder.return_reason
-        ).all()
-        return result
-    except Exception as e:
-        logger.error(f"İade istatistikleri sorgusu hatası: {e}")
-        session.rollback()
+    from sqlalchemy import inspect
+    inspector = inspect(db.engine)
+    if not inspector.has_table('return_orders'):
+        logger.warning("ReturnOrder tablosu veritabanında bulunamadı")
         return []
 
+    result = session.query(
+        func.coalesce(ReturnOrder.return_reason, 'Belirtilmemiş').label('return_reason'),
+        func.count(ReturnOrder.id).label('return_count'),
+        func.count(distinct(ReturnOrder.order_number)).label('unique_orders'),
+        func.coalesce(func.avg(ReturnOrder.refund_amount), 0).label('average_refund')
+    ).filter(
+        ReturnOrder.return_date.between(start_date, end_date)
+    ).group_by(
+        ReturnOrder.return_reason
+    ).all()
+    return result
+
 
 ########################
 # 5) Değişim İstatistikleri (Degisim tablonuz değişmiyorsa)
@@ -206,31 +124,26 @@ def get_exchange_stats(session, start_date: datetime, end_date: datetime):
     """
     Degisim tablosu üzerinden değişim analizleri.
     """
-    try:
-        from sqlalchemy import inspect
-        inspector = inspect(db.engine)
-        if not inspector.has_table('degisim'):
-            logger.warning("Degisim tablosu veritabanında bulunamadı")
-            return []
-
-        result = session.query(
-            func.coalesce(Degisim.degisim_nedeni, 'Belirtilmemiş').label('degisim_nedeni'),
-            func.count(Degisim.degisim_no).label('exchange_count'),
-            func.date(Degisim.degisim_tarihi).label('date')
-        ).filter(
-            Degisim.degisim_tarihi.between(start_date, end_date)
-        ).group_by(
-            Degisim.degisim_nedeni,
-            func.date(Degisim.degisim_tarihi)
-        ).order_by(
-            func.date(Degisim.degisim_tarihi).desc()
-        ).all()
-        return result
-    except Exception as e:
-        logger.error(f"Değişim istatistikleri sorgusu hatası: {e}")
-        session.rollback()
+    from sqlalchemy import inspect
+    inspector = inspect(db.engine)
+    if not inspector.has_table('degisim'):
+        logger.warning("Degisim tablosu veritabanında bulunamadı")
         return []
 
+    result = session.query(
+        func.coalesce(Degisim.degisim_nedeni, 'Belirtilmemiş').label('degisim_nedeni'),
+        func.count(Degisim.degisim_no).label('exchange_count'),
+        func.date(Degisim.degisim_tarihi).label('date')
+    ).filter(
+        Degisim.degisim_tarihi.between(start_date, end_date)
+    ).group_by(
+        Degisim.degisim_nedeni,
+        func.date(Degisim.degisim_tarihi)
+    ).order_by(
+        func.date(Degisim.degisim_tarihi).desc()
+    ).all()
+    return result
+
 
 ########################
 # 6) HTML Sayfası (Opsiyonel)
@@ -251,22 +164,16 @@ def sales_analysis():
 # 7) API Endpoint (Tüm Verileri Döndürür)
 ########################
 @analysis_bp.route('/api/sales-stats')
+@cached_json('orders')
 def get_sales_stats():
     """
     API endpoint'i: Belirtilen tarih aralığında (varsayılan 90 gün) 
-    - Günlük satış istatistikleri (5 tablo union)
-    - Ürün bazlı satış (5 tablo union)
+    - Günlük satış istatistikleri (daily_sales_rollup)
+    - Ürün bazlı satış (daily_sales_rollup)
     - ReturnOrder (iade) ve Degisim (değişim) tabloları
+    Dört sorgu ayrı bağlantılarda paralel çalışır; süresi dolan veya hata veren sorgunun
+    listesi boş gelir, yanıt 'partial': true ile işaretlenir ve önbelleğe yazılmaz.
     """
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
-    from app import DATABASE_URI
-
-    # Yeni bir session oluştur
-    engine = create_engine(DATABASE_URI)
-    SessionLocal = sessionmaker(bind=engine)
-    session = SessionLocal()
-
     logger.info("API isteği başladı")
     now = datetime.now()
 
@@ -307,15 +214,17 @@ def get_sales_stats():
     logger.info(f"Tarih aralığı: {start_date} - {end_date}")
 
     try:
-        # 1) Günlük satış
-        daily_sales = get_daily_sales(session, start_date, end_date)
-
-        # 2) Ürün bazlı satış
-        product_sales = get_product_sales(session, start_date, end_date)
-
-        # 3) Return / Exchange
-        returns_data = get_return_stats(session, start_date, end_date)
-        exchanges_data = get_exchange_stats(session, start_date, end_date)
+        # Günlük satış, ürün bazlı satış, iade ve değişim birbirinden bağımsız
+        results, failed = run_parallel({
+            'daily_sales': get_daily_sales,
+            'product_sales': get_product_sales,
+            'returns': get_return_stats,
+            'exchanges': get_exchange_stats,
+        }, args=(start_date, end_date), default=[])
+        daily_sales = results['daily_sales']
+        product_sales = results['product_sales']
+        returns_data = results['returns']
+        exchanges_data = results['exchanges']
 
         # Toplam değerleri hesaplama
         total_orders = sum(stat.order_count or 0 for stat in daily_sales) if daily_sales else 0
@@ -325,6 +234,8 @@ def get_sales_stats():
         # JSON yanıt oluşturma
         response = {
             'success': True,
+            'partial': bool(failed),
+            'failed_queries': failed,
 
             'total_orders': total_orders,
             'total_items_sold': total_items_sold,
@@ -379,6 +290,3 @@ def get_sales_stats():
             'returns': [],
             'exchanges': []
         })
-
-    finally:
-        session.close()
@@ -10,7 +10,15 @@ from werkzeug.routing import BuildError
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from flask_login import LoginManager
-from models import db, Base, User
+from models import db, Base, OrderSyncState, OrderLocator, AllOrder, UserLogDaily, DailySalesRollup, SyncJob, ProductImage
+from order_upsert import ensure_order_number_unique_indexes, DuplicateOrderNumbers
+from user_cache import get_cached_user
+from order_locator import ensure_order_locator
+from all_orders_table import ensure_all_orders_table
+from sales_rollup import ensure_daily_sales_rollup
+from search_index import ensure_search_indexes
+from product_catalog import ensure_product_catalog_index
+from user_log_partitions import ensure_user_log_partitions, maintain_user_logs
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,7 +32,7 @@ login_manager.login_view = "login_logout.login"
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return get_cached_user(user_id)
 
 @app.template_filter('from_json')
 def from_json(value):
@@ -38,15 +46,35 @@ CORS(app)
 DATABASE_URI = os.environ.get('DATABASE_URL')
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URI
 
-try:
-    engine = create_engine(DATABASE_URI, pool_pre_ping=True)
-    Session = sessionmaker(bind=engine)
-    Base.metadata.create_all(engine)
-    app.config['Session'] = Session
-    logger.info("Veritabanına başarıyla bağlanıldı.")
-except Exception as e:
-    logger.error(f"Veritabanı bağlantı hatası: {e}")
-    raise SystemExit("Veritabanına bağlanamadı.")
+# İşçi süreçler (worker_pool, forkserver) ana modülü '__mp_main__' adıyla yeniden
+# içe aktarır; veritabanı kurulumu ve arka plan servisleri yalnızca uygulama sürecinde.
+IS_POOL_WORKER = __name__ == '__mp_main__'
+
+if not IS_POOL_WORKER:
+    try:
+        engine = create_engine(DATABASE_URI, pool_pre_ping=True)
+        Session = sessionmaker(bind=engine)
+        Base.metadata.create_all(engine)
+        # Sonradan eklenen yardımcı tablolar (mevcut tablolara dokunmaz)
+        db.metadata.create_all(engine, tables=[
+            OrderSyncState.__table__, OrderLocator.__table__, AllOrder.__table__, UserLogDaily.__table__,
+            DailySalesRollup.__table__, SyncJob.__table__, ProductImage.__table__
+        ])
+        ensure_order_number_unique_indexes(engine)
+        ensure_order_locator(engine)
+        ensure_all_orders_table(engine)
+        ensure_daily_sales_rollup(engine)
+        ensure_user_log_partitions(engine)
+        ensure_search_indexes(engine)
+        ensure_product_catalog_index(engine)
+        app.config['Session'] = Session
+        logger.info("Veritabanına başarıyla bağlanıldı.")
+    except DuplicateOrderNumbers as e:
+        logger.error(str(e))
+        raise SystemExit(str(e)) from e
+    except Exception as e:
+        logger.error(f"Veritabanı bağlantı hatası: {e}")
+        raise SystemExit("Veritabanına bağlanamadı.")
 
 db.init_app(app)
 
@@ -71,8 +99,14 @@ from stock_report import stock_report_bp
 from openai_service import openai_bp
 from siparisler import siparisler_bp
 from user_logs import user_logs_bp, log_user_action
+from user_log_writer import user_log_writer
 from commission_update_routes import commission_update_bp
 from profit import profit_bp
+from sync_jobs import sync_jobs_bp, job_runner
+from trendyol_client import trendyol_client_bp
+from image_derivatives import product_picture, product_image_url
+from render_cache import render_cache_bp
+from label_pdf import label_pdf_bp
 
 blueprints = [
     order_service_bp, update_service_bp, archive_bp,
@@ -82,12 +116,20 @@ blueprints = [
     iade_islemleri, siparis_fisi_bp, analysis_bp,
     stock_report_bp, openai_bp, siparisler_bp,
     product_service_bp, claims_service_bp,
-    user_logs_bp, commission_update_bp, profit_bp
+    user_logs_bp, commission_update_bp, profit_bp,
+    sync_jobs_bp, trendyol_client_bp, render_cache_bp,
+    label_pdf_bp
 ]
 
 for bp in blueprints:
     app.register_blueprint(bp)
 
+if not IS_POOL_WORKER:
+    # Sayfa görüntüleme logları arka planda toplu yazılır
+    user_log_writer.start(app)
+    # Trendyol senkronizasyonları istek dışında, iş havuzunda çalışır
+    job_runner.start(app)
+
 @app.before_request
 def log_request():
     if not request.path.startswith('/static/'):
@@ -128,6 +170,9 @@ def custom_url_for(endpoint, **values):
         raise BuildError(endpoint, values, method=None)
 
 app.jinja_env.globals['url_for'] = custom_url_for
+# Küçültülmüş ürün görselleri (thumb/card, WebP + JPEG)
+app.jinja_env.globals['product_picture'] = product_picture
+app.jinja_env.globals['product_image_url'] = product_image_url
 
 from apscheduler.schedulers.background import BackgroundScheduler
 
@@ -136,9 +181,12 @@ def fetch_and_save_returns():
         data = fetch_data_from_api()
         save_to_database(data)
 
-scheduler = BackgroundScheduler(timezone="Europe/Istanbul")
-scheduler.add_job(func=fetch_and_save_returns, trigger='cron', hour=23, minute=50)
-scheduler.start()
+if not IS_POOL_WORKER:
+    scheduler = BackgroundScheduler(timezone="Europe/Istanbul")
+    scheduler.add_job(func=fetch_and_save_returns, trigger='cron', hour=23, minute=50)
+    # user_logs: yeni ay partition'ları + saklama süresi dolanların özetlenip silinmesi
+    scheduler.add_job(func=maintain_user_logs, args=[engine], trigger='cron', hour=3, minute=30)
+    scheduler.start()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8080)
@@ -1,30 +1,18 @@
-import os
 import json
 import traceback
 from datetime import datetime
 from flask import Blueprint, render_template, request, jsonify
 from models import db, Archive, Product
-# Çok tablolu sipariş modelleri
-from models import OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled
 from trendyol_api import SUPPLIER_ID
 from update_service import update_order_status_to_picking
+from order_locator import find_order_across_tables, record_order_locations, forget_order_locations
+from image_resolver import image_resolver
 
 archive_bp = Blueprint('archive', __name__)
 
 #############################
 # 1) Yardımcı Fonksiyonlar
 #############################
-def find_order_across_tables(order_number):
-    """
-    5 tabloda arar: Created, Picking, Shipped, Delivered, Cancelled
-    Bulursa (obj, tablo_sinifi), bulamazsa (None, None)
-    """
-    for cls in [OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled]:
-        found = cls.query.filter_by(order_number=order_number).first()
-        if found:
-            return found, cls
-    return None, None
-
 def compute_time_left(delivery_date):
     """
     Kalan teslim süresini (gün saat dakika) string olarak döndürür.
@@ -46,14 +34,9 @@ def compute_time_left(delivery_date):
 
 def fetch_product_image(barcode):
     """
-    'static/images' klasöründe barkod.jpg vb. arar, yoksa default döndürür.
+    Barkodun görselini bellekteki haritadan döndürür, yoksa default.
     """
-    images_dir = os.path.join('static', 'images')
-    for filename in os.listdir(images_dir):
-        name, ext = os.path.splitext(filename)
-        if name == barcode:
-            return f"/static/images/{filename}"
-    return "/static/images/default.jpg"
+    return image_resolver.resolve(barcode)
 
 
 #############################
@@ -149,6 +132,8 @@ def execute_order_processing():
     )
     db.session.add(new_picking)
     db.session.delete(archived_order)
+    db.session.flush()
+    record_order_locations(OrderPicking, [(new_picking.order_number, new_picking.id)])
     db.session.commit()
 
     print(f"Sipariş {order_number} 'Picking' tablosuna taşındı (arşivden çıkarıldı).")
@@ -288,6 +273,7 @@ def archive_an_order():
     )
     db.session.add(new_archive)
     db.session.delete(order_obj)
+    forget_order_locations([order_obj.order_number])
     db.session.commit()
 
     print(f"Sipariş {order_number}, {table_cls.__tablename__} tablosundan silindi, arşive eklendi.")
@@ -330,6 +316,8 @@ def recover_from_archive():
 
     db.session.add(restored_order)
     db.session.delete(archived_order)
+    db.session.flush()
+    record_order_locations(OrderCreated, [(restored_order.order_number, restored_order.id)])
     db.session.commit()
 
     print(f"Sipariş {order_number} arşivden çıkartıldı, 'Created' tablosuna eklendi.")
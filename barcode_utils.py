@@ -1,11 +1,9 @@
 from flask import Blueprint
-from barcode import get_barcode_class
-from barcode.writer import SVGWriter
-import barcode
-import os
-import traceback
+import logging
 
+from render_cache import render_cache
 
+logger = logging.getLogger(__name__)
 
 barcode_utils_bp = Blueprint('barcode_utils', __name__)
 
@@ -13,38 +11,25 @@ barcode_utils_bp = Blueprint('barcode_utils', __name__)
 def index():
     return "Barkod oluşturma uygulaması çalışıyor!"
 
+# Kargo etiketindeki barkodun ayarları (render_cache anahtarının parçası)
+SHIPPING_BARCODE_OPTIONS = {
+    'module_height': 6,
+    'font_size': 6,
+    'text_distance': 2.2,
+    'quiet_zone': 1
+}
+
+
 def generate_barcode(shipping_code):
+    """
+    Kargo kodunun Code128 SVG'si; static'e göre göreli yol döner.
+    Aynı kod için dosya bir kez üretilir (render_cache).
+    """
     if not shipping_code:
         return None
 
     try:
-        # Barkod sınıfını al
-        barcode_class = barcode.get_barcode_class('code128')
-
-        # SVGWriter için ayarlar
-        options = {
-            'module_height': 6,
-            'font_size': 6,
-            'text_distance': 2.2,
-            'quiet_zone': 1
-        }
-
-        barcode_image = barcode_class(shipping_code, writer=SVGWriter())
-
-        # Barkod dizini oluştur
-        barcode_dir = os.path.join('static', 'barcodes')
-        os.makedirs(barcode_dir, exist_ok=True)
-
-        # Dosya adını uzantı olmadan belirtiyoruz
-        filename = os.path.join(barcode_dir, shipping_code)
-        barcode_image.save(filename, options=options)
-
-        # SVGWriter otomatik olarak .svg uzantısını ekleyecek
-        relative_path = os.path.join('barcodes', f"{shipping_code}.svg")
-        return relative_path
-
+        return render_cache.path('code128-svg', shipping_code, **SHIPPING_BARCODE_OPTIONS)
     except Exception as e:
-        traceback.print_exc()
+        logger.exception(f"Barkod oluşturulamadı ({shipping_code}): {e}")
         return None
-
-
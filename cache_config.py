@@ -6,7 +6,10 @@ redis_client = Redis(
     host=os.environ.get('REDIS_HOST', 'localhost'),
     port=int(os.environ.get('REDIS_PORT', 6379)),
     db=0,
-    decode_responses=True
+    decode_responses=True,
+    # Önbellek yardımcıdır; Redis yanıt vermezse istek beklemeden yerel önbelleğe düşülür
+    socket_connect_timeout=1,
+    socket_timeout=1
 )
 
 # Önbellek süreleri (saniye)
@@ -0,0 +1,204 @@
+# cache_layer.py
+# Sık okunan sayfalar için önbellek: Redis (cache_config.redis_client), Redis'e
+# ulaşılamazsa süreç içi LRU. Anahtarlar ad alanı (namespace) + sürüm + argümanlardan
+# oluşur; invalidate(namespace) sürümü artırır, eski anahtarlar TTL ile kendiliğinden düşer.
+#
+# Geçersiz kılma: ORM oturumunda CACHE_TABLES'taki bir tabloya yazılınca ilgili ad alanı
+# işaretlenir ve commit sonrasında geçersiz kılınır (rollback'te işaret silinir).
+# text() ile yazılan SQL'i izleyemediğimiz yerlerde mark_dirty elle çağrılır.
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, jsonify
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from cache_config import redis_client, CACHE_TIMES
+
+logger = logging.getLogger(__name__)
+
+LOCAL_CACHE_MAX = 512
+REDIS_RETRY_INTERVAL = 30  # saniye; Redis düştüğünde her istekte tekrar denenmez
+DEFAULT_TTL = 300
+
+# Tablo -> etkilediği önbellek ad alanı
+CACHE_TABLES = {
+    'products': 'products',
+    'product_archive': 'products',
+    'orders_created': 'orders',
+    'orders_picking': 'orders',
+    'orders_shipped': 'orders',
+    'orders_delivered': 'orders',
+    'orders_cancelled': 'orders',
+    'orders_archived': 'orders',
+    'all_orders': 'orders',
+    'return_orders': 'orders',
+    'return_products': 'orders',
+    'degisim': 'orders',
+}
+
+_PENDING_KEY = 'cache_invalidate'
+
+_local = OrderedDict()
+_local_versions = {}
+_lock = threading.Lock()
+_redis_down_until = 0.0
+
+
+def _redis():
+    """Redis kullanılabilir görünüyorsa istemciyi, değilse None döner."""
+    return redis_client if time.monotonic() >= _redis_down_until else None
+
+
+def _redis_failed(error):
+    global _redis_down_until
+    if time.monotonic() >= _redis_down_until:
+        logger.warning(f"Redis'e ulaşılamadı, süreç içi önbelleğe geçiliyor: {error}")
+    _redis_down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+
+
+def _version(namespace):
+    client = _redis()
+    if client is not None:
+        try:
+            return int(client.get(f"cache:{namespace}:version") or 0)
+        except RedisError as e:
+            _redis_failed(e)
+    with _lock:
+        return _local_versions.get(namespace, 0)
+
+
+def _make_key(namespace, parts):
+    digest = hashlib.sha1(json.dumps(parts, default=str, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"cache:{namespace}:v{_version(namespace)}:{digest}"
+
+
+def _get(key):
+    client = _redis()
+    if client is not None:
+        try:
+            raw = client.get(key)
+            return json.loads(raw) if raw is not None else None
+        except RedisError as e:
+            _redis_failed(e)
+    with _lock:
+        hit = _local.get(key)
+        if hit and hit[1] > time.monotonic():
+            _local.move_to_end(key)
+            return hit[0]
+        _local.pop(key, None)
+    return None
+
+
+def _set(key, value, ttl):
+    raw = json.dumps(value, default=str)
+    client = _redis()
+    if client is not None:
+        try:
+            client.set(key, raw, ex=ttl)
+            return
+        except RedisError as e:
+            _redis_failed(e)
+    with _lock:
+        # Redis ile aynı davranış için JSON'dan geçirilmiş kopya saklanır
+        _local[key] = (json.loads(raw), time.monotonic() + ttl)
+        _local.move_to_end(key)
+        while len(_local) > LOCAL_CACHE_MAX:
+            _local.popitem(last=False)
+
+
+def cached(namespace, key_parts, producer, ttl=None):
+    """
+    (namespace, key_parts) için önbellekteki değeri döner; yoksa producer()'ı çalıştırıp saklar.
+    Değer JSON'a çevrilebilir olmalıdır (tarihler string'e döner).
+    """
+    key = _make_key(namespace, key_parts)
+    value = _get(key)
+    if value is None:
+        value = producer()
+        _set(key, value, ttl or CACHE_TIMES.get(namespace, DEFAULT_TTL))
+    return value
+
+
+def cached_json(namespace, ttl=None):
+    """
+    JSON dönen view'lar için dekoratör. Anahtar: endpoint + tüm query parametreleri.
+    Yalnızca 200 dönen, 'success': False veya 'partial': True olmayan yanıtlar saklanır.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            parts = [request.endpoint, kwargs, sorted(request.args.items(multi=True))]
+            key = _make_key(namespace, parts)
+            payload = _get(key)
+            if payload is not None:
+                return jsonify(payload)
+
+            response = view(*args, **kwargs)
+            status = getattr(response, 'status_code', None)
+            data = response.get_json(silent=True) if status == 200 else None
+            incomplete = isinstance(data, dict) and (data.get('success') is False or data.get('partial'))
+            if isinstance(data, (dict, list)) and not incomplete:
+                _set(key, data, ttl or CACHE_TIMES.get(namespace, DEFAULT_TTL))
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate(*namespaces):
+    """Ad alanlarının sürümünü artırır; o ana kadarki tüm anahtarlar geçersiz olur."""
+    with _lock:
+        for namespace in namespaces:
+            _local_versions[namespace] = _local_versions.get(namespace, 0) + 1
+    client = _redis()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline()
+        for namespace in namespaces:
+            pipe.incr(f"cache:{namespace}:version")
+        pipe.execute()
+    except RedisError as e:
+        _redis_failed(e)
+
+
+def mark_dirty(session, *namespaces):
+    """Commit'te geçersiz kılınacak ad alanlarını işaretler (text() SQL ve bulk_save için)."""
+    session.info.setdefault(_PENDING_KEY, set()).update(namespaces)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session, flush_context):
+    tables = {obj.__table__.name for obj in (*session.new, *session.dirty, *session.deleted)
+              if hasattr(obj, '__table__')}
+    mark_dirty(session, *{CACHE_TABLES[t] for t in tables if t in CACHE_TABLES})
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    namespace = CACHE_TABLES.get(getattr(table, 'name', None))
+    if namespace:
+        mark_dirty(orm_execute_state.session, namespace)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    namespaces = session.info.pop(_PENDING_KEY, None)
+    if namespaces:
+        invalidate(*namespaces)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_on_rollback(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop(_PENDING_KEY, None)
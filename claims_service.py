@@ -1,12 +1,12 @@
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-import base64
-import aiohttp
 import asyncio
 import json
 from datetime import datetime, timedelta
 from models import db, Order, Return
-from trendyol_api import API_KEY, API_SECRET, SUPPLIER_ID, BASE_URL
+from trendyol_client import trendyol_client, supplier_path
+from adaptive_concurrency import AdaptiveConcurrency
+from sync_jobs import sync_job, report_progress, enqueue_for_request
 import logging
 
 # Loglama ayarları
@@ -22,16 +22,24 @@ claims_service_bp = Blueprint('claims_service', __name__)
 @claims_service_bp.route('/fetch-trendyol-claims', methods=['POST'])
 def fetch_trendyol_claims_route():
     try:
-        # Asenkron fonksiyonu çağır
-        asyncio.run(fetch_trendyol_claims_async())
-        flash('İade talepleri başarıyla güncellendi!', 'success')
+        # Çekim arka plan işinde yapılır, istek hemen döner
+        job, created = enqueue_for_request('claims')
+        if created:
+            flash(f'İade talepleri arka planda güncelleniyor (iş #{job.id}).', 'success')
+        else:
+            flash(f'İade talepleri güncellemesi zaten çalışıyor (iş #{job.id}).', 'info')
     except Exception as e:
         logger.error(f"Hata: fetch_trendyol_claims_route - {e}")
-        flash('İade talepleri güncellenirken bir hata oluştu.', 'danger')
+        flash('İade talepleri güncellemesi başlatılamadı.', 'danger')
 
     return redirect(url_for('claims_service.claims_list'))
 
 
+@sync_job('claims', 'İade talepleri senkronizasyonu')
+def sync_claims_job():
+    asyncio.run(fetch_trendyol_claims_async())
+
+
 @claims_service_bp.route('/claims-list', methods=['GET'])
 def claims_list():
     """
@@ -46,13 +54,7 @@ async def fetch_trendyol_claims_async():
     Trendyol API'den tüm iade taleplerini asenkron olarak çeker
     """
     try:
-        auth_str = f"{API_KEY}:{API_SECRET}"
-        b64_auth_str = base64.b64encode(auth_str.encode()).decode('utf-8')
-        url = f"{BASE_URL}suppliers/{SUPPLIER_ID}/claims"
-        headers = {
-            "Authorization": f"Basic {b64_auth_str}",
-            "Content-Type": "application/json"
-        }
+        path = supplier_path('claims')
 
         # Son 30 günlük iade taleplerini alalım
         end_date = datetime.now()
@@ -71,57 +73,66 @@ async def fetch_trendyol_claims_async():
             "size": 100  # Maksimum sayfa boyutu
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, params=params) as response:
-                response_data = await response.json()
-                if response.status != 200:
-                    logger.error(f"API Error: {response.status} - {response_data}")
-                    return
+        response = await trendyol_client.get_async(path, params=params)
+        if response.status != 200:
+            logger.error(f"API Error: {response.status} - {response.text}")
+            return
+        response_data = response.json()
 
-                total_elements = response_data.get('totalElements', 0)
-                total_pages = response_data.get('totalPages', 1)
-                logger.info(f"Toplam iade sayısı: {total_elements}, Toplam sayfa sayısı: {total_pages}")
+        total_elements = response_data.get('totalElements', 0)
+        total_pages = response_data.get('totalPages', 1)
+        logger.info(f"Toplam iade sayısı: {total_elements}, Toplam sayfa sayısı: {total_pages}")
+        report_progress(f"{total_elements} iade talebi, {total_pages} sayfa çekiliyor")
 
-                # Tüm sayfalar için istek hazırlayalım
-                tasks = []
-                semaphore = asyncio.Semaphore(5)  # Aynı anda maksimum 5 istek
-                for page_number in range(total_pages):
-                    params_page = params.copy()
-                    params_page['page'] = page_number
-                    task = fetch_claims_page(session, url, headers, params_page, semaphore)
-                    tasks.append(task)
+        # Tüm sayfalar için istek hazırlayalım
+        tasks = []
+        # Eşzamanlılık API'nin yanıtlarına göre ayarlanır (429/zaman aşımında düşer)
+        limiter = AdaptiveConcurrency('claims', initial=5, maximum=20)
+        for page_number in range(total_pages):
+            params_page = params.copy()
+            params_page['page'] = page_number
+            task = fetch_claims_page(path, params_page, limiter)
+            tasks.append(task)
 
-                # Asenkron olarak tüm istekleri yapalım
-                pages_data = await asyncio.gather(*tasks)
+        # Asenkron olarak tüm istekleri yapalım
+        try:
+            pages_data = await asyncio.gather(*tasks)
+        finally:
+            concurrency = limiter.close()
 
-                # Gelen iadeleri birleştirelim
-                all_claims_data = []
-                for claims in pages_data:
-                    if claims:
-                        all_claims_data.extend(claims)
+        # Gelen iadeleri birleştirelim
+        all_claims_data = []
+        for claims in pages_data:
+            if claims:
+                all_claims_data.extend(claims)
 
-                logger.info(f"Toplam çekilen iade sayısı: {len(all_claims_data)}")
+        logger.info(
+            f"Toplam çekilen iade sayısı: {len(all_claims_data)} "
+            f"(eşzamanlılık: son {concurrency['level']} / en yüksek {concurrency['peak']})"
+        )
 
-                # İadeleri işleyelim
-                process_all_claims(all_claims_data)
+        # İadeleri işleyelim
+        report_progress(f"{len(all_claims_data)} iade talebi kaydediliyor")
+        process_all_claims(all_claims_data)
 
     except Exception as e:
         logger.error(f"Hata: fetch_trendyol_claims_async - {e}")
+        raise
 
 
-async def fetch_claims_page(session, url, headers, params, semaphore):
+async def fetch_claims_page(path, params, limiter):
     """
     Belirli bir sayfadaki iade taleplerini çeker
     """
-    async with semaphore:
+    async with limiter.slot():
         try:
-            async with session.get(url, headers=headers, params=params) as response:
-                if response.status != 200:
-                    logger.error(f"API isteği başarısız oldu: {response.status} - {await response.text()}")
-                    return []
-                data = await response.json()
-                claims_data = data.get('content', [])
-                return claims_data
+            response = await trendyol_client.get_async(path, params=params)
+            if response.status != 200:
+                logger.error(f"API isteği başarısız oldu: {response.status} - {response.text}")
+                return []
+            data = response.json()
+            claims_data = data.get('content', [])
+            return claims_data
         except Exception as e:
             logger.error(f"Hata: fetch_claims_page - {e}")
             return []
@@ -212,34 +223,27 @@ async def approve_claim(claim_id):
             return redirect(url_for('claims_service.claims_list'))
             
         # Trendyol API'ye onay gönder
-        auth_str = f"{API_KEY}:{API_SECRET}"
-        b64_auth_str = base64.b64encode(auth_str.encode()).decode('utf-8')
-        url = f"{BASE_URL}suppliers/{SUPPLIER_ID}/claims/{claim_id}/approve"
-        headers = {
-            "Authorization": f"Basic {b64_auth_str}",
-            "Content-Type": "application/json"
-        }
+        path = supplier_path(f"claims/{claim_id}/approve")
         
         reason = request.form.get('reason', 'İade talebi onaylandı')
         payload = {"reason": reason}
         
-        async with aiohttp.ClientSession() as session:
-            async with session.put(url, headers=headers, json=payload) as response:
-                if response.status != 200:
-                    response_text = await response.text()
-                    logger.error(f"API isteği başarısız oldu: {response.status} - {response_text}")
-                    flash(f'İade talebi onaylanırken hata oluştu: {response_text}', 'error')
-                    return redirect(url_for('claims_service.claims_list'))
-                    
-                # Veritabanını güncelle
-                claim.status = 'APPROVED'
-                claim.notes = f"{claim.notes}\nOnaylandı: {reason}"
-                claim.last_modified_date = datetime.now()
-                db.session.commit()
-                
-                flash('İade talebi başarıyla onaylandı', 'success')
-                return redirect(url_for('claims_service.claims_list'))
-                
+        response = await trendyol_client.put_async(path, json=payload)
+        if response.status != 200:
+            response_text = response.text
+            logger.error(f"API isteği başarısız oldu: {response.status} - {response_text}")
+            flash(f'İade talebi onaylanırken hata oluştu: {response_text}', 'error')
+            return redirect(url_for('claims_service.claims_list'))
+            
+        # Veritabanını güncelle
+        claim.status = 'APPROVED'
+        claim.notes = f"{claim.notes}\nOnaylandı: {reason}"
+        claim.last_modified_date = datetime.now()
+        db.session.commit()
+        
+        flash('İade talebi başarıyla onaylandı', 'success')
+        return redirect(url_for('claims_service.claims_list'))
+        
     except Exception as e:
         db.session.rollback()
         logger.error(f"Hata: approve_claim - {e}")
@@ -259,34 +263,27 @@ async def reject_claim(claim_id):
             return redirect(url_for('claims_service.claims_list'))
             
         # Trendyol API'ye red gönder
-        auth_str = f"{API_KEY}:{API_SECRET}"
-        b64_auth_str = base64.b64encode(auth_str.encode()).decode('utf-8')
-        url = f"{BASE_URL}suppliers/{SUPPLIER_ID}/claims/{claim_id}/reject"
-        headers = {
-            "Authorization": f"Basic {b64_auth_str}",
-            "Content-Type": "application/json"
-        }
+        path = supplier_path(f"claims/{claim_id}/reject")
         
         reason = request.form.get('reason', 'İade talebi reddedildi')
         payload = {"reason": reason}
         
-        async with aiohttp.ClientSession() as session:
-            async with session.put(url, headers=headers, json=payload) as response:
-                if response.status != 200:
-                    response_text = await response.text()
-                    logger.error(f"API isteği başarısız oldu: {response.status} - {response_text}")
-                    flash(f'İade talebi reddedilirken hata oluştu: {response_text}', 'error')
-                    return redirect(url_for('claims_service.claims_list'))
-                    
-                # Veritabanını güncelle
-                claim.status = 'REJECTED'
-                claim.notes = f"{claim.notes}\nReddedildi: {reason}"
-                claim.last_modified_date = datetime.now()
-                db.session.commit()
-                
-                flash('İade talebi başarıyla reddedildi', 'success')
-                return redirect(url_for('claims_service.claims_list'))
-                
+        response = await trendyol_client.put_async(path, json=payload)
+        if response.status != 200:
+            response_text = response.text
+            logger.error(f"API isteği başarısız oldu: {response.status} - {response_text}")
+            flash(f'İade talebi reddedilirken hata oluştu: {response_text}', 'error')
+            return redirect(url_for('claims_service.claims_list'))
+            
+        # Veritabanını güncelle
+        claim.status = 'REJECTED'
+        claim.notes = f"{claim.notes}\nReddedildi: {reason}"
+        claim.last_modified_date = datetime.now()
+        db.session.commit()
+        
+        flash('İade talebi başarıyla reddedildi', 'success')
+        return redirect(url_for('claims_service.claims_list'))
+        
     except Exception as e:
         db.session.rollback()
         logger.error(f"Hata: reject_claim - {e}")
@@ -3,33 +3,16 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from datetime import datetime
 import uuid
 import random
-import os
 import json
 from models import db, Degisim, Product
 
-# Çok tablolu sipariş modelleriniz:
-# (Örnek: Created / Picking / Shipped / Delivered / Cancelled)
-from models import OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled
+from order_locator import find_order_across_tables
+from image_resolver import image_resolver
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 degisim_bp = Blueprint('degisim', __name__)
 
-##################################
-# Yardımcı fonksiyon: Siparişi her tabloda arar
-##################################
-def find_order_across_tables(order_number):
-    """
-    order_number'a sahip siparişi Created, Picking, Shipped, Delivered, Cancelled tablolarında arar.
-    Bulursa (order_obj, tablo_sinifi), bulamazsa (None, None) döndürür.
-    """
-    # Projenizde farklı tablo varsa ekleyin
-    for table_cls in [OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled]:
-        order = table_cls.query.filter_by(order_number=order_number).first()
-        if order:
-            return order, table_cls
-    return None, None
-
 ##################################
 # 1) Değişim Kaydetme
 ##################################
@@ -126,9 +109,7 @@ def get_product_details():
     product = Product.query.filter_by(barcode=barcode).first()
 
     if product:
-        image_path = f"static/images/{barcode}.jpg"
-        if not os.path.exists(image_path):
-            image_path = "static/images/default.jpg"
+        image_path = image_resolver.resolve(barcode).lstrip('/')
 
         return jsonify({
             'success': True,
@@ -159,9 +140,7 @@ def get_order_details():
         for detail in order_details:
             barcode = detail.get('barcode')
             sku = detail.get('sku')
-            image_path = f"static/images/{barcode}.jpg"
-            if not os.path.exists(image_path):
-                image_path = "static/images/default.jpg"
+            image_path = image_resolver.resolve(barcode).lstrip('/')
 
             details_list.append({
                 'sku': sku,
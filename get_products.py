@@ -1,14 +1,12 @@
 import asyncio
 import aiohttp
 import os
-import base64
 import json
 import logging
+import time
 import threading
-import qrcode
 
 from datetime import datetime
-from urllib.parse import urlparse
 from dotenv import load_dotenv
 from io import BytesIO
 
@@ -16,10 +14,19 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy import func
-from trendyol_api import API_KEY, SUPPLIER_ID, API_SECRET, BASE_URL
+from trendyol_client import trendyol_client, supplier_path
+from adaptive_concurrency import AdaptiveConcurrency
+from image_store import image_store, images_root, image_extension
+from image_resolver import image_resolver
+from image_derivatives import derivative_pipeline
+from render_cache import render_cache, PRODUCT_QR_OPTIONS
 from login_logout import roles_required
 
 from models import db, Product, ProductArchive
+from search_index import search_page
+from cache_layer import cached, cached_json
+from product_catalog import catalog_page, catalog_group_count
+from sync_jobs import sync_job, report_progress, enqueue_for_request
 
 get_products_bp = Blueprint('get_products', __name__)
 
@@ -32,6 +39,8 @@ formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 handler.setFormatter(formatter)
 logger.addHandler(handler)
 
+SEARCH_PER_PAGE = 100  # ürün aramasında sayfa başına varyant
+
 
 #-------------------------------------------------------------------
 # HAREM DÖVİZ'DEN KUR ÇEKME (ÖRNEK)
@@ -104,14 +113,7 @@ def generate_qr():
     barcode = request.args.get('barcode', '').strip()
     if not barcode:
         return jsonify({'success': False, 'message': 'Barkod eksik!'})
-    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
-    qr.add_data(barcode)
-    qr.make(fit=True)
-    qr_dir = os.path.join(current_app.root_path, 'static', 'qr_codes')
-    os.makedirs(qr_dir, exist_ok=True)
-    qr_path = os.path.join(qr_dir, f"{barcode}.png")
-    qr.make_image(fill_color="black", back_color="white").save(qr_path)
-    return jsonify({'success': True, 'qr_code_path': f"/static/qr_codes/{barcode}.png"})
+    return jsonify({'success': True, 'qr_code_path': render_cache.url('qr-png', barcode, **PRODUCT_QR_OPTIONS)})
 
 
 def group_products_by_model_and_color(products):
@@ -129,6 +131,17 @@ def sort_variants_by_size(product_group):
         return sorted(product_group, key=lambda x: x.size, reverse=True)
 
 
+# Ürün listesi şablonlarının kullandığı alanlar; önbelleğe ORM nesnesi yerine bunlar yazılır
+PRODUCT_CACHE_FIELDS = (
+    'barcode', 'original_product_barcode', 'title', 'product_main_id', 'color',
+    'size', 'quantity', 'images', 'cost_usd', 'cost_try',
+)
+
+
+def product_snapshot(product):
+    return {field: getattr(product, field) for field in PRODUCT_CACHE_FIELDS}
+
+
 def render_product_list(products, pagination=None):
     grouped_products = group_products_by_model_and_color(products)
     for key in grouped_products:
@@ -136,31 +149,38 @@ def render_product_list(products, pagination=None):
     return render_template('product_list.html', grouped_products=grouped_products, pagination=pagination, search_mode=False)
 
 
-@get_products_bp.route('/update_products', methods=['POST'])
-async def update_products_route():
+def _enqueue_products_sync():
+    """Ürün çekimini arka plan işi olarak başlatır, sonucu flash'lar."""
     try:
-        logger.debug("update_products_route fonksiyonu çağrıldı.")
-        products = await fetch_all_products_async()
+        job, created = enqueue_for_request('products')
+        if created:
+            flash(f'Ürün güncellemesi arka planda başlatıldı (iş #{job.id}).', 'success')
+        else:
+            flash(f'Ürün güncellemesi zaten çalışıyor (iş #{job.id}).', 'info')
+    except Exception as e:
+        logger.error(f"Ürün güncelleme işi başlatılamadı: {e}")
+        flash('Ürün güncellemesi başlatılamadı.', 'danger')
 
-        if not isinstance(products, list):
-            logger.error(f"Beklenmeyen veri türü: {type(products)} - İçerik: {products}")
-            raise ValueError("Beklenen liste değil.")
 
-        logger.debug(f"Çekilen ürün sayısı: {len(products)}")
+@sync_job('products', 'Ürün güncellemesi')
+def sync_products_job():
+    products = asyncio.run(fetch_all_products_async())
 
-        if products:
-            logger.debug("Ürünler veritabanına kaydediliyor...")
-            await save_products_to_db_async(products)
-            flash('Ürünler başarıyla güncellendi.', 'success')
-            logger.info("Ürünler başarıyla güncellendi.")
-        else:
-            logger.warning("Ürünler bulunamadı veya güncelleme sırasında bir hata oluştu.")
-            flash('Ürünler bulunamadı veya güncelleme sırasında bir hata oluştu.', 'danger')
+    if not isinstance(products, list):
+        logger.error(f"Beklenmeyen veri türü: {type(products)} - İçerik: {products}")
+        raise ValueError("Beklenen liste değil.")
+    if not products:
+        raise ValueError("Ürünler bulunamadı veya Trendyol'dan çekilemedi.")
+
+    report_progress(f"{len(products)} ürün çekildi, kaydediliyor")
+    asyncio.run(save_products_to_db_async(products))
+    logger.info("Ürünler başarıyla güncellendi.")
 
-    except Exception as e:
-        logger.error(f"update_products_route hata: {e}")
-        flash('Ürünler güncellenirken bir hata oluştu.', 'danger')
 
+@get_products_bp.route('/update_products', methods=['POST'])
+def update_products_route():
+    logger.debug("update_products_route fonksiyonu çağrıldı.")
+    _enqueue_products_sync()
     return redirect(url_for('get_products.product_list'))
 
 
@@ -207,10 +227,10 @@ async def save_products_to_db_async(products):
     products = [p for p in products if isinstance(p, dict)]
     archived_barcodes = set(x.original_product_barcode for x in ProductArchive.query.all())
 
-    images_folder = os.path.join(current_app.root_path, 'static', 'images')
+    images_folder = images_root()
     os.makedirs(images_folder, exist_ok=True)
 
-    image_downloads = []
+    wanted_images = {}  # barkod -> kaynak URL
     product_objects = []
     seen_barcodes = set()
 
@@ -225,11 +245,9 @@ async def save_products_to_db_async(products):
         image_urls = [img.get('url', '') for img in product_data.get('images', []) if isinstance(img, dict)]
         image_url = image_urls[0] if image_urls else ''
         if image_url:
-            parsed_url = urlparse(image_url)
-            image_extension = os.path.splitext(parsed_url.path)[1] or '.jpg'
-            image_filename = f"{original_barcode}{image_extension.lower()}"
-            image_path = os.path.join(images_folder, image_filename)
-            image_downloads.append((image_url, image_path))
+            # Bu yol depodaki dosyaya hard link olarak tutulur (image_store)
+            image_filename = f"{original_barcode}{image_extension(image_url)}"
+            wanted_images[original_barcode] = image_url
             images_path_db = f"/static/images/{image_filename}"
         else:
             images_path_db = ''
@@ -276,110 +294,138 @@ async def save_products_to_db_async(products):
         db.session.execute(upsert_stmt)
     db.session.commit()
 
-    flash("Ürünler başarıyla veritabanına kaydedildi.", "success")
-
-    image_downloads = check_and_prepare_image_downloads(image_downloads, images_folder)
-    if image_downloads:
-        threading.Thread(target=background_download_images, args=(image_downloads,)).start()
+    image_downloads = image_store.plan_downloads(images_folder, wanted_images)
+    image_resolver.invalidate()  # indirmesiz eşlenen/taşınan görseller
+    # İndirilecek görsel olmasa da thread eksik türevleri tamamlar
+    logger.info(f"{len(image_downloads)} görsel indirilecek/kontrol edilecek.")
+    app = current_app._get_current_object()
+    threading.Thread(target=background_download_images, args=(app, image_downloads)).start()
 
 
 async def fetch_all_products_async():
     page_size = 1000
-    url = f"{BASE_URL}suppliers/{SUPPLIER_ID}/products"
-    credentials = f"{API_KEY}:{API_SECRET}"
-    encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-    headers = {"Authorization": f"Basic {encoded_credentials}"}
-    async with aiohttp.ClientSession() as session:
-        params = {"page": 0, "size": page_size}
-        async with session.get(url, headers=headers, params=params, timeout=30) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                logging.error(f"API Hatası: {response.status} - {error_text}")
-                return []
-            try:
-                data = await response.json()
-                logging.debug(f"API Yanıtı: Tür: {type(data)}, İçerik: {data}")
-            except Exception as e:
-                error_text = await response.text()
-                logging.error(f"JSON çözümleme hatası: {e} - Yanıt: {error_text}")
-                return []
-            total_pages = data.get('totalPages', 1)
-            logging.info(f"Toplam sayfa sayısı: {total_pages}")
-        tasks = [
-            fetch_products_page(session, url, headers, {"page": page_number, "size": page_size})
-            for page_number in range(total_pages)
-        ]
+    path = supplier_path('products')
+    params = {"page": 0, "size": page_size}
+    response = await trendyol_client.get_async(path, params=params)
+    if response.status != 200:
+        logging.error(f"API Hatası: {response.status} - {response.text}")
+        return []
+    try:
+        data = response.json()
+        logging.debug(f"API Yanıtı: Tür: {type(data)}, İçerik: {data}")
+    except Exception as e:
+        logging.error(f"JSON çözümleme hatası: {e} - Yanıt: {response.text}")
+        return []
+    total_pages = data.get('totalPages', 1)
+    logging.info(f"Toplam sayfa sayısı: {total_pages}")
+    limiter = AdaptiveConcurrency('products', initial=5, maximum=20)
+    tasks = [
+        fetch_products_page(path, {"page": page_number, "size": page_size}, limiter)
+        for page_number in range(total_pages)
+    ]
+    try:
         pages_data = await asyncio.gather(*tasks)
-        all_products = [product for page in pages_data if isinstance(page, list) for product in page]
-        logging.info(f"Toplam çekilen ürün sayısı: {len(all_products)}")
-        return all_products
+    finally:
+        concurrency = limiter.close()
+    all_products = [product for page in pages_data if isinstance(page, list) for product in page]
+    logging.info(
+        f"Toplam çekilen ürün sayısı: {len(all_products)} "
+        f"(eşzamanlılık: son {concurrency['level']} / en yüksek {concurrency['peak']})"
+    )
+    return all_products
 
 
-async def fetch_products_page(session, url, headers, params):
+async def fetch_products_page(path, params, limiter):
     try:
-        async with session.get(url, headers=headers, params=params, timeout=30) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                logging.error(f"Sayfa çekme hatası: {response.status} - {error_text}")
-                return []
-            try:
-                data = await response.json()
-                if not isinstance(data.get('content'), list):
-                    logging.error(f"Sayfa verisi content beklenen bir liste değil: {type(data.get('content'))}")
-                    return []
-                logging.debug(f"Sayfa {params['page']} başarıyla çekildi, içerik boyutu: {len(data['content'])}")
-                return data.get('content', [])
-            except Exception as e:
-                error_text = await response.text()
-                logging.error(f"JSON çözümleme hatası: {e} - Yanıt: {error_text}")
+        async with limiter.slot():
+            response = await trendyol_client.get_async(path, params=params)
+        if response.status != 200:
+            logging.error(f"Sayfa çekme hatası: {response.status} - {response.text}")
+            return []
+        try:
+            data = response.json()
+            if not isinstance(data.get('content'), list):
+                logging.error(f"Sayfa verisi content beklenen bir liste değil: {type(data.get('content'))}")
                 return []
+            logging.debug(f"Sayfa {params['page']} başarıyla çekildi, içerik boyutu: {len(data['content'])}")
+            return data.get('content', [])
+        except Exception as e:
+            logging.error(f"JSON çözümleme hatası: {e} - Yanıt: {response.text}")
+            return []
     except Exception as e:
         logging.error(f"fetch_products_page hata: {e}")
         return []
 
 
-async def download_images_async(image_urls):
+async def download_images_async(image_downloads, root):
+    """
+    image_store planındaki her URL'i bir kez indirir (kayıtlıysa koşullu istekle).
+    Dönen: (yeni/değişen manifest satırları, 304 alan barkodlar).
+    """
+    # CDN'in kaldırabildiği kadar paralel; hata/zaman aşımında geri çekilir
+    limiter = AdaptiveConcurrency('images', initial=16, minimum=2, maximum=100)
+    rows, unchanged = [], []
     async with aiohttp.ClientSession() as session:
-        tasks = []
-        semaphore = asyncio.Semaphore(100)
-        for image_url, image_path in image_urls:
-            tasks.append(download_image(session, image_url, image_path, semaphore))
-        await asyncio.gather(*tasks)
-
-
-async def download_image(session, image_url, image_path, semaphore):
-    async with semaphore:
-        if os.path.exists(image_path):
-            logger.info(f"Resim zaten mevcut, atlanıyor: {image_path}")
-            return
+        tasks = [download_image(session, task, root, limiter, rows, unchanged) for task in image_downloads]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            limiter.close()
+    return rows, unchanged
+
+
+async def download_image(session, task, root, limiter, rows, unchanged):
+    image_url = task['url']
+    headers = {}
+    if task['etag']:
+        headers['If-None-Match'] = task['etag']
+    if task['last_modified']:
+        headers['If-Modified-Since'] = task['last_modified']
+
+    async with limiter.slot() as slot:
+        started = time.monotonic()
         try:
-            async with session.get(image_url, timeout=10) as response:
+            async with session.get(image_url, headers=headers, timeout=10) as response:
+                if response.status == 304:
+                    slot.observe(response.status, time.monotonic() - started)
+                    unchanged.extend(task['barcodes'])
+                    return
                 if response.status != 200:
+                    slot.observe(response.status, time.monotonic() - started)
                     logger.error(f"Resim indirme hatası: {response.status} - {image_url}")
                     return
                 content = await response.read()
-                with open(image_path, 'wb') as img_file:
-                    img_file.write(content)
-                logger.info(f"Resim kaydedildi: {image_path}")
+                slot.observe(response.status, time.monotonic() - started)
+                rows.extend(image_store.record_download(
+                    root, task, content,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified'),
+                ))
+                logger.info(f"Resim kaydedildi: {image_url} ({len(task['barcodes'])} barkod)")
         except Exception as e:
+            if not slot.observed:
+                slot.failed()
             logger.error(f"Resim indirme sırasında hata oluştu ({image_url}): {e}")
 
 
-def background_download_images(image_downloads):
-    asyncio.run(download_images_async(image_downloads))
-
-
-
-
-
-def check_and_prepare_image_downloads(image_urls, images_folder):
-    existing_files = set(os.listdir(images_folder))
-    download_list = []
-    for image_url, image_path in image_urls:
-        image_filename = os.path.basename(image_path)
-        if image_filename not in existing_files:
-            download_list.append((image_url, image_path))
-    return download_list
+def background_download_images(app, image_downloads):
+    with app.app_context():
+        try:
+            rows, unchanged = asyncio.run(download_images_async(image_downloads, images_root()))
+            image_store.save(rows)
+            image_store.touch(unchanged)
+            image_resolver.invalidate()
+            logger.info(f"Görseller: {len(rows)} barkod güncellendi, {len(unchanged)} barkod değişmemiş.")
+
+            # Yeni orijinallerin (ve eksik kalanların) küçük boyut / WebP türevleri
+            originals = {row['content_hash']: row['path'] for row in rows}
+            originals.update(derivative_pipeline.missing(image_store.manifest()))
+            derivative_pipeline.generate(images_root(), originals)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Görsel indirme/işleme hatası: {e}")
+        finally:
+            db.session.remove()
 
 
 def upsert_products(products):
@@ -403,13 +449,6 @@ async def update_stock_levels_with_items_async(items):
     if not items:
         logger.error("Güncellenecek ürün bulunamadı.")
         return False
-    url = f"{BASE_URL}suppliers/{SUPPLIER_ID}/products/price-and-inventory"
-    credentials = f"{API_KEY}:{API_SECRET}"
-    encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-    headers = {
-        "Authorization": f"Basic {encoded_credentials}",
-        "Content-Type": "application/json"
-    }
     product_dict = {p.original_product_barcode: p for p in Product.query.all()}
     logger.info(f"Veritabanındaki ürün sayısı: {len(product_dict)}")
     payload_items = []
@@ -433,38 +472,28 @@ async def update_stock_levels_with_items_async(items):
             continue
     logger.info(f"API'ye gönderilecek ürün sayısı: {len(payload_items)}")
     payload = {"items": payload_items}
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.post(url, headers=headers, json=payload, timeout=30) as response:
-                if response.status != 200:
-                    logger.error(f"HTTP Hatası: {response.status}, Yanıt: {await response.text()}")
-                    return False
-                data = await response.json()
-                logger.info(f"API yanıtı: {data}")
-                batch_request_id = data.get('batchRequestId')
-                if batch_request_id:
-                    logger.info("Ürünler API üzerinden başarıyla güncellendi.")
-                    return True
-                else:
-                    logger.error("Batch Request ID alınamadı.")
-                    return False
-        except aiohttp.ClientError as e:
-            logger.error(f"İstek Hatası: {e}")
+    try:
+        response = await trendyol_client.post_async(supplier_path('products/price-and-inventory'), json=payload)
+        if response.status != 200:
+            logger.error(f"HTTP Hatası: {response.status}, Yanıt: {response.text}")
+            return False
+        data = response.json()
+        logger.info(f"API yanıtı: {data}")
+        batch_request_id = data.get('batchRequestId')
+        if batch_request_id:
+            logger.info("Ürünler API üzerinden başarıyla güncellendi.")
+            return True
+        else:
+            logger.error("Batch Request ID alınamadı.")
             return False
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"İstek Hatası: {e}")
+        return False
 
 
 @get_products_bp.route('/fetch-products')
-async def fetch_products_route():
-    try:
-        products = await fetch_all_products_async()
-        if products:
-            await save_products_to_db_async(products)
-            flash('Ürünler başarıyla güncellendi.', 'success')
-        else:
-            flash('Ürünler bulunamadı veya güncelleme sırasında bir hata oluştu.', 'danger')
-    except Exception as e:
-        logger.error(f"fetch_products_route hata: {e}")
-        flash('Ürünler güncellenirken bir hata oluştu.', 'danger')
+def fetch_products_route():
+    _enqueue_products_sync()
     return redirect(url_for('get_products.product_list'))
 
 
@@ -542,20 +571,25 @@ def restore_from_archive():
         return jsonify({'success': False, 'message': str(e)})
 
 
+def catalog_page_data(page, per_page):
+    """Katalog sayfasının önbelleğe yazılabilir hali: grup sayısı + sayfadaki gruplar."""
+    return {
+        'total_groups': catalog_group_count(),
+        'groups': [
+            [model_id, color, [product_snapshot(p) for p in sort_variants_by_size(group)]]
+            for (model_id, color), group in catalog_page(page, per_page).items()
+        ],
+    }
+
+
 @get_products_bp.route('/product_list')
 def product_list():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = 12
-        base_query = Product.query
-        products = base_query.all()
-        grouped_products = group_products_by_model_and_color(products)
-        sorted_keys = sorted(grouped_products.keys(), key=lambda x: (x[0].lower(), x[1].lower()))
-        total_groups = len(sorted_keys)
-        start_idx = (page - 1) * per_page
-        end_idx = min(start_idx + per_page, total_groups)
-        current_page_keys = sorted_keys[start_idx:end_idx]
-        current_page_products = {key: sort_variants_by_size(grouped_products[key]) for key in current_page_keys}
+        page_data = cached('products', ['catalog', page, per_page], lambda: catalog_page_data(page, per_page))
+        total_groups = page_data['total_groups']
+        current_page_products = {(model_id, color): group for model_id, color, group in page_data['groups']}
         total_pages = (total_groups + per_page - 1) // per_page
         pagination = {
             'page': page,
@@ -581,6 +615,7 @@ def product_list():
 
 
 @get_products_bp.route('/get_product_variants', methods=['GET'])
+@cached_json('products')
 def get_product_variants():
     model_id = request.args.get('model', '').strip()
     color = request.args.get('color', '').strip()
@@ -692,20 +727,23 @@ def search_products():
         flash('Lütfen en az 2 karakter içeren bir arama sorgusu girin', 'warning')
         return redirect(url_for('get_products.product_list'))
 
-    # Ürünleri veritabanından çek
-    products = Product.query.filter(
-        db.or_(
-            Product.barcode.ilike(f'%{query}%'),
-            Product.product_main_id.ilike(f'%{query}%'),
-            Product.title.ilike(f'%{query}%')
-        )
-    ).all()
+    # Ürünleri veritabanından çek (trigram/tsvector index'li, alakaya göre sıralı, sayfalı)
+    pagination = search_page(
+        Product.query, query,
+        trigram_columns=[Product.barcode, Product.product_main_id, Product.title],
+        vector_column=Product.search_vector,
+        page=request.args.get('page', 1, type=int),
+        per_page=SEARCH_PER_PAGE,
+        order_by=(Product.barcode,)
+    )
 
     # Ürünleri grupla ve template'e gönder
-    grouped_products = group_products_by_model_and_color(products)
+    grouped_products = group_products_by_model_and_color(pagination.items)
     return render_template('product_list.html', 
                          grouped_products=grouped_products, 
-                         pagination=None,
+                         pagination=pagination,
+                         pagination_endpoint='get_products.search_products',
+                         pagination_args={'query': query},
                          search_mode=True)
 
 
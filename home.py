@@ -2,7 +2,6 @@ import logging
 from datetime import datetime
 from flask import Blueprint, render_template
 import json
-import os
 import traceback
 
 # Yeni tablolarınız:
@@ -11,6 +10,7 @@ from models import (
     Product,
     # ... eğer diğer tabloları da kullanacaksanız, buraya ekleyin
 )
+from image_resolver import image_resolver
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -141,13 +141,6 @@ def calculate_remaining_time(delivery_date):
 
 def get_product_image(barcode):
     """
-    Ürün görselinin yolunu döndürür.
+    Ürün görselinin yolunu döndürür (bellekteki haritadan).
     """
-    images_folder = os.path.join('static', 'images')
-    extensions = ['.jpg', '.jpeg', '.png', '.gif']
-    for ext in extensions:
-        image_filename = f"{barcode}{ext}"
-        image_path = os.path.join(images_folder, image_filename)
-        if os.path.exists(image_path):
-            return f"/static/images/{image_filename}"
-    return "/static/images/default.jpg"
+    return image_resolver.resolve(barcode)
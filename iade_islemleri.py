@@ -1,5 +1,3 @@
-import requests
-import base64
 from datetime import datetime, timedelta
 from functools import wraps
 import time
@@ -7,13 +5,11 @@ import logging
 from models import ReturnProduct, ReturnOrder
 from sqlalchemy.exc import SQLAlchemyError
 from flask import Blueprint, jsonify, render_template, request, current_app, redirect, url_for, flash
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 # Yeni: APScheduler import
 from apscheduler.schedulers.background import BackgroundScheduler
 
-from trendyol_api import API_KEY, API_SECRET, SUPPLIER_ID, BASE_URL
+from trendyol_client import trendyol_client, supplier_path
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -31,19 +27,6 @@ def with_db_session(f):
             db_session.close()
     return decorated_function
 
-def get_session_with_retries():
-    session = requests.Session()
-    retry = Retry(
-        total=5,
-        backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["GET", "POST", "PUT"]
-    )
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('https://', adapter)
-    session.mount('http://', adapter)
-    return session
-
 def safe_strip(val):
     return val.strip() if isinstance(val, str) else val
 
@@ -60,13 +43,7 @@ def fetch_data_from_api():
     end_date = int(time.time() * 1000)
     start_date = int((datetime.now() - timedelta(days=1)).timestamp() * 1000)
 
-    url = f'https://api.trendyol.com/sapigw/suppliers/{SUPPLIER_ID}/claims'
-    credentials = f'{API_KEY}:{API_SECRET}'
-    encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-    headers = {
-        'Authorization': f'Basic {encoded_credentials}',
-        'Content-Type': 'application/json'
-    }
+    path = supplier_path('claims')
 
     all_content = []
     page = 0
@@ -83,7 +60,7 @@ def fetch_data_from_api():
             'sortDirection': 'DESC'
         }
 
-        response = requests.get(url, headers=headers, params=params)
+        response = trendyol_client.get(path, params=params)
         if response.status_code != 200:
             logger.error(f"API isteği başarısız oldu: {response.status_code} - {response.text}")
             break
@@ -372,21 +349,15 @@ def iade_onayla(claim_id):
     
     return redirect(url_for('iade_islemleri.iade_listesi'))
 
-    url = f'https://api.trendyol.com/sapigw/claims/{claim_id}/items/approve'
-    credentials = f'{API_KEY}:{API_SECRET}'
-    encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-    headers = {
-        'Authorization': f'Basic {encoded_credentials}',
-        'Content-Type': 'application/json'
-    }
+    path = f'claims/{claim_id}/items/approve'
     data = {
         "claimLineItemIdList": claim_line_item_ids,
         "params": {}
     }
 
     try:
-        response = requests.put(url, headers=headers, json=data)
-        logger.info(f"API isteği gönderildi: {response.url}, Status Code: {response.status_code}")
+        response = trendyol_client.put(path, json=data)
+        logger.info(f"API isteği gönderildi: {path}, Status Code: {response.status_code}")
         logger.debug(f"Response Text: {response.text}")
 
         if response.status_code == 200:
@@ -0,0 +1,199 @@
+# image_derivatives.py
+# Ürün görsellerinin küçültülmüş türevleri: her orijinal için SIZES genişliklerinde
+# WebP ve JPEG (WebP desteklemeyen tarayıcılar için). Türevler orijinalin içerik
+# hash'i ile adlandırılır (static/images/derived/<hash>_<genişlik>.<webp|jpg>);
+# aynı fotoğraf bir kez işlenir, dosya adı içerikle değiştiği için tarayıcıda
+# süresiz önbelleklenebilir.
+# - Üretim ortak süreç havuzunda (worker_pool) yapılır (PIL işi CPU'ya bağlı), görsel
+#   indirici orijinalleri kaydettikten hemen sonra çağırır; eksik kalanlar da tamamlanır.
+# - Şablonlar için: product_picture(barkod, 'thumb') <picture> üretir,
+#   product_image_url(barkod, 'card') tek URL döner. Türev yoksa orijinale düşer.
+#
+# Tüm depo için eksik türevleri üretmek:
+#   python image_derivatives.py [static/images]
+
+import os
+import sys
+import time
+import logging
+import threading
+
+from flask import current_app
+from markupsafe import Markup, escape
+from PIL import Image, ImageOps
+
+from image_store import image_store, STORE_DIR_NAME, STATIC_PREFIX
+from image_resolver import image_resolver, DEFAULT_IMAGE
+from worker_pool import worker_pool
+
+logger = logging.getLogger(__name__)
+
+DERIVED_DIR_NAME = 'derived'
+DERIVED_PREFIX = f"{STATIC_PREFIX}{DERIVED_DIR_NAME}/"
+SIZES = {'thumb': 160, 'card': 480}  # ad -> en fazla genişlik (px); yükseklik orantılı
+FORMATS = {'webp': {'format': 'WEBP', 'quality': 78, 'method': 4},
+           'jpg': {'format': 'JPEG', 'quality': 80, 'optimize': True, 'progressive': True}}
+CHECK_INTERVAL = 15  # saniye
+
+
+def derived_name(content_hash, size, fmt):
+    return f"{content_hash}_{SIZES[size]}.{fmt}"
+
+
+def render_derivatives(source_path, content_hash, out_dir):
+    """İşçi süreçte çalışır: eksik türevleri yazar, yazılan dosya sayısını döner."""
+    targets = [
+        (width, fmt, os.path.join(out_dir, f"{content_hash}_{width}.{fmt}"))
+        for width in SIZES.values() for fmt in FORMATS
+    ]
+    targets = [t for t in targets if not os.path.exists(t[2])]
+    if not targets:
+        return 0
+
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        resized = {}
+        for width, fmt, path in targets:
+            if width not in resized:
+                copy = image.copy()
+                copy.thumbnail((width, width * 10), Image.LANCZOS)
+                resized[width] = copy
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            resized[width].save(tmp_path, **FORMATS[fmt])
+            os.replace(tmp_path, path)
+    return len(targets)
+
+
+class DerivativePipeline:
+    def generate(self, root, originals):
+        """
+        originals: {content_hash: /static yolu}. Türevleri süreç havuzunda üretir ve
+        bitmesini bekler (arka plan thread'inden çağrılır). Dönen: yazılan dosya sayısı.
+        """
+        if not originals:
+            return 0
+        out_dir = os.path.join(root, DERIVED_DIR_NAME)
+        os.makedirs(out_dir, exist_ok=True)
+        started = time.monotonic()
+        futures = {
+            worker_pool.submit(render_derivatives, image_store.blob_path(root, path), digest, out_dir): digest
+            for digest, path in originals.items()
+        }
+        created = failed = 0
+        for future, digest in futures.items():
+            try:
+                created += future.result()
+            except Exception as e:
+                failed += 1
+                logger.error(f"{digest[:12]}: türev üretilemedi: {e}")
+        derivative_index.invalidate()
+        logger.info(
+            f"Görsel türevleri: {len(originals)} orijinal, {created} dosya yazıldı, "
+            f"{failed} hata, {time.monotonic() - started:.1f} sn"
+        )
+        return created
+
+    def missing(self, manifest):
+        """Manifestte olup türevi eksik olan orijinaller: {hash: yol}."""
+        return {
+            entry.content_hash: entry.path
+            for entry in manifest.values()
+            if not derivative_index.complete(entry.content_hash)
+        }
+
+
+class DerivativeIndex:
+    """derived klasöründeki dosya adları, bellekte (image_resolver ile aynı yenileme)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = frozenset()
+        self._mtime = None
+        self._checked = 0.0
+        self._dirty = True
+
+    def invalidate(self):
+        self._dirty = True
+
+    def _refresh_if_needed(self):
+        now = time.monotonic()
+        if not self._dirty and now - self._checked < CHECK_INTERVAL:
+            return
+        directory = os.path.join(current_app.root_path, 'static', 'images', DERIVED_DIR_NAME)
+        with self._lock:
+            if not self._dirty and now - self._checked < CHECK_INTERVAL:
+                return
+            self._checked = now
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if not self._dirty and mtime == self._mtime:
+                return
+            try:
+                names = frozenset(os.listdir(directory))
+            except FileNotFoundError:
+                names = frozenset()
+            if self._mtime is not None and mtime != self._mtime and not self._dirty:
+                # Başka bir worker yeni görseller işledi: barkod -> hash eşlemesi de yenilensin
+                image_store.load()
+            self._names = names
+            self._mtime = mtime
+            self._dirty = False
+
+    def has(self, name):
+        self._refresh_if_needed()
+        return name in self._names
+
+    def complete(self, content_hash):
+        return all(self.has(derived_name(content_hash, size, fmt)) for size in SIZES for fmt in FORMATS)
+
+
+derivative_pipeline = DerivativePipeline()
+derivative_index = DerivativeIndex()
+
+
+def product_image_url(barcode, size='card', fmt='jpg', default=DEFAULT_IMAGE):
+    """Barkodun küçültülmüş görseli; türev yoksa orijinali, o da yoksa default."""
+    entry = image_store.get(str(barcode)) if barcode else None
+    if entry is not None:
+        name = derived_name(entry.content_hash, size, fmt)
+        if derivative_index.has(name):
+            return DERIVED_PREFIX + name
+    return image_resolver.resolve(barcode, default=default)
+
+
+def product_picture(barcode, size='card', default=DEFAULT_IMAGE, alt='', **attrs):
+    """<picture>: WebP kaynağı + JPEG/orijinal <img>. attrs img'e eklenir (class_ -> class)."""
+    img_attrs = ''.join(
+        f' {escape(key.rstrip("_").replace("_", "-"))}="{escape(value)}"' for key, value in attrs.items()
+    )
+    fallback = product_image_url(barcode, size, 'jpg', default)
+    webp = product_image_url(barcode, size, 'webp', None)
+    source = f'<source type="image/webp" srcset="{escape(webp)}">' if webp and webp.endswith('.webp') else ''
+    return Markup(
+        f'<picture>{source}<img src="{escape(fallback)}" alt="{escape(alt)}" loading="lazy" '
+        f'decoding="async"{img_attrs}></picture>'
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join('static', 'images')
+    store_dir = os.path.join(root, STORE_DIR_NAME)
+    originals = {}
+    for directory, _, files in os.walk(store_dir):
+        for filename in files:
+            digest, extension = os.path.splitext(filename)
+            if extension != '.tmp':
+                relative = os.path.relpath(os.path.join(directory, filename), root).replace(os.sep, '/')
+                originals[digest] = STATIC_PREFIX + relative
+    print(f"{derivative_pipeline.generate(root, originals)} türev dosyası yazıldı.")
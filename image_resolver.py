@@ -0,0 +1,97 @@
+# image_resolver.py
+# Barkod -> görsel URL'i, bellekten. static/images bir kez os.scandir ile taranır,
+# sonraki tüm sorgular sözlükten cevaplanır (istek başına os.path.exists/listdir yok).
+# Yenileme:
+# - Görsel indirici işini bitirince invalidate() çağırır (aynı süreç hemen görür).
+# - Diğer worker'lar için klasörün mtime'ı en fazla CHECK_INTERVAL'da bir kontrol
+#   edilir (tek stat); dosya eklenip silindikçe mtime değişir ve harita yeniden kurulur.
+#   inotify yerine bu yol seçildi: ek bağımlılık yok, süreç/fork güvenli.
+
+import os
+import time
+import logging
+import threading
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Aynı barkodun birden fazla dosyası varsa öncelik sırası (eski arama sırası)
+EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif']
+CHECK_INTERVAL = 15  # saniye
+STATIC_PREFIX = '/static/images/'
+DEFAULT_IMAGE = '/static/images/default.jpg'
+
+
+def _rank(extension):
+    return EXTENSIONS.index(extension) if extension in EXTENSIONS else len(EXTENSIONS)
+
+
+class ImageResolver:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._root = None
+        self._images = {}  # barkod -> /static/images/<dosya>
+        self._mtime = None
+        self._checked = 0.0
+        self._dirty = True
+
+    def _images_root(self):
+        if self._root is None:
+            self._root = os.path.join(current_app.root_path, 'static', 'images')
+        return self._root
+
+    def _build(self, root):
+        images = {}
+        ranks = {}
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    name, extension = os.path.splitext(entry.name)
+                    extension = extension.lower()
+                    if not extension or extension.endswith('.tmp') or not entry.is_file():
+                        continue
+                    rank = _rank(extension)
+                    if name not in ranks or rank < ranks[name]:
+                        ranks[name] = rank
+                        images[name] = STATIC_PREFIX + entry.name
+        except FileNotFoundError:
+            pass
+        return images
+
+    def _refresh_if_needed(self):
+        now = time.monotonic()
+        if not self._dirty and now - self._checked < CHECK_INTERVAL:
+            return
+        root = self._images_root()
+        with self._lock:
+            if not self._dirty and now - self._checked < CHECK_INTERVAL:
+                return
+            self._checked = now
+            try:
+                mtime = os.stat(root).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if not self._dirty and mtime == self._mtime:
+                return
+            self._images = self._build(root)
+            self._mtime = mtime
+            self._dirty = False
+            logger.debug(f"Görsel haritası yenilendi: {len(self._images)} barkod")
+
+    def invalidate(self):
+        """Görseller değişti: bir sonraki sorguda harita yeniden kurulur."""
+        self._dirty = True
+
+    def resolve(self, barcode, default=DEFAULT_IMAGE):
+        if not barcode:
+            return default
+        self._refresh_if_needed()
+        return self._images.get(str(barcode), default)
+
+    def has(self, barcode):
+        self._refresh_if_needed()
+        return str(barcode) in self._images
+
+
+image_resolver = ImageResolver()
@@ -0,0 +1,261 @@
+# image_store.py
+# Ürün görselleri için içerik adresli depo.
+# - Dosya içeriğin sha256'sı ile saklanır: static/images/store/ab/<hash>.jpg.
+#   Aynı fotoğrafı kullanan tüm varyantlar tek dosyayı paylaşır.
+# - product_images tablosu manifesttir: barkod -> hash -> yol, kaynak URL ve
+#   sunucunun ETag / Last-Modified değerleri. Süreç içinde sözlük olarak tutulur;
+#   "bu barkodun görseli var mı?" sorusu dosya sistemine gitmeden cevaplanır.
+# - İndirme planı: aynı URL bir kez indirilir. Manifestte aynı URL'den zaten
+#   indirilmiş bir dosya varsa yeni barkod indirmesiz eşlenir. Kayıtlı görseller
+#   REFRESH_AFTER'dan eski ise koşullu istekle (If-None-Match / If-Modified-Since)
+#   kontrol edilir; 304'te sadece checked_at güncellenir.
+# - Eski yollar (static/images/<barkod>.jpg, products.images) hard link olarak
+#   korunur; ek disk kullanmazlar. Manifestte olmayan eski dosyalar ilk planlamada
+#   depoya alınır, aynı içerikli olanlar tek dosyaya bağlanır.
+
+import os
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from collections import namedtuple
+from urllib.parse import urlparse
+
+from flask import current_app
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import db, ProductImage
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR_NAME = 'store'
+STATIC_PREFIX = '/static/images/'
+DEFAULT_EXTENSION = '.jpg'
+REFRESH_AFTER = timedelta(days=7)
+
+ImageEntry = namedtuple('ImageEntry', 'content_hash path source_url etag last_modified size_bytes checked_at')
+
+
+def images_root():
+    return os.path.join(current_app.root_path, 'static', 'images')
+
+
+def image_extension(url):
+    return (os.path.splitext(urlparse(url).path)[1] or DEFAULT_EXTENSION).lower()
+
+
+def _entry_from_row(row):
+    return ImageEntry(row.content_hash, row.path, row.source_url, row.etag,
+                      row.last_modified, row.size_bytes, row.checked_at)
+
+
+class ImageStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._manifest = {}  # barkod -> ImageEntry
+        self._loaded = False
+
+    # --- Manifest ---------------------------------------------------------
+
+    def load(self):
+        """Manifesti veritabanından (yeniden) okur."""
+        rows = db.session.query(
+            ProductImage.barcode, ProductImage.content_hash, ProductImage.path, ProductImage.source_url,
+            ProductImage.etag, ProductImage.last_modified, ProductImage.size_bytes, ProductImage.checked_at,
+        ).all()
+        manifest = {row.barcode: _entry_from_row(row) for row in rows}
+        with self._lock:
+            self._manifest = manifest
+            self._loaded = True
+        return manifest
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def get(self, barcode):
+        self._ensure_loaded()
+        return self._manifest.get(barcode)
+
+    def has(self, barcode):
+        self._ensure_loaded()
+        return barcode in self._manifest
+
+    def url_for(self, barcode):
+        entry = self.get(barcode)
+        return entry.path if entry else None
+
+    def manifest(self):
+        """barkod -> ImageEntry kopyası."""
+        self._ensure_loaded()
+        with self._lock:
+            return dict(self._manifest)
+
+    def save(self, rows):
+        """rows: ProductImage kolonlarıyla sözlükler. Upsert edip süreç içi manifesti günceller."""
+        if not rows:
+            return
+        for i in range(0, len(rows), 500):
+            batch = rows[i:i + 500]
+            stmt = pg_insert(ProductImage.__table__).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['barcode'],
+                set_={column: stmt.excluded[column] for column in batch[0] if column != 'barcode'},
+            )
+            db.session.execute(stmt)
+        db.session.commit()
+
+        with self._lock:
+            for row in rows:
+                self._manifest[row['barcode']] = ImageEntry(
+                    row['content_hash'], row['path'], row['source_url'], row['etag'],
+                    row['last_modified'], row['size_bytes'], row['checked_at'],
+                )
+
+    def touch(self, barcodes):
+        """304 alınan görsellerin kontrol zamanını ilerletir."""
+        if not barcodes:
+            return
+        now = datetime.utcnow()
+        ProductImage.query.filter(ProductImage.barcode.in_(list(barcodes))) \
+            .update({'checked_at': now}, synchronize_session=False)
+        db.session.commit()
+        with self._lock:
+            for barcode in barcodes:
+                entry = self._manifest.get(barcode)
+                if entry:
+                    self._manifest[barcode] = entry._replace(checked_at=now)
+
+    # --- Dosyalar ---------------------------------------------------------
+
+    def store_bytes(self, root, content, extension):
+        """İçeriği hash adıyla yazar (varsa dokunmaz). Dönen: (hash, /static yolu, boyut)."""
+        digest = hashlib.sha256(content).hexdigest()
+        relative = f"{STORE_DIR_NAME}/{digest[:2]}/{digest}{extension}"
+        full_path = os.path.join(root, relative)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            tmp_path = f"{full_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, full_path)
+        return digest, STATIC_PREFIX + relative, len(content)
+
+    def blob_path(self, root, static_path):
+        return os.path.join(root, static_path[len(STATIC_PREFIX):])
+
+    def link_legacy(self, root, barcode, extension, static_path):
+        """static/images/<barkod><uzantı> depodaki dosyaya hard link olur (products.images bu yolu tutar)."""
+        blob = self.blob_path(root, static_path)
+        legacy = os.path.join(root, f"{barcode}{extension}")
+        try:
+            if os.path.exists(legacy) and os.path.samefile(legacy, blob):
+                return
+            tmp_path = f"{legacy}.{os.getpid()}.{threading.get_ident()}.tmp"
+            os.link(blob, tmp_path)
+            os.replace(tmp_path, legacy)
+        except OSError as e:
+            logger.warning(f"{barcode}: eski görsel yolu bağlanamadı: {e}")
+
+    def _adopt_legacy(self, root, barcode, url):
+        """Manifestte olmayan eski <barkod> dosyasını depoya alır; yoksa None."""
+        extension = image_extension(url)
+        legacy = os.path.join(root, f"{barcode}{extension}")
+        if not os.path.isfile(legacy):
+            return None
+        with open(legacy, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        relative = f"{STORE_DIR_NAME}/{digest[:2]}/{digest}{extension}"
+        blob = os.path.join(root, relative)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.link(legacy, blob)
+        else:
+            # Aynı içerik zaten depoda: eski dosya ona bağlanır, kopya yer kaplamaz
+            self.link_legacy(root, barcode, extension, STATIC_PREFIX + relative)
+        now = datetime.utcnow()
+        return {
+            'barcode': barcode, 'content_hash': digest, 'path': STATIC_PREFIX + relative,
+            'source_url': url, 'etag': None, 'last_modified': None, 'size_bytes': len(content),
+            'checked_at': now, 'updated_at': now,
+        }
+
+    # --- İndirme planı ----------------------------------------------------
+
+    def plan_downloads(self, root, wanted):
+        """
+        wanted: {barkod: kaynak URL}. İndirmesi gerekenleri URL başına gruplar:
+        [{'url', 'barcodes', 'extension', 'etag', 'last_modified'}]. etag/last_modified
+        doluysa istek koşullu yapılır. İndirme gerektirmeyen eşlemeler hemen kaydedilir.
+        """
+        manifest = self.load()
+        by_url = {entry.source_url: entry for entry in manifest.values() if entry.source_url}
+        now = datetime.utcnow()
+        tasks = {}
+        assigned = []
+
+        for barcode, url in wanted.items():
+            if not url:
+                continue
+            entry = manifest.get(barcode)
+            if entry is not None and entry.source_url == url:
+                if entry.checked_at and now - entry.checked_at < REFRESH_AFTER:
+                    continue
+                task = tasks.setdefault(url, self._new_task(url, entry))
+                task['barcodes'].append(barcode)
+                continue
+
+            # URL'i bilinen ama bu barkoda bağlanmamış görsel: indirmeden eşle
+            known = by_url.get(url)
+            if known is None and entry is None:
+                adopted = self._adopt_legacy(root, barcode, url)
+                if adopted:
+                    assigned.append(adopted)
+                    by_url[url] = ImageEntry(**{field: adopted[field] for field in ImageEntry._fields})
+                    continue
+            if known is not None:
+                self.link_legacy(root, barcode, image_extension(url), known.path)
+                assigned.append({
+                    'barcode': barcode, 'content_hash': known.content_hash, 'path': known.path,
+                    'source_url': url, 'etag': known.etag, 'last_modified': known.last_modified,
+                    'size_bytes': known.size_bytes, 'checked_at': known.checked_at or now, 'updated_at': now,
+                })
+                continue
+
+            task = tasks.setdefault(url, self._new_task(url, None))
+            task['barcodes'].append(barcode)
+            # Aynı URL'e koşulsuz indirme gereken barkod varsa istek koşulsuz olur
+            task['etag'] = task['last_modified'] = None
+
+        if assigned:
+            self.save(assigned)
+            logger.info(f"{len(assigned)} barkod görseli indirmeden eşlendi.")
+        return list(tasks.values())
+
+    @staticmethod
+    def _new_task(url, entry):
+        return {
+            'url': url,
+            'barcodes': [],
+            'extension': image_extension(url),
+            'etag': entry.etag if entry else None,
+            'last_modified': entry.last_modified if entry else None,
+        }
+
+    def record_download(self, root, task, content, etag=None, last_modified=None):
+        """200 yanıtını depoya yazar; manifest satırlarını döner (kaydetmez)."""
+        digest, static_path, size = self.store_bytes(root, content, task['extension'])
+        now = datetime.utcnow()
+        rows = []
+        for barcode in task['barcodes']:
+            self.link_legacy(root, barcode, task['extension'], static_path)
+            rows.append({
+                'barcode': barcode, 'content_hash': digest, 'path': static_path,
+                'source_url': task['url'], 'etag': etag, 'last_modified': last_modified,
+                'size_bytes': size, 'checked_at': now, 'updated_at': now,
+            })
+        return rows
+
+
+image_store = ImageStore()
@@ -0,0 +1,142 @@
+# keyset_pagination.py
+# (order_date, id) üzerinden imleç (cursor) tabanlı sayfalama.
+# OFFSET ve her istekte COUNT(*) yerine son görülen satırdan devam edilir;
+# 500. sayfa 1. sayfa kadar ucuzdur.
+
+import base64
+import json
+import math
+import time
+import logging
+from datetime import datetime
+from sqlalchemy import and_, or_, text
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+COUNT_CACHE_SECONDS = 60
+COUNT_CACHE_MAX_KEYS = 1000
+_count_cache = {}
+
+
+class KeysetPage:
+    """paginate() sonucuna benzer: items, total, pages + next/prev imleçleri."""
+
+    def __init__(self, items, per_page, total, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.total = total
+        self.pages = max(1, math.ceil(total / per_page)) if total else 1
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def encode_cursor(order_date, row_id, backwards=False):
+    payload = {
+        'd': order_date.isoformat() if order_date else None,
+        'i': row_id,
+        'b': 1 if backwards else 0,
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Geçersiz imleçte None döner (liste başa döner)."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        order_date = datetime.fromisoformat(payload['d']) if payload.get('d') else None
+        return order_date, int(payload['i']), bool(payload.get('b'))
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Geçersiz sayfa imleci: {token} ({e})")
+        return None
+
+
+def _after(date_col, id_col, order_date, row_id):
+    """ORDER BY order_date DESC (NULLS FIRST), id DESC sırasında imleçten sonraki satırlar."""
+    if order_date is None:
+        return or_(and_(date_col.is_(None), id_col < row_id), date_col.isnot(None))
+    return or_(date_col < order_date, and_(date_col == order_date, id_col < row_id))
+
+
+def _before(date_col, id_col, order_date, row_id):
+    """Aynı sırada imleçten önceki satırlar."""
+    if order_date is None:
+        return and_(date_col.is_(None), id_col > row_id)
+    return or_(date_col.is_(None), date_col > order_date, and_(date_col == order_date, id_col > row_id))
+
+
+def estimated_row_count(table_name):
+    """pg_class istatistiğinden tahmini satır sayısı; istatistik yoksa None."""
+    estimate = db.session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"),
+        {'t': table_name}
+    ).scalar()
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+def cached_count(cache_key, query):
+    """Filtreli sorgular için COUNT(*) sonucu kısa süre bellekte tutulur."""
+    now = time.monotonic()
+    hit = _count_cache.get(cache_key)
+    if hit and now - hit[1] < COUNT_CACHE_SECONDS:
+        return hit[0]
+    total = query.order_by(None).count()
+    if len(_count_cache) >= COUNT_CACHE_MAX_KEYS:
+        _count_cache.clear()
+    _count_cache[cache_key] = (total, now)
+    return total
+
+
+def keyset_paginate(query, model_cls, cursor=None, per_page=50, count_key=None):
+    """
+    query: model_cls üzerinde (filtreli olabilir) sorgu, sıralamasız.
+    cursor: önceki sayfadan gelen next/prev imleci.
+    count_key: filtreli sorgularda toplam sayının önbellek anahtarı;
+               verilmezse tablo istatistiğinden tahmin kullanılır.
+    """
+    date_col = model_cls.order_date
+    id_col = model_cls.id
+    position = decode_cursor(cursor)
+
+    if position is None:
+        backwards = False
+        page_query = query.order_by(date_col.desc().nulls_first(), id_col.desc())
+    else:
+        order_date, row_id, backwards = position
+        if backwards:
+            page_query = query.filter(_before(date_col, id_col, order_date, row_id)) \
+                .order_by(date_col.asc().nulls_last(), id_col.asc())
+        else:
+            page_query = query.filter(_after(date_col, id_col, order_date, row_id)) \
+                .order_by(date_col.desc().nulls_first(), id_col.desc())
+
+    # Bir fazla satır: o yönde devam var mı?
+    rows = page_query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first, last = rows[0], rows[-1]
+        # İleri giderken: devamı varsa next, başta değilsek prev.
+        # Geri giderken: geldiğimiz sayfa için next hep var, öncesi varsa prev.
+        if has_more or backwards:
+            next_cursor = encode_cursor(last.order_date, last.id)
+        if (has_more and backwards) or (position is not None and not backwards):
+            prev_cursor = encode_cursor(first.order_date, first.id, backwards=True)
+
+    if count_key:
+        total = cached_count(count_key, query)
+    else:
+        total = estimated_row_count(model_cls.__tablename__)
+        if total is None:
+            total = cached_count(model_cls.__tablename__, query)
+
+    return KeysetPage(rows, per_page, total, next_cursor=next_cursor, prev_cursor=prev_cursor)
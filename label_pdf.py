@@ -0,0 +1,439 @@
+# label_pdf.py
+# Kargo etiketleri ve sipariş fişleri için toplu, çok sayfalı PDF.
+# Tarayıcıda sayfa sayfa yazdırmak yerine seçilen siparişler / fişler sunucuda
+# tek PDF'e çizilir:
+# - Veriler istekte tek sorguyla toplanır, sayfalar CHUNK_SIZE'lık parçalar halinde
+#   ortak süreç havuzunda (worker_pool) PIL ile çizilir (1 bit, yazıcı çözünürlüğünde).
+# - Barkodlar render_cache üzerinden gelir; aynı kargo kodu / ürün barkodu diskte
+#   bir kez üretilir, işçi süreçler de aynı dosyaları kullanır.
+# - PDF geçici dosyaya (küçükse bellekte) yazılır ve parça parça gönderilir.
+#
+# Kargo etiketi: POST /labels/shipping.pdf
+#   order_numbers (form listesi, virgüllü metin ya da JSON) veya status=Yeni|İşleme Alındı
+# Sipariş fişleri: GET /siparis_fisi/toplu_pdf/<fis_ids> (siparis_fisi.py)
+
+import io
+import os
+import json
+import time
+import logging
+import tempfile
+from functools import lru_cache
+
+from flask import Blueprint, current_app, jsonify, request, send_file
+from PIL import Image, ImageDraw, ImageFont
+from sqlalchemy import distinct, func
+
+from models import OrderCreated, OrderPicking
+from render_cache import render_to_disk, FONT_PATH
+from worker_pool import worker_pool
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 25  # işçiye bir seferde gönderilen sayfa verisi
+MAX_ITEMS = 1000
+SPOOL_MAX_SIZE = 8 * 1024 * 1024  # bundan büyük PDF diske taşar
+
+LABEL_DPI = 300
+LABEL_PAGE_MM = (97, 97)  # order_label.html ile aynı ölçü
+SLIP_DPI = 150
+SLIP_PAGE_MM = (210, 297)  # A4
+BEDENLER = ('35', '36', '37', '38', '39', '40', '41')
+
+LABEL_BARCODE_OPTIONS = {'module_width': 0.3, 'module_height': 12, 'font_size': 10, 'dpi': LABEL_DPI}
+SLIP_BARCODE_OPTIONS = {'module_width': 0.25, 'module_height': 8, 'font_size': 8, 'dpi': SLIP_DPI}
+
+BOLD_FONT_PATH = os.path.join(os.path.dirname(FONT_PATH), 'arialbd.ttf')
+FALLBACK_FONTS = {
+    False: '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    True: '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+}
+LOGO_PATH = os.path.join('logo', 'gullu.png')
+
+# Toplu etikette statü ile seçilebilecek tablolar (yazdırılacak siparişler)
+STATUS_MODELS = {
+    'Yeni': OrderCreated,
+    'Created': OrderCreated,
+    'İşleme Alındı': OrderPicking,
+    'Picking': OrderPicking,
+}
+
+label_pdf_bp = Blueprint('label_pdf', __name__)
+
+
+# --- Çizim (işçi süreçte) ---------------------------------------------------
+
+@lru_cache(maxsize=32)
+def _font(size, bold=False):
+    for path in ((BOLD_FONT_PATH if bold else FONT_PATH), FALLBACK_FONTS[bold]):
+        try:
+            return ImageFont.truetype(path, size)
+        except IOError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def _px(mm, dpi):
+    return round(mm * dpi / 25.4)
+
+
+def _pt(points, dpi):
+    return round(points * dpi / 72)
+
+
+def _wrap(draw, text, font, max_width):
+    """Metni max_width piksele sığacak satırlara böler."""
+    lines = []
+    for paragraph in (text or '').splitlines() or ['']:
+        line = ''
+        for word in paragraph.split():
+            candidate = f"{line} {word}".strip()
+            if line and draw.textlength(candidate, font=font) > max_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def _paste_barcode(page, static_root, code, options, x, y, max_width):
+    """render_cache'teki barkod PNG'sini sayfaya yapıştırır, kapladığı yüksekliği döner."""
+    _, relative, _ = render_to_disk(static_root, 'code128-png', code, options)
+    with Image.open(os.path.join(static_root, relative)) as barcode_image:
+        barcode_image = barcode_image.convert('L')
+        if barcode_image.width > max_width:
+            height = round(barcode_image.height * max_width / barcode_image.width)
+            barcode_image = barcode_image.resize((max_width, height), Image.LANCZOS)
+        page.paste(barcode_image.point(lambda value: 255 if value > 127 else 0).convert('1'), (x, y))
+        return barcode_image.height
+
+
+def _page_bytes(page):
+    buffer = io.BytesIO()
+    page.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def _draw_shipping_label(static_root, label):
+    """order_label.html'in düzeni: barkod, kargo firması, sipariş no, alıcı, adres."""
+    dpi = LABEL_DPI
+    page = Image.new('1', (_px(LABEL_PAGE_MM[0], dpi), _px(LABEL_PAGE_MM[1], dpi)), 1)
+    draw = ImageDraw.Draw(page)
+    frame = _px(2, dpi)
+    draw.rectangle([frame, frame, frame + _px(87, dpi), frame + _px(87, dpi)], outline=0, width=2)
+
+    x = y = frame + _px(5, dpi)
+    max_width = _px(77, dpi)
+    if label['shipping_code']:
+        y += _paste_barcode(page, static_root, label['shipping_code'], LABEL_BARCODE_OPTIONS, x, y, max_width)
+    else:
+        draw.text((x, y), 'Barkod mevcut değil', font=_font(_pt(10, dpi)), fill=0)
+        y += _pt(14, dpi)
+    y += _px(5, dpi)
+
+    provider_font = _font(_pt(12, dpi), bold=True)
+    draw.text((x, y), label['cargo_provider'] or '', font=provider_font, fill=0)
+    y += _pt(12, dpi) + _px(10, dpi)
+
+    bold = _font(_pt(10, dpi), bold=True)
+    draw.text((x, y), f"Sipariş No: {label['order_number']}", font=bold, fill=0)
+    y += _pt(10, dpi) + _px(3, dpi)
+    draw.text((x, y), f"Alıcı: {label['customer_name']} {label['customer_surname']}", font=bold, fill=0)
+    y += _pt(10, dpi) + _px(4, dpi)
+
+    address_font = _font(_pt(9, dpi))
+    bottom = frame + _px(87, dpi) - _px(5, dpi)
+    for line in _wrap(draw, label['customer_address'], address_font, max_width):
+        if y + _pt(9, dpi) > bottom:
+            break
+        draw.text((x, y), line, font=address_font, fill=0)
+        y += _pt(9, dpi) + _px(1, dpi)
+    return page
+
+
+class _SlipPages:
+    """A4 fiş sayfaları; içerik sayfaya sığmazsa yeni sayfa açar."""
+
+    def __init__(self):
+        self.dpi = SLIP_DPI
+        self.width, self.height = _px(SLIP_PAGE_MM[0], self.dpi), _px(SLIP_PAGE_MM[1], self.dpi)
+        self.margin = _px(15, self.dpi)
+        self.pages = []
+        self._new_page()
+
+    def _new_page(self):
+        self.page = Image.new('1', (self.width, self.height), 1)
+        self.draw = ImageDraw.Draw(self.page)
+        self.pages.append(self.page)
+        self.y = self.margin
+
+    def reserve(self, height):
+        if self.y + height > self.height - self.margin and self.y > self.margin:
+            self._new_page()
+
+    def text(self, value, points=10, bold=False, align='left'):
+        font = _font(_pt(points, self.dpi), bold)
+        self.reserve(_pt(points, self.dpi))
+        x = self.margin
+        if align in ('center', 'right'):
+            free = self.width - 2 * self.margin - self.draw.textlength(value, font=font)
+            x += int(free / 2 if align == 'center' else free)
+        self.draw.text((x, self.y), value, font=font, fill=0)
+        self.y += _pt(points, self.dpi) + _px(1.5, self.dpi)
+
+    def rule(self, width=2):
+        self.draw.line([self.margin, self.y, self.width - self.margin, self.y], fill=0, width=width)
+        self.y += _px(3, self.dpi)
+
+    def space(self, mm):
+        self.y += _px(mm, self.dpi)
+
+
+def _draw_slip_table(pages, header, values):
+    """Beden / Adet tablosu (siparis_fisi_print.html'deki gibi)."""
+    dpi = pages.dpi
+    font = _font(_pt(10, dpi))
+    row_height = _px(8, dpi)
+    pages.reserve(2 * row_height)
+    columns = len(values)
+    cell = (pages.width - 2 * pages.margin) // columns
+    for row, cells in enumerate((header, values)):
+        top = pages.y + row * row_height
+        for column, value in enumerate(cells):
+            left = pages.margin + column * cell
+            pages.draw.rectangle([left, top, left + cell, top + row_height], outline=0, width=1)
+            text = str(value)
+            text_width = pages.draw.textlength(text, font=font)
+            pages.draw.text((left + (cell - text_width) / 2, top + _px(2, dpi)), text, font=font, fill=0)
+    pages.y += 2 * row_height + _px(3, dpi)
+
+
+def _draw_slip(static_root, slip):
+    pages = _SlipPages()
+    dpi = pages.dpi
+
+    logo = os.path.join(static_root, LOGO_PATH)
+    if os.path.exists(logo):
+        with Image.open(logo) as image:
+            image = image.convert('L')
+            image.thumbnail((_px(30, dpi), _px(20, dpi)))
+            pages.page.paste(image.convert('1'), ((pages.width - image.width) // 2, pages.y))
+            pages.y += image.height + _px(2, dpi)
+    pages.text('Sipariş Fişi', 16, bold=True, align='center')
+    pages.text(f"Fiş No: {slip['siparis_id']}", 10, align='center')
+    pages.text(f"Tarih: {slip['created_date']}", 10, align='center')
+    pages.rule()
+    pages.space(3)
+
+    for kalem in slip['kalemler']:
+        pages.reserve(_px(45, dpi))
+        pages.text(f"Model: {kalem['model_code']}    Renk: {kalem['color']}", 11, bold=True)
+        _draw_slip_table(pages, ('Beden',) + BEDENLER, ('Adet',) + tuple(kalem['adetler']))
+        pages.text(f"Çift Başı Fiyat: {kalem['cift_basi_fiyat']:.2f} TL", 10, align='right')
+        pages.text(f"Toplam Adet: {kalem['toplam_adet']}", 10, align='right')
+        pages.text(f"Satır Toplamı: {kalem['toplam_fiyat']:.2f} TL", 10, align='right')
+        pages.space(4)
+
+    if slip['barkodlar']:
+        pages.rule(1)
+        pages.text('Barkodlar', 11, bold=True)
+        column_width = (pages.width - 2 * pages.margin) // 2
+        for index, (beden, code) in enumerate(slip['barkodlar']):
+            column = index % 2
+            if column == 0:
+                pages.reserve(_px(22, dpi))
+            x = pages.margin + column * column_width
+            pages.draw.text((x, pages.y), f"Beden {beden}", font=_font(_pt(9, dpi)), fill=0)
+            height = _paste_barcode(pages.page, static_root, code, SLIP_BARCODE_OPTIONS,
+                                    x, pages.y + _pt(11, dpi), column_width - _px(5, dpi))
+            if column == 1 or index == len(slip['barkodlar']) - 1:
+                pages.y += _pt(11, dpi) + height + _px(4, dpi)
+
+    pages.rule()
+    pages.text(f"Toplam Adet: {slip['toplam_adet']}", 12, bold=True, align='right')
+    pages.text(f"Genel Toplam: {slip['toplam_fiyat']:.2f} TL", 12, bold=True, align='right')
+    return pages.pages
+
+
+def render_pages(kind, static_root, items):
+    """İşçi süreçte çalışır: items'ın sayfalarını PNG baytları olarak döner (sırayla)."""
+    pages = []
+    for item in items:
+        if kind == 'shipping':
+            pages.append(_page_bytes(_draw_shipping_label(static_root, item)))
+        else:
+            pages.extend(_page_bytes(page) for page in _draw_slip(static_root, item))
+    return pages
+
+
+# --- Toplu PDF --------------------------------------------------------------
+
+class BatchPdfRenderer:
+    def build(self, kind, items, dpi):
+        """items'ı parçalar halinde süreç havuzunda çizer; PDF dosya nesnesi ve sayfa sayısını döner."""
+        static_root = os.path.join(current_app.root_path, 'static')
+        started = time.monotonic()
+        futures = [
+            worker_pool.submit(render_pages, kind, static_root, items[i:i + CHUNK_SIZE])
+            for i in range(0, len(items), CHUNK_SIZE)
+        ]
+        # Image.open tembeldir; sayfalar PDF'e yazılırken çözülür
+        pages = [Image.open(io.BytesIO(page)) for future in futures for page in future.result()]
+
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        pages[0].save(output, format='PDF', save_all=True, append_images=pages[1:], resolution=dpi)
+        output.seek(0)
+        logger.info(
+            f"Toplu PDF ({kind}): {len(items)} kayıt, {len(pages)} sayfa, "
+            f"{time.monotonic() - started:.1f} sn"
+        )
+        return output, len(pages)
+
+
+batch_pdf_renderer = BatchPdfRenderer()
+
+
+def _send_pdf(output, filename):
+    return send_file(output, mimetype='application/pdf', as_attachment=False, download_name=filename)
+
+
+def shipping_labels_pdf(labels):
+    output, _ = batch_pdf_renderer.build('shipping', labels, LABEL_DPI)
+    return _send_pdf(output, f"kargo_etiketleri_{time.strftime('%Y%m%d_%H%M')}.pdf")
+
+
+def packing_slips_pdf(fisler):
+    slips = [_slip_data(fis) for fis in fisler]
+    output, _ = batch_pdf_renderer.build('slip', slips, SLIP_DPI)
+    return _send_pdf(output, f"siparis_fisleri_{time.strftime('%Y%m%d_%H%M')}.pdf")
+
+
+# --- Veri toplama (istekte) -------------------------------------------------
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _slip_data(fis):
+    """SiparisFisi -> işçiye gönderilecek düz sözlük."""
+    try:
+        kalemler = json.loads(fis.kalemler_json or '[]')
+    except ValueError:
+        kalemler = []
+    if not kalemler:
+        # Eski tek kalemli fişler: bedenler fişin kendi kolonlarında
+        kalemler = [{
+            'model_code': fis.urun_model_kodu, 'color': fis.renk,
+            **{f'beden_{beden}': getattr(fis, f'beden_{beden}') for beden in BEDENLER},
+            'cift_basi_fiyat': fis.cift_basi_fiyat,
+            'satir_toplam_adet': fis.toplam_adet, 'satir_toplam_fiyat': fis.toplam_fiyat,
+        }]
+    return {
+        'siparis_id': fis.siparis_id,
+        'created_date': fis.created_date.strftime('%d/%m/%Y %H:%M') if fis.created_date else 'Belirtilmemiş',
+        'kalemler': [{
+            'model_code': kalem.get('model_code') or '',
+            'color': kalem.get('color') or '',
+            'adetler': [int(_number(kalem.get(f'beden_{beden}'))) for beden in BEDENLER],
+            'cift_basi_fiyat': _number(kalem.get('cift_basi_fiyat')),
+            'toplam_adet': kalem.get('satir_toplam_adet') or 0,
+            'toplam_fiyat': _number(kalem.get('satir_toplam_fiyat')),
+        } for kalem in kalemler],
+        'barkodlar': [
+            (beden, getattr(fis, f'barkod_{beden}'))
+            for beden in BEDENLER if getattr(fis, f'barkod_{beden}')
+        ],
+        'toplam_adet': fis.toplam_adet or 0,
+        'toplam_fiyat': _number(fis.toplam_fiyat),
+    }
+
+
+LABEL_COLUMNS = ('order_number', 'shipping_barcode', 'cargo_provider_name',
+                 'customer_name', 'customer_surname', 'customer_address')
+
+
+def _label_row(row):
+    return {
+        'order_number': row.order_number,
+        'shipping_code': row.shipping_barcode,
+        'cargo_provider': row.cargo_provider_name,
+        'customer_name': row.customer_name or '',
+        'customer_surname': row.customer_surname or '',
+        'customer_address': row.customer_address or '',
+    }
+
+
+def _labels_for_orders(order_numbers):
+    """Sipariş no'larının etiket verisi, istenen sırada (sipariş başına bir etiket)."""
+    from order_locator import LOCATOR_MODELS
+
+    wanted = list(dict.fromkeys(order_numbers))
+    labels = {}
+    for model_cls in LOCATOR_MODELS:
+        remaining = [number for number in wanted if number not in labels]
+        if not remaining:
+            break
+        rows = model_cls.query.with_entities(*(getattr(model_cls, c) for c in LABEL_COLUMNS)) \
+            .filter(model_cls.order_number.in_(remaining)).all()
+        for row in rows:
+            labels.setdefault(row.order_number, _label_row(row))
+    return [labels[number] for number in wanted if number in labels]
+
+
+def _status_order_count(model_cls):
+    return model_cls.query.with_entities(func.count(distinct(model_cls.order_number))).scalar() or 0
+
+
+def _labels_for_status(model_cls):
+    rows = model_cls.query.with_entities(*(getattr(model_cls, c) for c in LABEL_COLUMNS)) \
+        .order_by(model_cls.order_date.asc()).all()
+    labels = {}
+    for row in rows:
+        labels.setdefault(row.order_number, _label_row(row))
+    return list(labels.values())
+
+
+def _requested_order_numbers(data):
+    if 'order_numbers' in data:
+        values = data['order_numbers'] or []
+    else:
+        values = request.values.getlist('order_numbers')
+    numbers = []
+    for value in values if isinstance(values, list) else [values]:
+        numbers.extend(part.strip() for part in str(value).split(',') if part.strip())
+    return numbers
+
+
+@label_pdf_bp.route('/labels/shipping.pdf', methods=['POST'])
+def shipping_labels():
+    data = request.get_json(silent=True) or {}
+    order_numbers = _requested_order_numbers(data)
+    status = data.get('status') or request.values.get('status')
+    if order_numbers:
+        if len(order_numbers) > MAX_ITEMS:
+            return jsonify({'success': False, 'message': f'En fazla {MAX_ITEMS} sipariş seçilebilir.'}), 400
+        labels = _labels_for_orders(order_numbers)
+    elif status in STATUS_MODELS:
+        # Sessizce kırpmak yerine reddet: fazlası PDF'te eksik kalırdı
+        total = _status_order_count(STATUS_MODELS[status])
+        if total > MAX_ITEMS:
+            return jsonify({
+                'success': False,
+                'message': f"'{status}' statüsünde {total} sipariş var; en fazla {MAX_ITEMS} yazdırılabilir, "
+                           f"siparişleri order_numbers ile seçin.",
+                'total': total,
+            }), 400
+        labels = _labels_for_status(STATUS_MODELS[status])
+    else:
+        return jsonify({'success': False, 'message': 'order_numbers veya status gerekli.'}), 400
+
+    if not labels:
+        return jsonify({'success': False, 'message': 'Yazdırılacak sipariş bulunamadı.'}), 404
+    return shipping_labels_pdf(labels)
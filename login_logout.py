@@ -5,9 +5,8 @@ from functools import wraps
 from datetime import datetime
 import pyotp
 import base64
-import qrcode
-from io import BytesIO
 from models import db, User
+from user_cache import get_cached_user, invalidate_user
 
 login_logout_bp = Blueprint('login_logout', __name__)
 
@@ -49,8 +48,9 @@ def roles_required(*roles):
                 print("No role found in session.")
                 return redirect(url_for('login_logout.login'))
 
-            # Oturumdaki rolü kontrol et
-            user_role = session.get('role')
+            # Güncel rol (önbellekten; rol değişikliği yeniden giriş beklemeden geçerli olur)
+            cached_user = get_cached_user(session.get('user_id'))
+            user_role = cached_user.role if cached_user else session.get('role')
             print(f"User role in session: {user_role}")
             print(f"Required roles: {roles}")
 
@@ -66,16 +66,11 @@ def roles_required(*roles):
 
 
 
-#  QR kodu oluşturma fonksiyonu
+#  QR kodu oluşturma fonksiyonu (TOTP anahtarı içerdiği için sadece bellekte önbelleklenir)
 def generate_qr_code(data):
-    qr = qrcode.QRCode(box_size=4, border=2)
-    qr.add_data(data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color='black', back_color='white')
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    img_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    return img_str
+    from render_cache import render_cache
+    content = render_cache.render('qr-png', data, persist=False, box_size=4, border=2, error_correction='M')
+    return base64.b64encode(content).decode('utf-8')
 
 # Kullanıcı kaydı
 @login_logout_bp.route('/register', methods=['GET', 'POST'])
@@ -117,7 +112,7 @@ def register():
 @login_logout_bp.route('/check_role', methods=['GET'])
 def check_role():
     user_id = session.get('user_id')
-    user = User.query.get(user_id)
+    user = get_cached_user(user_id)
     if user:
         return f"Kullanıcı: {user.username}, Rol: {user.role}"
     return "Kullanıcı bulunamadı"
@@ -176,6 +171,7 @@ def setup_totp():
         if totp.verify(token):
             user.totp_confirmed = True
             db.session.commit()
+            invalidate_user(user.id)
             flash('TOTP başarıyla kuruldu.', 'success')
             return redirect(url_for('login_logout.home'))
         flash('Geçersiz doğrulama kodu.', 'danger')
@@ -214,8 +210,10 @@ def delete_user(username):
         return redirect(url_for('login_logout.approve_users'))
 
     try:
+        user_id = user.id
         db.session.delete(user)
         db.session.commit()
+        invalidate_user(user_id)
         flash(f'{username} kullanıcısı başarıyla silindi.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -243,15 +241,18 @@ def approve_users():
                         role = request.form.get(f'role_{username}', 'worker')
                         user.role = role
                         db.session.commit()
+                        invalidate_user(user.id)
                         flash(f"{username} kullanıcısı onaylandı ve rolü {role} olarak ayarlandı.", 'success')
                     elif action == 'update':
                         role = request.form.get(f'role_{username}', 'worker')
                         user.role = role
                         db.session.commit()
+                        invalidate_user(user.id)
                         flash(f"{username} kullanıcısının rolü güncellendi.", 'success')
                     elif action == 'revoke':
                         user.status = 'pending'
                         db.session.commit()
+                        invalidate_user(user.id)
                         flash(f"{username} kullanıcısının onayı iptal edildi.", 'warning')
                 else:
                     flash('Kullanıcı bulunamadı.', 'danger')
@@ -1,5 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, TSVECTOR, JSONB
 from sqlalchemy import create_engine, Column, String, DateTime, ForeignKey, Integer, Float, Boolean, Text
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -203,6 +203,9 @@ class OrderBase(db.Model):
 # Yeni sipariş tablosu (Created)
 class OrderCreated(OrderBase):
     __tablename__ = 'orders_created'
+    __table_args__ = (
+        db.Index('uq_orders_created_order_number', 'order_number', unique=True),
+    )
     
     # Bu statüye özel alanlar eklenebilir
     creation_time = db.Column(db.DateTime, default=datetime.utcnow)
@@ -210,6 +213,9 @@ class OrderCreated(OrderBase):
 # İşleme alınan sipariş tablosu (Picking)
 class OrderPicking(OrderBase):
     __tablename__ = 'orders_picking'
+    __table_args__ = (
+        db.Index('uq_orders_picking_order_number', 'order_number', unique=True),
+    )
     
     # Bu statüye özel alanlar
     picking_start_time = db.Column(db.DateTime, default=datetime.utcnow)
@@ -218,6 +224,9 @@ class OrderPicking(OrderBase):
 # Kargodaki sipariş tablosu (Shipped)
 class OrderShipped(OrderBase):
     __tablename__ = 'orders_shipped'
+    __table_args__ = (
+        db.Index('uq_orders_shipped_order_number', 'order_number', unique=True),
+    )
     
     # Bu statüye özel alanlar
     shipping_time = db.Column(db.DateTime, default=datetime.utcnow)
@@ -226,6 +235,9 @@ class OrderShipped(OrderBase):
 # Teslim edilen sipariş tablosu (Delivered)
 class OrderDelivered(OrderBase):
     __tablename__ = 'orders_delivered'
+    __table_args__ = (
+        db.Index('uq_orders_delivered_order_number', 'order_number', unique=True),
+    )
     
     # Bu statüye özel alanlar
     delivery_date = db.Column(db.DateTime)
@@ -234,6 +246,9 @@ class OrderDelivered(OrderBase):
 # İptal edilen sipariş tablosu (Cancelled)
 class OrderCancelled(OrderBase):
     __tablename__ = 'orders_cancelled'
+    __table_args__ = (
+        db.Index('uq_orders_cancelled_order_number', 'order_number', unique=True),
+    )
     
     # Bu statüye özel alanlar
     cancellation_date = db.Column(db.DateTime, default=datetime.utcnow)
@@ -345,6 +360,11 @@ class Product(db.Model):
     cost_usd = db.Column(db.Float, default=0.0)  # Maliyet (USD cinsinden)
     cost_date = db.Column(db.DateTime)  # Maliyet girişi tarihi
     cost_try = db.Column(db.Float, default=0) #tl karşılığı
+    # Arama için (bkz. search_index.py); listelerde yüklenmez
+    search_vector = db.deferred(db.Column(
+        TSVECTOR,
+        db.Computed("to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(product_main_id, ''))", persisted=True)
+    ))
 
     def __init__(self, barcode, original_product_barcode, title, product_main_id, 
                  quantity, images, variants, size, color, archived, locked, on_sale,
@@ -428,6 +448,11 @@ class YeniSiparis(db.Model):
     toplam_tutar = db.Column(db.Float)
     durum = db.Column(db.String, default='Yeni')
     notlar = db.Column(db.Text)
+    # Müşteri adı araması için (bkz. search_index.py)
+    search_vector = db.deferred(db.Column(
+        TSVECTOR,
+        db.Computed("to_tsvector('simple', coalesce(musteri_adi, '') || ' ' || coalesce(musteri_soyadi, ''))", persisted=True)
+    ))
 
 class SiparisUrun(db.Model):
     __tablename__ = 'siparis_urunler'
@@ -490,14 +515,164 @@ class Return(db.Model):
 
     def __repr__(self):
         return f"<Return {self.claim_id}>"
+
+
+# Sipariş senkronizasyonu için statü bazlı high-water mark (PackageLastModifiedDate, ms)
+class OrderSyncState(db.Model):
+    __tablename__ = 'order_sync_state'
+
+    status = db.Column(db.String(50), primary_key=True)
+    last_modified_ms = db.Column(db.BigInteger)
+    last_synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_full_sync_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<OrderSyncState {self.status} {self.last_modified_ms}>"
+
+
+# Arka plan senkronizasyon işleri (Trendyol çekimleri); geçmiş ve ilerleme burada tutulur, bkz. sync_jobs.py
+class SyncJob(db.Model):
+    __tablename__ = 'sync_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    params = db.Column(JSONB)
+    progress = db.Column(db.Text)
+    error = db.Column(db.Text)
+    requested_by = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Aynı türden aynı anda tek aktif iş (tüm worker'lar arasında)
+        db.Index('ux_sync_jobs_active', 'job_type', unique=True,
+                 postgresql_where=db.text("status IN ('queued', 'running')")),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'params': self.params or {},
+            'progress': self.progress,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f"<SyncJob {self.id} {self.job_type} {self.status}>"
+
+
+# Ürün görselleri manifesti: barkod -> içerik hash'i -> dosya (image_store.py)
+# Aynı fotoğrafı kullanan varyantlar tek dosyayı paylaşır.
+class ProductImage(db.Model):
+    __tablename__ = 'product_images'
+
+    barcode = db.Column(db.String, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False, index=True)  # sha256
+    path = db.Column(db.String, nullable=False)  # /static/images/store/ab/<hash>.jpg
+    source_url = db.Column(db.String)
+    etag = db.Column(db.String)
+    last_modified = db.Column(db.String)  # sunucunun gönderdiği haliyle (If-Modified-Since için)
+    size_bytes = db.Column(db.Integer)
+    checked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ProductImage {self.barcode} {self.content_hash[:12]}>"
+
+
+# order_number -> bulunduğu statü tablosu ve satır id'si (tek sorguda sipariş bulma)
+class OrderLocator(db.Model):
+    __tablename__ = 'order_locator'
+
+    order_number = db.Column(db.String, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<OrderLocator {self.order_number} {self.table_name}:{self.row_id}>"
+
+
+# Beş statü tablosunun birleşik kopyası (trigger ile güncel tutulur, bkz. all_orders_table.py)
+class AllOrder(db.Model):
+    __tablename__ = 'all_orders'
+
+    status_name = db.Column(db.String(20), primary_key=True)  # kaynak tablo: Created, Picking, ...
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # kaynak tablodaki id
+    order_number = db.Column(db.String, index=True)
+    order_date = db.Column(db.DateTime, index=True)
+    status = db.Column(db.String)
+    details = db.Column(db.Text)
+    merchant_sku = db.Column(db.String)
+    product_barcode = db.Column(db.String)
+    product_main_id = db.Column(db.String)
+    product_color = db.Column(db.String)
+    product_size = db.Column(db.String)
+    amount = db.Column(db.Float)
+    quantity = db.Column(db.Integer)
+    commission = db.Column(db.Float)
+    cargo_provider_name = db.Column(db.String)
+    customer_name = db.Column(db.String)
+    customer_surname = db.Column(db.String)
+    customer_address = db.Column(db.Text)
+    shipping_barcode = db.Column(db.String)
+    agreed_delivery_date = db.Column(db.DateTime)
+    estimated_delivery_end = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_all_orders_status_name_order_date', 'status_name', 'order_date'),
+    )
+
+    def __repr__(self):
+        return f"<AllOrder {self.status_name}:{self.order_number}>"
+
+
+# Aylık range partition'lı (timestamp); tablo ve partition'lar user_log_partitions.py ile yönetilir
 class UserLog(db.Model):
     __tablename__ = 'user_logs'
-    id = db.Column(db.Integer, primary_key=True)
+    __table_args__ = {'postgresql_partition_by': 'RANGE ("timestamp")'}
+
+    # Bileşik anahtarda SQLAlchemy id'yi kendiliğinden autoincrement saymaz (BIGSERIAL)
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     action = db.Column(db.String(255), nullable=False)
-    details = db.Column(db.Text)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    details = db.Column(JSONB)
+    timestamp = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)
     ip_address = db.Column(db.String(45))
     page_url = db.Column(db.String(255))
     
     user = db.relationship('User', backref=db.backref('logs', lazy=True))
+
+
+# Saklama süresi dolan user_logs partition'larının günlük özeti
+class UserLogDaily(db.Model):
+    __tablename__ = 'user_log_daily'
+
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    action = db.Column(db.String(255), primary_key=True)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Günlük satış özeti: gün x statü x ürün varyantı (all_orders üzerindeki trigger ile güncel, bkz. sales_rollup.py)
+class DailySalesRollup(db.Model):
+    __tablename__ = 'daily_sales_rollup'
+
+    sale_date = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String, primary_key=True, default='')  # NULL değerler '' olarak tutulur
+    product_main_id = db.Column(db.String, primary_key=True, default='')
+    merchant_sku = db.Column(db.String, primary_key=True, default='')
+    product_color = db.Column(db.String, primary_key=True, default='')
+    product_size = db.Column(db.String, primary_key=True, default='')
+    order_count = db.Column(db.BigInteger, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric, nullable=False, default=0)
+    total_quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    total_commission = db.Column(db.Numeric, nullable=False, default=0)
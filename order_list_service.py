@@ -1,14 +1,16 @@
 # order_list_service.py
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from sqlalchemy import literal
 from sqlalchemy.orm import aliased
 import json
-import os
 import logging
 from datetime import datetime
 
-from models import db, Product, OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled
+from models import db, Product, AllOrder, OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled
+from order_locator import find_order_across_tables
+from keyset_pagination import keyset_paginate
+from search_index import search_filter
+from image_resolver import image_resolver
 from barcode_utils import generate_barcode  # Bunu yalnızca generate_barcode için kullanıyoruz
 
 order_list_service_bp = Blueprint('order_list_service', __name__)
@@ -20,16 +22,9 @@ logger = logging.getLogger(__name__)
 ############################
 def get_product_image(barcode):
     """
-    Ürün barkoduna göre resim dosyası yolunu döndürür.
+    Ürün barkoduna göre resim dosyası yolunu döndürür (bellekteki haritadan).
     """
-    images_folder = os.path.join('static', 'images')
-    extensions = ['.jpg', '.jpeg', '.png', '.gif']
-    for ext in extensions:
-        image_filename = f"{barcode}{ext}"
-        image_path = os.path.join(images_folder, image_filename)
-        if os.path.exists(image_path):
-            return f"/static/images/{image_filename}"
-    return "/static/logo/gullu.png"
+    return image_resolver.resolve(barcode, default="/static/logo/gullu.png")
 
 
 ############################
@@ -37,104 +32,34 @@ def get_product_image(barcode):
 ############################
 def get_union_all_orders():
     """
-    Beş tabloda ortak kolonları seçip UNION ALL ile birleştirir.
+    Beş tablonun ortak kolonları. Artık her istekte UNION ALL kurulmuyor;
+    trigger ile güncel tutulan all_orders tablosundan okunuyor.
     Kargo firması, tahmini teslim tarihi vs. kolonları da ekliyoruz.
     """
-
-    c = db.session.query(
-        OrderCreated.id.label('id'),
-        OrderCreated.order_number.label('order_number'),
-        OrderCreated.order_date.label('order_date'),
-        OrderCreated.details.label('details'),
-        OrderCreated.merchant_sku.label('merchant_sku'),
-        OrderCreated.product_barcode.label('product_barcode'),
-        OrderCreated.cargo_provider_name.label('cargo_provider_name'),
-        OrderCreated.customer_name.label('customer_name'),
-        OrderCreated.customer_surname.label('customer_surname'),
-        OrderCreated.customer_address.label('customer_address'),
-        OrderCreated.shipping_barcode.label('shipping_barcode'),
-        OrderCreated.agreed_delivery_date.label('agreed_delivery_date'),
-        OrderCreated.estimated_delivery_end.label('estimated_delivery_end'),
-        literal('Created').label('status_name')
-    )
-
-    p = db.session.query(
-        OrderPicking.id.label('id'),
-        OrderPicking.order_number.label('order_number'),
-        OrderPicking.order_date.label('order_date'),
-        OrderPicking.details.label('details'),
-        OrderPicking.merchant_sku.label('merchant_sku'),
-        OrderPicking.product_barcode.label('product_barcode'),
-        OrderPicking.cargo_provider_name.label('cargo_provider_name'),
-        OrderPicking.customer_name.label('customer_name'),
-        OrderPicking.customer_surname.label('customer_surname'),
-        OrderPicking.customer_address.label('customer_address'),
-        OrderPicking.shipping_barcode.label('shipping_barcode'),
-        OrderPicking.agreed_delivery_date.label('agreed_delivery_date'),
-        OrderPicking.estimated_delivery_end.label('estimated_delivery_end'),
-        literal('Picking').label('status_name')
-    )
-
-    s = db.session.query(
-        OrderShipped.id.label('id'),
-        OrderShipped.order_number.label('order_number'),
-        OrderShipped.order_date.label('order_date'),
-        OrderShipped.details.label('details'),
-        OrderShipped.merchant_sku.label('merchant_sku'),
-        OrderShipped.product_barcode.label('product_barcode'),
-        OrderShipped.cargo_provider_name.label('cargo_provider_name'),
-        OrderShipped.customer_name.label('customer_name'),
-        OrderShipped.customer_surname.label('customer_surname'),
-        OrderShipped.customer_address.label('customer_address'),
-        OrderShipped.shipping_barcode.label('shipping_barcode'),
-        OrderShipped.agreed_delivery_date.label('agreed_delivery_date'),
-        OrderShipped.estimated_delivery_end.label('estimated_delivery_end'),
-        literal('Shipped').label('status_name')
-    )
-
-    d = db.session.query(
-        OrderDelivered.id.label('id'),
-        OrderDelivered.order_number.label('order_number'),
-        OrderDelivered.order_date.label('order_date'),
-        OrderDelivered.details.label('details'),
-        OrderDelivered.merchant_sku.label('merchant_sku'),
-        OrderDelivered.product_barcode.label('product_barcode'),
-        OrderDelivered.cargo_provider_name.label('cargo_provider_name'),
-        OrderDelivered.customer_name.label('customer_name'),
-        OrderDelivered.customer_surname.label('customer_surname'),
-        OrderDelivered.customer_address.label('customer_address'),
-        OrderDelivered.shipping_barcode.label('shipping_barcode'),
-        OrderDelivered.agreed_delivery_date.label('agreed_delivery_date'),
-        OrderDelivered.estimated_delivery_end.label('estimated_delivery_end'),
-        literal('Delivered').label('status_name')
-    )
-
-    x = db.session.query(
-        OrderCancelled.id.label('id'),
-        OrderCancelled.order_number.label('order_number'),
-        OrderCancelled.order_date.label('order_date'),
-        OrderCancelled.details.label('details'),
-        OrderCancelled.merchant_sku.label('merchant_sku'),
-        OrderCancelled.product_barcode.label('product_barcode'),
-        OrderCancelled.cargo_provider_name.label('cargo_provider_name'),
-        OrderCancelled.customer_name.label('customer_name'),
-        OrderCancelled.customer_surname.label('customer_surname'),
-        OrderCancelled.customer_address.label('customer_address'),
-        OrderCancelled.shipping_barcode.label('shipping_barcode'),
-        OrderCancelled.agreed_delivery_date.label('agreed_delivery_date'),
-        OrderCancelled.estimated_delivery_end.label('estimated_delivery_end'),
-        literal('Cancelled').label('status_name')
+    return db.session.query(
+        AllOrder.id.label('id'),
+        AllOrder.order_number.label('order_number'),
+        AllOrder.order_date.label('order_date'),
+        AllOrder.details.label('details'),
+        AllOrder.merchant_sku.label('merchant_sku'),
+        AllOrder.product_barcode.label('product_barcode'),
+        AllOrder.cargo_provider_name.label('cargo_provider_name'),
+        AllOrder.customer_name.label('customer_name'),
+        AllOrder.customer_surname.label('customer_surname'),
+        AllOrder.customer_address.label('customer_address'),
+        AllOrder.shipping_barcode.label('shipping_barcode'),
+        AllOrder.agreed_delivery_date.label('agreed_delivery_date'),
+        AllOrder.estimated_delivery_end.label('estimated_delivery_end'),
+        AllOrder.status_name.label('status_name')
     )
 
-    return c.union_all(p, s, d, x)
-
 
 ############################
 # 2) Tüm siparişleri listeleme
 ############################
 def get_order_list():
     """
-    Tüm tabloları tek listede gösterir (UNION ALL).
+    Tüm tabloları tek listede gösterir (all_orders).
     Arama (order_number) + sayfalama yapar.
     """
     try:
@@ -151,7 +76,7 @@ def get_order_list():
         # Arama
         if search_query:
             search_query = search_query.strip()
-            q = q.filter(AllOrders.c.order_number.ilike(f"%{search_query}%"))
+            q = q.filter(search_filter(search_query, [AllOrders.c.order_number]))
             logger.debug(f"Arama sorgusuna göre filtre: {search_query}")
 
         from sqlalchemy import desc
@@ -304,8 +229,11 @@ def get_filtered_orders(status):
             flash(f"{status} durumuna ait tablo bulunamadı.", "warning")
             return redirect(url_for('home.home'))
 
-        orders_query = model_cls.query.order_by(model_cls.order_date.desc())
-        paginated_orders = orders_query.paginate(page=page, per_page=per_page, error_out=False)
+        paginated_orders = keyset_paginate(
+            model_cls.query, model_cls,
+            cursor=request.args.get('cursor'),
+            per_page=per_page
+        )
         orders = paginated_orders.items
         total_pages = paginated_orders.pages
         total_orders_count = paginated_orders.total
@@ -330,7 +258,9 @@ def get_filtered_orders(status):
             orders=orders,
             page=page,
             total_pages=total_pages,
-            total_orders_count=total_orders_count
+            total_orders_count=total_orders_count,
+            next_cursor=paginated_orders.next_cursor,
+            prev_cursor=paginated_orders.prev_cursor
         )
     except Exception as e:
         logger.error(f"Hata: get_filtered_orders - {e}")
@@ -343,15 +273,14 @@ def get_filtered_orders(status):
 ############################
 def search_order_by_number(order_number):
     """
-    Eski kod Order tablosunda arıyordu; şimdi beş tabloyu da kontrol ediyoruz.
+    Eski kod Order tablosunda arıyordu; şimdi order_locator üzerinden tek sorguyla buluyoruz.
     """
     try:
         logger.debug(f"Sipariş aranıyor: {order_number}")
-        for model_cls in (OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled):
-            order = model_cls.query.filter_by(order_number=order_number).first()
-            if order:
-                logger.debug(f"Buldum: {order} tablo {model_cls.__tablename__}")
-                return order
+        order, model_cls = find_order_across_tables(order_number)
+        if order:
+            logger.debug(f"Buldum: {order} tablo {model_cls.__tablename__}")
+            return order
         logger.debug("Sipariş bulunamadı.")
         return None
     except Exception as e:
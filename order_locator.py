@@ -0,0 +1,121 @@
+# order_locator.py
+# order_number -> (statü tablosu, id) eşlemesi. Sipariş, beş tabloda sırayla
+# aranmak yerine order_locator üzerinden tek indeksli sorguyla bulunur.
+# Tablo, upsert (order_upsert) ve taşıma (order_transition) yollarından beslenir;
+# başka yoldan silinen/taşınan kayıtlar ilk aramada tam taramayla düzeltilir.
+
+import logging
+from datetime import datetime
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import db, OrderLocator, OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled
+
+logger = logging.getLogger(__name__)
+
+# Arama sırası eski find_order_across_tables ile aynı
+LOCATOR_MODELS = (OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled)
+MODEL_BY_TABLE = {cls.__tablename__: cls for cls in LOCATOR_MODELS}
+
+LOCATOR_BATCH_SIZE = 1000
+
+
+def ensure_order_locator(engine):
+    """
+    order_locator boşsa mevcut statü tablolarından doldurur.
+    Uygulama açılışında çağrılır; tablo doluysa hiçbir şey yapmaz.
+    """
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM order_locator LIMIT 1")).first():
+            return
+        total = 0
+        # Kopya varsa en sondaki tablo kazanır (sipariş ileri statüdedir)
+        for model_cls in LOCATOR_MODELS:
+            table = model_cls.__tablename__
+            total += conn.execute(text(
+                f"INSERT INTO order_locator (order_number, table_name, row_id, updated_at) "
+                f"SELECT order_number, '{table}', id, now() FROM {table} WHERE order_number IS NOT NULL "
+                f"ON CONFLICT (order_number) DO UPDATE SET "
+                f"table_name = EXCLUDED.table_name, row_id = EXCLUDED.row_id, updated_at = EXCLUDED.updated_at"
+            )).rowcount or 0
+        logger.info(f"order_locator dolduruldu: {total} kayıt.")
+
+
+def record_order_locations(model_cls, locations, conn=None):
+    """
+    locations: (order_number, id) çiftleri. Siparişin artık model_cls tablosunda
+    olduğunu kaydeder. conn verilmezse db.session kullanılır; commit çağırana aittir.
+    """
+    executor = conn if conn is not None else db.session
+    rows = {
+        str(order_number): row_id
+        for order_number, row_id in locations
+        if order_number
+    }
+    if not rows:
+        return
+
+    now = datetime.utcnow()
+    items = [
+        {'order_number': number, 'table_name': model_cls.__tablename__, 'row_id': row_id, 'updated_at': now}
+        for number, row_id in rows.items()
+    ]
+    for i in range(0, len(items), LOCATOR_BATCH_SIZE):
+        insert_stmt = pg_insert(OrderLocator).values(items[i:i + LOCATOR_BATCH_SIZE])
+        excluded = insert_stmt.excluded
+        executor.execute(insert_stmt.on_conflict_do_update(
+            index_elements=['order_number'],
+            set_={
+                'table_name': excluded.table_name,
+                'row_id': excluded.row_id,
+                'updated_at': excluded.updated_at,
+            }
+        ))
+
+
+def forget_order_locations(order_numbers, conn=None):
+    """Statü tablolarından çıkan (ör. arşive alınan) siparişlerin kaydını siler."""
+    numbers = [str(n) for n in order_numbers if n]
+    if numbers:
+        executor = conn if conn is not None else db.session
+        executor.execute(delete(OrderLocator).where(OrderLocator.order_number.in_(numbers)))
+
+
+def _scan_order_tables(order_number):
+    for model_cls in LOCATOR_MODELS:
+        obj = model_cls.query.filter_by(order_number=order_number).first()
+        if obj:
+            return obj, model_cls
+    return None, None
+
+
+def find_order_across_tables(order_number):
+    """
+    order_number'a sahip siparişi bulur.
+    Bulursa (obj, tablo_sinifi), bulamazsa (None, None) döndürür.
+    """
+    if not order_number:
+        return None, None
+    order_number = str(order_number)
+
+    location = db.session.get(OrderLocator, order_number)
+    if location:
+        model_cls = MODEL_BY_TABLE.get(location.table_name)
+        obj = db.session.get(model_cls, location.row_id) if model_cls else None
+        if obj is not None and obj.order_number == order_number:
+            return obj, model_cls
+
+    # Kayıt yok ya da bayat: tam tarama. Düzeltme ayrı bağlantıda yapılır ki
+    # çağıranın oturumundaki bekleyen değişiklikler commit edilmesin.
+    obj, model_cls = _scan_order_tables(order_number)
+    if obj is None and location is None:
+        return None, None
+    try:
+        with db.engine.begin() as conn:
+            if obj is not None:
+                record_order_locations(model_cls, [(obj.order_number, obj.id)], conn=conn)
+            else:
+                forget_order_locations([order_number], conn=conn)
+    except Exception as e:
+        logger.warning(f"order_locator düzeltilemedi ({order_number}): {e}")
+    return obj, model_cls
@@ -2,12 +2,12 @@
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 import asyncio
-import aiohttp
-import base64
 import json
 import traceback
 import logging
 from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError
 import threading
 
@@ -19,15 +19,21 @@ from models import (
     OrderShipped,
     OrderDelivered,
     OrderCancelled,
-    OrderArchived
+    OrderArchived,
+    OrderSyncState
 )
 
-# Trendyol API kimlik bilgileri
-from trendyol_api import API_KEY, API_SECRET, SUPPLIER_ID
+# Trendyol API istemcisi (ortak bağlantı havuzu, hız sınırı, yeniden deneme)
+from trendyol_client import trendyol_client, supplier_path
+from adaptive_concurrency import AdaptiveConcurrency
 
 # İsteğe bağlı: Sipariş detayı işleme, update service
 from order_list_service import process_order_details
+from order_upsert import upsert_orders
+from order_transition import transition_orders
+from keyset_pagination import keyset_paginate
 from update_service import update_package_to_picking
+from sync_jobs import sync_job, report_progress, enqueue_for_request
 
 # Blueprint
 order_service_bp = Blueprint('order_service', __name__)
@@ -52,149 +58,406 @@ STATUS_TABLE_MAP = {
     'Cancelled': OrderCancelled
 }
 
+# Arka planda (thread) işlenen statüler
+BG_STATUSES = ('Shipped', 'Delivered')
+
 ############################
 # 1) Trendyol'dan Sipariş Çekme (Asenkron)
 ############################
+# Trendyol'dan çekilen statüler; her biri için ayrı high-water mark tutulur
+SYNC_STATUSES = ('Created', 'Picking', 'Invoiced', 'Shipped', 'Delivered', 'Cancelled')
+
+# Akış hattı ayarları: kuyrukta bekleyebilecek en fazla sayfa ve DB parti boyutu
+PAGE_QUEUE_SIZE = 4
+INGEST_BATCH_SIZE = 1000
+
 @order_service_bp.route('/fetch-trendyol-orders', methods=['POST'])
 def fetch_trendyol_orders_route():
     """
-    UI veya Postman vb. üzerinden tetiklenen endpoint.
-    Asenkron olarak Trendyol siparişlerini çeker.
+    UI veya Postman vb. üzerinden tetiklenen endpoint. Senkronizasyonu arka plan
+    işi olarak başlatır ve hemen döner; ilerleme /jobs/<id> üzerinden izlenir.
+    Varsayılan olarak sadece son senkronizasyondan beri değişen paketleri çeker.
+    Formdan full_resync=1 gelirse tüm geçmiş yeniden çekilir (onarım için).
     """
+    full_resync = request.values.get('full_resync') in ('1', 'true', 'on')
     try:
-        asyncio.run(fetch_trendyol_orders_async())
-        flash('Siparişler başarıyla güncellendi!', 'success')
+        job, created = enqueue_for_request('orders', {'full_resync': full_resync})
+        if created:
+            flash(f'Sipariş senkronizasyonu arka planda başlatıldı (iş #{job.id}).', 'success')
+        else:
+            flash(f'Sipariş senkronizasyonu zaten çalışıyor (iş #{job.id}).', 'info')
     except Exception as e:
         logger.error(f"Hata: fetch_trendyol_orders_route - {e}")
-        traceback.print_exc()
-        flash('Siparişler güncellenirken bir hata oluştu.', 'danger')
+        flash('Sipariş senkronizasyonu başlatılamadı.', 'danger')
     return redirect(url_for('order_list_service.order_list_all'))
 
 
-async def fetch_trendyol_orders_async():
+@sync_job('orders', 'Sipariş senkronizasyonu', params={'full_resync': bool})
+def sync_orders_job(full_resync=False):
+    return asyncio.run(fetch_trendyol_orders_async(full_resync=full_resync))
+
+
+def get_sync_watermarks():
     """
-    Trendyol API'ye asenkron istek atar, tüm sayfaları paralel çekip
-    process_all_orders fonksiyonuna iletir.
+    order_sync_state tablosundan statü -> son görülen PackageLastModifiedDate (ms) sözlüğü döndürür.
     """
-    try:
-        auth_str = f"{API_KEY}:{API_SECRET}"
-        b64_auth_str = base64.b64encode(auth_str.encode()).decode('utf-8')
-        url = f"https://api.trendyol.com/sapigw/suppliers/{SUPPLIER_ID}/orders"
-        headers = {
-            "Authorization": f"Basic {b64_auth_str}",
-            "Content-Type": "application/json"
+    rows = OrderSyncState.query.all()
+    return {r.status: r.last_modified_ms for r in rows if r.last_modified_ms}
+
+
+def save_sync_watermarks(watermarks, full_sync=False):
+    """
+    Statü bazlı high-water mark'ları upsert eder. Değer sadece ileri gider (GREATEST).
+    """
+    if not watermarks:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {
+            'status': st,
+            'last_modified_ms': ms,
+            'last_synced_at': now,
+            'last_full_sync_at': now if full_sync else None
         }
+        for st, ms in watermarks.items() if ms
+    ]
+    if not rows:
+        return
+    try:
+        insert_stmt = pg_insert(OrderSyncState).values(rows)
+        upsert_stmt = insert_stmt.on_conflict_do_update(
+            index_elements=['status'],
+            set_={
+                'last_modified_ms': func.greatest(OrderSyncState.last_modified_ms, insert_stmt.excluded.last_modified_ms),
+                'last_synced_at': insert_stmt.excluded.last_synced_at,
+                'last_full_sync_at': func.coalesce(insert_stmt.excluded.last_full_sync_at, OrderSyncState.last_full_sync_at)
+            }
+        )
+        db.session.execute(upsert_stmt)
+        db.session.commit()
+        logger.info(f"Senkronizasyon işaretleri güncellendi: {watermarks}")
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Senkronizasyon işaretleri kaydedilemedi: {e}")
 
-        params = {
-            "status": "Created,Picking,Invoiced,Shipped,Delivered,Cancelled",
+
+def _package_modified_ms(order_data):
+    """
+    Paketin son değişiklik zamanı (ms). Alan yoksa 0.
+    """
+    return safe_int(order_data.get('lastModifiedDate'), 0)
+
+
+def _collect_watermarks(orders):
+    """
+    Gelen paketlerden statü bazlı en büyük lastModifiedDate değerini çıkarır.
+    """
+    marks = {}
+    for od in orders:
+        st = (od.get('status') or '').strip()
+        ms = _package_modified_ms(od)
+        if st and ms > marks.get(st, 0):
+            marks[st] = ms
+    return marks
+
+
+async def fetch_trendyol_orders_async(full_resync=False):
+    """
+    Trendyol siparişlerini üretici/tüketici hattı ile çeker ve yazar:
+    - Üretici: sayfaları çeker, sınırlı bir asyncio.Queue'ya koyar
+      (kuyruk doluysa bekler; bellekte en fazla PAGE_QUEUE_SIZE sayfa durur).
+    - Tüketici: sayfaları INGEST_BATCH_SIZE'lık partilere toplar ve DB'ye
+      ayrı bir thread'de yazar; böylece ağ ve DB süreleri üst üste biner.
+
+    full_resync=True: tüm statülerin tüm sayfaları paralel çekilir (eski davranış).
+    full_resync=False: her statü için kayıtlı high-water mark'tan yeni paketler
+    çekilir; PackageLastModifiedDate DESC sıralı olduğundan, işaretin altına
+    inen ilk sayfada durulur. İşareti olmayan statüler tam çekilir.
+    """
+    try:
+        base_params = {
             "page": 0,
             "size": 500,  # Daha az sayfa ile çekmek için
             "orderByField": "PackageLastModifiedDate",
             "orderByDirection": "DESC"
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, params=params) as response:
-                data = await response.json()
-                if response.status != 200:
-                    logger.error(f"API Error: {response.status} - {data}")
-                    return
+        watermarks = {} if full_resync else get_sync_watermarks()
+        archived_set = {o.order_number for o in OrderArchived.query.with_entities(OrderArchived.order_number)}
+        app = current_app._get_current_object()
 
-                total_elements = data.get('totalElements', 0)
-                total_pages = data.get('totalPages', 1)
-                logger.info(f"Toplam sipariş sayısı: {total_elements}, Toplam sayfa sayısı: {total_pages}")
+        queue = asyncio.Queue(maxsize=PAGE_QUEUE_SIZE)
+        fetch_failures = {}  # statü -> çekilemeyen sayfa sayısı
+        # Sayfa eşzamanlılığı API'nin yanıtlarına göre ayarlanır (429/zaman aşımında düşer)
+        limiter = AdaptiveConcurrency('orders', initial=10, maximum=32)
 
-                from asyncio import Semaphore, gather
-                sem = Semaphore(10)
-                tasks = []
-                # İlk sayfadan gelen siparişler
-                all_orders_data = data.get('content', [])
+        async def producer():
+            try:
+                if full_resync:
+                    params = dict(base_params, status=",".join(SYNC_STATUSES))
+                    await produce_all_order_pages(params, limiter, queue, fetch_failures)
+                    return
 
-                # Ek sayfalar varsa paralel çek
-                for page_number in range(1, total_pages):
-                    params_page = dict(params, page=page_number)
-                    tasks.append(fetch_orders_page(session, url, headers, params_page, sem))
+                full_statuses = [st for st in SYNC_STATUSES if st not in watermarks]
+                delta_statuses = [st for st in SYNC_STATUSES if st in watermarks]
 
-                if tasks:
-                    pages_data = await gather(*tasks)
-                    for orders in pages_data:
-                        all_orders_data.extend(orders)
+                if full_statuses:
+                    logger.info(f"İşareti olmayan statüler tam çekiliyor: {full_statuses}")
+                    params = dict(base_params, status=",".join(full_statuses))
+                    await produce_all_order_pages(params, limiter, queue, fetch_failures)
 
-                logger.info(f"Toplam çekilen sipariş sayısı: {len(all_orders_data)}")
-                process_all_orders(all_orders_data)
+                for st in delta_statuses:
+                    params = dict(base_params, status=st)
+                    await produce_order_pages_since(params, watermarks[st], queue, fetch_failures)
+            finally:
+                await queue.put(None)  # Bitiş işareti
+
+        producer_task = asyncio.create_task(producer())
+        try:
+            result = await consume_order_pages(queue, app, archived_set, limiter)
+            await producer_task
+        finally:
+            concurrency = limiter.close()
+
+        failed_pages = sum(fetch_failures.values())
+        failed_statuses = result['failed_statuses'] | set(fetch_failures)
+        logger.info(
+            f"Senkronizasyon bitti (full_resync={full_resync}): {result['total']} paket, "
+            f"{result['batches']} parti, çekilemeyen sayfa: {failed_pages}, "
+            f"hatalı statüler: {sorted(failed_statuses)}, "
+            f"eşzamanlılık: son {concurrency['level']} / en yüksek {concurrency['peak']}"
+        )
+
+        # Sadece tüm sayfaları çekilip hatasız yazılan statülerin işareti ilerler;
+        # diğerleri bir sonraki çekimde eski işaretten tekrar taranır.
+        marks = {st: ms for st, ms in result['watermarks'].items() if st not in failed_statuses}
+        save_sync_watermarks(marks, full_sync=full_resync)
+
+        summary = f"{result['total']} paket, {result['batches']} parti yazıldı"
+        if failed_pages or failed_statuses:
+            summary += (f"; {failed_pages} sayfa çekilemedi, işareti ilerlemeyen statüler: "
+                        f"{', '.join(sorted(failed_statuses))}")
+        report_progress(summary)
+        return {
+            'total': result['total'],
+            'batches': result['batches'],
+            'failed_pages': failed_pages,
+            'failed_statuses': sorted(failed_statuses),
+        }
 
     except Exception as e:
         logger.error(f"Hata: fetch_trendyol_orders_async - {e}")
         traceback.print_exc()
+        raise
 
 
-async def fetch_orders_page(session, url, headers, params, semaphore):
+async def consume_order_pages(queue, app, archived_set, limiter=None):
+    """
+    Kuyruktan gelen sayfaları partiler halinde DB'ye yazar.
+    DB işi asyncio.to_thread ile yapılır, olay döngüsü sayfa çekmeye devam eder.
+    """
+    seen_numbers = set()
+    batch = []
+    result = {'total': 0, 'batches': 0, 'watermarks': {}, 'failed_statuses': set()}
+
+    async def flush():
+        if not batch:
+            return
+        orders = list(batch)
+        batch.clear()
+        ok = await asyncio.to_thread(_ingest_orders_batch, app, orders, archived_set, seen_numbers)
+        result['batches'] += 1
+        if not ok:
+            result['failed_statuses'].update((od.get('status') or '').strip() for od in orders)
+        level = f", eşzamanlılık {limiter.level}" if limiter else ""
+        report_progress(f"{result['total']} paket alındı, {result['batches']} parti yazıldı{level}")
+
+    while True:
+        content = await queue.get()
+        if content is None:
+            break
+        result['total'] += len(content)
+        for st, ms in _collect_watermarks(content).items():
+            if ms > result['watermarks'].get(st, 0):
+                result['watermarks'][st] = ms
+        batch.extend(content)
+        if len(batch) >= INGEST_BATCH_SIZE:
+            await flush()
+
+    await flush()
+    return result
+
+
+def _ingest_orders_batch(app, orders, archived_set, seen_numbers):
+    """
+    Tek bir partiyi (thread içinde) yazar. Başarılıysa True döner.
+    """
+    with app.app_context():
+        sync_orders, bg_orders = _split_orders_by_status(orders, archived_set, seen_numbers)
+        ok = _process_sync_orders_bulk(sync_orders)
+        if bg_orders:
+            ok = process_bg_orders_bulk(bg_orders, app) and ok
+        return ok
+
+
+def _record_fetch_failure(failures, params):
+    """
+    Çekilemeyen sayfa: sorgudaki tüm statüler hatalı sayılır, işaretleri ilerlemez
+    (sayfada hangi statünün paketleri olduğu bilinmiyor).
+    """
+    for st in (params.get('status') or '').split(','):
+        st = st.strip()
+        if st:
+            failures[st] = failures.get(st, 0) + 1
+
+
+async def produce_all_order_pages(params, limiter, queue, failures):
+    """
+    İlk sayfadan toplam sayfa sayısını öğrenip kalan sayfaları paralel çeker;
+    her sayfa geldiği anda kuyruğa konur. Çekilemeyen sayfalar failures'a yazılır.
+    """
+    data = await fetch_orders_page_raw(params)
+    if data is None:
+        _record_fetch_failure(failures, params)
+        return
+
+    total_elements = data.get('totalElements', 0)
+    total_pages = data.get('totalPages', 1)
+    logger.info(f"[{params.get('status')}] Toplam sipariş sayısı: {total_elements}, Toplam sayfa sayısı: {total_pages}")
+    await queue.put(data.get('content', []))
+    del data
+
+    async def fetch_and_put(page_number):
+        # Slot kuyruğa koyma anına kadar tutulur: bellekteki sayfa sayısı
+        # en fazla (eşzamanlılık limiti + kuyruk) kadar olur.
+        async with limiter.slot():
+            page_data = await fetch_orders_page_raw(dict(params, page=page_number))
+            if page_data is None:
+                _record_fetch_failure(failures, params)
+                return
+            orders = page_data.get('content', [])
+            if orders:
+                await queue.put(orders)
+
+    if total_pages > 1:
+        await asyncio.gather(*(fetch_and_put(n) for n in range(1, total_pages)))
+
+
+async def produce_order_pages_since(params, since_ms, queue, failures):
+    """
+    PackageLastModifiedDate DESC sıralı sayfaları sırayla çeker; since_ms'ten
+    eski (zaten görülmüş) bir pakete ulaşınca sayfalamayı keser.
+    Sınırdaki (since_ms'e eşit) paketler tekrar alınır; upsert tekrarı zararsız yazar.
+    Sayfa çekilemezse statü failures'a yazılır (işareti ilerlemez).
+    """
+    page_number = 0
+    changed_count = 0
+    while True:
+        data = await fetch_orders_page_raw(dict(params, page=page_number))
+        if data is None:
+            _record_fetch_failure(failures, params)
+            break
+        content = data.get('content', [])
+        changed = [od for od in content if _package_modified_ms(od) >= since_ms]
+        reached_seen = len(changed) < len(content)
+        if changed:
+            changed_count += len(changed)
+            await queue.put(changed)
+        page_number += 1
+        if reached_seen or not content or page_number >= data.get('totalPages', 1):
+            break
+    logger.info(f"{params.get('status')}: son senkronizasyondan beri {changed_count} paket değişmiş.")
+
+
+async def fetch_orders_page_raw(params):
+    """
+    Tek bir sayfanın ham JSON yanıtını döndürür; hata durumunda None.
+    """
+    try:
+        response = await trendyol_client.get_async(supplier_path('orders'), params=params)
+        if response.status != 200:
+            logger.error(f"API isteği başarısız oldu: {response.status} - {response.text}")
+            return None
+        return response.json()
+    except Exception as e:
+        logger.error(f"Hata: fetch_orders_page_raw - {e}")
+        return None
+
+
+async def fetch_orders_page(params, limiter):
     """
     Belirli sayfadaki siparişleri asenkron çekme fonksiyonu.
     """
-    async with semaphore:
-        try:
-            async with session.get(url, headers=headers, params=params) as response:
-                if response.status != 200:
-                    logger.error(f"API isteği başarısız oldu: {response.status} - {await response.text()}")
-                    return []
-                data = await response.json()
-                return data.get('content', [])
-        except Exception as e:
-            logger.error(f"Hata: fetch_orders_page - {e}")
-            return []
+    async with limiter.slot():
+        data = await fetch_orders_page_raw(params)
+        return data.get('content', []) if data else []
 
 
 ############################
 # 2) Gelen Siparişleri İşleme (Created/Picking/Cancelled Senkron)
 ############################
-def process_all_orders(all_orders_data):
+def _split_orders_by_status(orders, archived_set, seen_numbers):
+    """
+    Siparişleri statüye göre ikiye ayırır; arşivdekileri ve aynı çekimde daha
+    önce görülenleri atlar. seen_numbers partiler arasında paylaşılır.
+    """
+    sync_orders = []  # Created / Picking / Cancelled / Invoiced
+    bg_orders   = []  # Shipped / Delivered
+
+    for od in orders:
+        onum = str(od.get('orderNumber') or od.get('id'))
+        if onum in seen_numbers:
+            continue
+        seen_numbers.add(onum)
+
+        if onum in archived_set:
+            logger.info(f"{onum} arşivde, atlanıyor.")
+            continue
+
+        st = (od.get('status') or '').strip()
+        # 'Invoiced' => picking
+        if st in ('Created', 'Picking', 'Invoiced', 'Cancelled'):
+            sync_orders.append(od)
+        elif st in BG_STATUSES:
+            bg_orders.append(od)
+        else:
+            logger.warning(f"{onum} - işlenmeyen statü: {st}")
+
+    return sync_orders, bg_orders
+
+
+def process_all_orders(all_orders_data, watermarks=None, full_sync=False):
     """
-    Tüm siparişler statüsüne göre ayrılır:
+    Hazır bir sipariş listesini tek seferde işler (akışsız kullanım için).
     - (Created, Picking, Invoiced, Cancelled) -> Hemen işlenir (senkron).
     - (Shipped, Delivered) -> Arka planda işlenir (thread).
+    watermarks verilirse, ilgili grubun DB yazımı başarılı olduktan sonra kaydedilir.
     """
+    watermarks = watermarks or {}
     try:
         if not all_orders_data:
             logger.info("Hiç sipariş gelmedi.")
             return
 
         # 1) Arşiv kontrolü: arşivdeyse atla
-        archived_list = OrderArchived.query.all()
-        archived_set = {o.order_number for o in archived_list}
+        archived_set = {o.order_number for o in OrderArchived.query.with_entities(OrderArchived.order_number)}
 
         # 2) Siparişleri statüye göre 2 kategoriye ayıralım
-        sync_orders = []  # Created / Picking / Cancelled / Invoiced
-        bg_orders   = []  # Shipped / Delivered
-
-        processed_numbers = set()
-        for od in all_orders_data:
-            onum = str(od.get('orderNumber') or od.get('id'))
-            if onum in processed_numbers:
-                continue
-            processed_numbers.add(onum)
-
-            if onum in archived_set:
-                logger.info(f"{onum} arşivde, atlanıyor.")
-                continue
-
-            st = (od.get('status') or '').strip()
-            # 'Invoiced' => picking
-            if st in ('Created', 'Picking', 'Invoiced', 'Cancelled'):
-                sync_orders.append(od)
-            elif st in ('Shipped', 'Delivered'):
-                bg_orders.append(od)
-            else:
-                logger.warning(f"{onum} - işlenmeyen statü: {st}")
+        sync_orders, bg_orders = _split_orders_by_status(all_orders_data, archived_set, set())
 
         # 3) Senkron siparişleri tek transaction ile işleyelim
-        _process_sync_orders_bulk(sync_orders)
+        sync_marks = {st: ms for st, ms in watermarks.items() if st not in BG_STATUSES}
+        bg_marks = {st: ms for st, ms in watermarks.items() if st in BG_STATUSES}
+        if _process_sync_orders_bulk(sync_orders):
+            save_sync_watermarks(sync_marks, full_sync=full_sync)
 
         # 4) Shipped/Delivered -> Arka plan
         if bg_orders:
             app = current_app._get_current_object()
-            t = threading.Thread(target=process_bg_orders_bulk, args=(bg_orders, app))
+            t = threading.Thread(target=process_bg_orders_bulk, args=(bg_orders, app, bg_marks, full_sync))
             t.start()
+        else:
+            save_sync_watermarks(bg_marks, full_sync=full_sync)
 
     except Exception as e:
         logger.error(f"Hata: process_all_orders - {e}")
@@ -205,168 +468,88 @@ def process_all_orders(all_orders_data):
 def _process_sync_orders_bulk(sync_orders):
     """
     Created/Picking/Cancelled siparişlerini toplu şekilde ekleme/güncelleme
-    (tek seferde commit).
+    (tek seferde commit). Başarılıysa True döner.
     """
     if not sync_orders:
-        return
+        return True
 
     try:
-        # 1) Siparişlerin order_number seti
-        numbers = {str(od.get('orderNumber') or od.get('id')) for od in sync_orders}
-
-        # 2) Mevcut kayıtları sorgula
-        existing_created   = OrderCreated.query.filter(OrderCreated.order_number.in_(numbers)).all()
-        existing_picking   = OrderPicking.query.filter(OrderPicking.order_number.in_(numbers)).all()
-        existing_cancelled = OrderCancelled.query.filter(OrderCancelled.order_number.in_(numbers)).all()
-
-        created_map   = {r.order_number: r for r in existing_created}
-        picking_map   = {r.order_number: r for r in existing_picking}
-        cancelled_map = {r.order_number: r for r in existing_cancelled}
-
-        # 3) Bulk insert için listeler
-        to_insert_created   = []
-        to_insert_picking   = []
-        to_insert_cancelled = []
-
-        # 4) Döngü ile statüye göre ekle/güncelle
+        # 1) Statüye göre hedef tabloya ait satırları hazırla
+        rows_by_model = {OrderCreated: [], OrderPicking: [], OrderCancelled: []}
         for od in sync_orders:
-            onum = str(od.get('orderNumber') or od.get('id'))
-            st   = (od.get('status') or '').strip()
+            st = (od.get('status') or '').strip()
 
             # "Invoiced" = picking kabul
             if st == 'Invoiced':
                 st = 'Picking'
 
             target_model = STATUS_TABLE_MAP.get(st)  # Created, Picking veya Cancelled
-            new_data = combine_line_items(od, st)
-
-            if target_model == OrderCreated:
-                old_obj = created_map.get(onum)
-                if old_obj:
-                    _minimal_update_bulk(old_obj, new_data)
-                else:
-                    to_insert_created.append(new_data)
-
-            elif target_model == OrderPicking:
-                old_obj = picking_map.get(onum)
-                if old_obj:
-                    _minimal_update_bulk(old_obj, new_data)
-                else:
-                    to_insert_picking.append(new_data)
-
-            elif target_model == OrderCancelled:
-                old_obj = cancelled_map.get(onum)
-                if old_obj:
-                    _minimal_update_bulk(old_obj, new_data)
-                else:
-                    to_insert_cancelled.append(new_data)
-
-        # 5) Tek seferde ekle
-        if to_insert_created:
-            db.session.bulk_insert_mappings(OrderCreated, to_insert_created)
-            logger.info(f"{len(to_insert_created)} Created sipariş eklendi (bulk).")
-        if to_insert_picking:
-            db.session.bulk_insert_mappings(OrderPicking, to_insert_picking)
-            logger.info(f"{len(to_insert_picking)} Picking sipariş eklendi (bulk).")
-        if to_insert_cancelled:
-            db.session.bulk_insert_mappings(OrderCancelled, to_insert_cancelled)
-            logger.info(f"{len(to_insert_cancelled)} Cancelled sipariş eklendi (bulk).")
-
-        # 6) Commit
+            if target_model in rows_by_model:
+                rows_by_model[target_model].append(combine_line_items(od, st))
+
+        # 2) Her tablo için tek INSERT ... ON CONFLICT (order_number) DO UPDATE
+        for model_cls, rows in rows_by_model.items():
+            if rows:
+                affected = upsert_orders(model_cls, rows)
+                logger.info(f"{model_cls.__tablename__}: {len(rows)} sipariş upsert edildi, {affected} satır değişti.")
+
+        # 3) Commit
         db.session.commit()
         logger.info("Created/Picking/Cancelled siparişler tek seferde güncellendi ve commit edildi.")
+        return True
     except SQLAlchemyError as e:
         db.session.rollback()
         logger.error(f"Senkron sipariş kaydetme hatası: {e}")
     except Exception as e:
         db.session.rollback()
         logger.error(f"Senkron sipariş beklenmeyen hata: {e}")
-
-
-def _minimal_update_bulk(old_obj, new_data):
-    """
-    Basit 'update' mantığı: statü, barkod, quantity, details vs.
-    """
-    old_obj.status = new_data.get('status')
-    old_obj.product_barcode = new_data.get('product_barcode')
-    old_obj.order_date = new_data.get('order_date')
-    old_obj.quantity = new_data.get('quantity')
-    old_obj.commission = new_data.get('commission')
-    old_obj.details = new_data.get('details')
+    return False
 
 
 ############################
 # 3) Arka Plan Shipped/Delivered (Toplu Yaklaşım)
 ############################
-def process_bg_orders_bulk(bg_orders, app):
+def process_bg_orders_bulk(bg_orders, app, watermarks=None, full_sync=False):
     """
     Shipped ve Delivered siparişlerini tek seferde tablolara ekle/sil (bulk).
+    Commit başarılıysa verilen high-water mark'lar kaydedilir.
     """
     with app.app_context():
         try:
             if not bg_orders:
-                return
-
-            # 1) Sipariş seti
-            numbers = {str(od.get('orderNumber') or od.get('id')) for od in bg_orders}
+                return True
 
-            # 2) Mevcut picking / shipped sorgula
-            existing_picking = OrderPicking.query.filter(OrderPicking.order_number.in_(numbers)).all()
-            existing_shipped = OrderShipped.query.filter(OrderShipped.order_number.in_(numbers)).all()
-
-            picking_map = {r.order_number: r for r in existing_picking}
-            shipped_map = {r.order_number: r for r in existing_shipped}
-
-            # Toplu ekleme/silme listeleri
-            to_insert_shipped = []
-            to_insert_delivered = []
-            to_delete_picking = []
-            to_delete_shipped = []
-
-            # 3) Döngüyle Shipped/Delivered ayrımı
+            # 1) Statüye göre ayır
+            shipped_rows = []
+            delivered_rows = []
             for od in bg_orders:
-                onum = str(od.get('orderNumber') or od.get('id'))
                 st = (od.get('status') or '').strip()
-
                 if st == 'Shipped':
-                    # picking → shipped
-                    old_pick = picking_map.get(onum)
-                    data_dict = combine_line_items(od, 'Shipped')
-                    if old_pick:
-                        to_delete_picking.append(old_pick.id)
-                    to_insert_shipped.append(data_dict)
-
+                    shipped_rows.append(combine_line_items(od, 'Shipped'))
                 elif st == 'Delivered':
-                    # shipped → delivered
-                    old_ship = shipped_map.get(onum)
-                    data_dict = combine_line_items(od, 'Delivered')
-                    if old_ship:
-                        to_delete_shipped.append(old_ship.id)
-                    to_insert_delivered.append(data_dict)
-
-            # 4) Bulk insert & delete
-            if to_insert_shipped:
-                db.session.bulk_insert_mappings(OrderShipped, to_insert_shipped)
-                logger.info(f"{len(to_insert_shipped)} sipariş Shipped tablosuna eklendi (arka plan).")
-
-            if to_insert_delivered:
-                db.session.bulk_insert_mappings(OrderDelivered, to_insert_delivered)
-                logger.info(f"{len(to_insert_delivered)} sipariş Delivered tablosuna eklendi (arka plan).")
-
-            if to_delete_picking:
-                OrderPicking.query.filter(OrderPicking.id.in_(to_delete_picking)).delete(synchronize_session=False)
-                logger.info(f"{len(to_delete_picking)} sipariş picking tablosundan silindi (arka plan).")
-
-            if to_delete_shipped:
-                OrderShipped.query.filter(OrderShipped.id.in_(to_delete_shipped)).delete(synchronize_session=False)
-                logger.info(f"{len(to_delete_shipped)} sipariş shipped tablosundan silindi (arka plan).")
+                    delivered_rows.append(combine_line_items(od, 'Delivered'))
+
+            # 2) Mevcut satırları tek SQL ile taşı (picking → shipped, shipped → delivered),
+            #    ardından API verisini upsert et (taşınmayanlar yeni eklenir)
+            if shipped_rows:
+                transition_orders([r['order_number'] for r in shipped_rows], OrderPicking, OrderShipped)
+                upsert_orders(OrderShipped, shipped_rows)
+                logger.info(f"{len(shipped_rows)} sipariş Shipped tablosuna yazıldı (arka plan).")
+
+            if delivered_rows:
+                transition_orders([r['order_number'] for r in delivered_rows], OrderShipped, OrderDelivered)
+                upsert_orders(OrderDelivered, delivered_rows)
+                logger.info(f"{len(delivered_rows)} sipariş Delivered tablosuna yazıldı (arka plan).")
 
             db.session.commit()
             logger.info("Arka plan Shipped/Delivered siparişleri tek seferde tamamlandı.")
+            save_sync_watermarks(watermarks, full_sync=full_sync)
+            return True
 
         except Exception as e:
             db.session.rollback()
             logger.error(f"Hata (process_bg_orders_bulk): {e}")
+            return False
 
 
 ############################
@@ -529,12 +712,18 @@ def combine_line_items(order_data, status):
 # 4) Rotalar: Created, Picking, Shipped, Delivered, Cancelled
 ############################
 
-@order_service_bp.route('/order-list/new', methods=['GET'])
-def get_new_orders():
+def render_order_list_page(model_cls):
+    """
+    Tek statü tablosunu (order_date, id) imleciyle sayfalar.
+    ?cursor=... verilmezse ilk sayfa; page sadece gösterim için taşınır.
+    """
     page = request.args.get('page', 1, int)
     per_page = 50
-    q = OrderCreated.query.order_by(OrderCreated.order_date.desc())
-    paginated = q.paginate(page=page, per_page=per_page, error_out=False)
+    paginated = keyset_paginate(
+        model_cls.query, model_cls,
+        cursor=request.args.get('cursor'),
+        per_page=per_page
+    )
     orders = paginated.items
     process_order_details(orders)
     return render_template(
@@ -542,69 +731,27 @@ def get_new_orders():
         orders=orders,
         page=page,
         total_pages=paginated.pages,
-        total_orders_count=paginated.total
+        total_orders_count=paginated.total,
+        next_cursor=paginated.next_cursor,
+        prev_cursor=paginated.prev_cursor
     )
 
+@order_service_bp.route('/order-list/new', methods=['GET'])
+def get_new_orders():
+    return render_order_list_page(OrderCreated)
+
 @order_service_bp.route('/order-list/picking', methods=['GET'])
 def get_picking_orders():
-    page = request.args.get('page', 1, int)
-    per_page = 50
-    q = OrderPicking.query.order_by(OrderPicking.order_date.desc())
-    paginated = q.paginate(page=page, per_page=per_page, error_out=False)
-    orders = paginated.items
-    process_order_details(orders)
-    return render_template(
-        'order_list.html',
-        orders=orders,
-        page=page,
-        total_pages=paginated.pages,
-        total_orders_count=paginated.total
-    )
+    return render_order_list_page(OrderPicking)
 
 @order_service_bp.route('/order-list/shipped', methods=['GET'])
 def get_shipped_orders():
-    page = request.args.get('page', 1, int)
-    per_page = 50
-    q = OrderShipped.query.order_by(OrderShipped.order_date.desc())
-    paginated = q.paginate(page=page, per_page=per_page, error_out=False)
-    orders = paginated.items
-    process_order_details(orders)
-    return render_template(
-        'order_list.html',
-        orders=orders,
-        page=page,
-        total_pages=paginated.pages,
-        total_orders_count=paginated.total
-    )
+    return render_order_list_page(OrderShipped)
 
 @order_service_bp.route('/order-list/delivered', methods=['GET'])
 def get_delivered_orders():
-    page = request.args.get('page', 1, int)
-    per_page = 50
-    q = OrderDelivered.query.order_by(OrderDelivered.order_date.desc())
-    paginated = q.paginate(page=page, per_page=per_page, error_out=False)
-    orders = paginated.items
-    process_order_details(orders)
-    return render_template(
-        'order_list.html',
-        orders=orders,
-        page=page,
-        total_pages=paginated.pages,
-        total_orders_count=paginated.total
-    )
+    return render_order_list_page(OrderDelivered)
 
 @order_service_bp.route('/order-list/cancelled', methods=['GET'])
 def get_cancelled_orders():
-    page = request.args.get('page', 1, int)
-    per_page = 50
-    q = OrderCancelled.query.order_by(OrderCancelled.order_date.desc())
-    paginated = q.paginate(page=page, per_page=per_page, error_out=False)
-    orders = paginated.items
-    process_order_details(orders)
-    return render_template(
-        'order_list.html',
-        orders=orders,
-        page=page,
-        total_pages=paginated.pages,
-        total_orders_count=paginated.total
-    )
+    return render_order_list_page(OrderCancelled)
@@ -5,6 +5,10 @@ from sqlalchemy.exc import SQLAlchemyError
 
 # Mevcut tablolarınız (örnek)
 from models import db, OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled
+from order_transition import transition_orders
+from order_locator import find_order_across_tables
+from keyset_pagination import keyset_paginate
+from search_index import search_filter
 
 logger = logging.getLogger(__name__)
 
@@ -17,40 +21,21 @@ STATUS_TABLE_MAP = {
     'Cancelled': OrderCancelled
 }
 
-def find_order_across_tables(order_number):
+def move_order_between_tables(order_obj, old_table_cls, new_table_cls, extra_values=None):
     """
-    order_number'a sahip siparişi 5 tabloda da arar.
-    Bulursa (obj, tablo_sinifi), bulamazsa (None, None) döndürür.
-    """
-    for table_cls in STATUS_TABLE_MAP.values():
-        obj = table_cls.query.filter_by(order_number=order_number).first()
-        if obj:
-            return obj, table_cls
-    return None, None
-
-def move_order_between_tables(order_obj, old_table_cls, new_table_cls):
-    """
-    Sipariş kaydını eski tablodan silip, verileri yeni tabloya taşır.
+    Sipariş kaydını eski tablodan silip yeni tabloya tek SQL ifadesiyle taşır
+    (order_transition.transition_orders). Commit yapılmaz.
     """
+    order_number = order_obj.order_number
     try:
-        data = order_obj.__dict__.copy()
-        data.pop('_sa_instance_state', None)
-
-        # Yeni tabloda olmayan kolonları ayıkla
-        new_cols = set(new_table_cls.__table__.columns.keys())
-        filtered_data = {k: v for k, v in data.items() if k in new_cols}
-
-        # Yeni tablo için kayıt oluştur
-        new_obj = new_table_cls(**filtered_data)
-        db.session.add(new_obj)
+        # Bellekteki nesne artık silinecek; bekleyen değişiklikleri yazıp oturumdan çıkar
+        db.session.flush()
+        db.session.expunge(order_obj)
 
-        # Eski kaydı sil
-        db.session.delete(order_obj)
-        db.session.flush()  # flush ile veritabanında işlemleri uygula (commit yok)
+        transition_orders([order_number], old_table_cls, new_table_cls, extra_values=extra_values)
+        logger.info(f"{old_table_cls.__tablename__} -> {new_table_cls.__tablename__} taşıma tamam. order_number={order_number}")
 
-        logger.info(f"{old_table_cls.__tablename__} -> {new_table_cls.__tablename__} taşıma tamam. order_number={order_obj.order_number}")
-
-        return new_obj
+        return new_table_cls.query.filter_by(order_number=order_number).first()
     except Exception as e:
         db.session.rollback()
         logger.error(f"Tablo taşıma hatası: {e}")
@@ -88,13 +73,8 @@ def update_order_status(order_number, new_status, additional_data=None):
 
         # 2) Farklı tabloya geçiş
         #    (ör. Created -> Picking)
-        new_obj = move_order_between_tables(old_obj, old_table_cls, new_table_cls)
-
-        # additional_data varsa, yeni objenin alanlarını güncelle
-        if additional_data:
-            for key, value in additional_data.items():
-                if hasattr(new_obj, key):
-                    setattr(new_obj, key, value)
+        #    additional_data taşıma ifadesinin içinde hedef satıra yazılır
+        new_obj = move_order_between_tables(old_obj, old_table_cls, new_table_cls, extra_values=additional_data)
 
         # Tablolar arası taşıma + ek alan güncelleme tamam, commit
         db.session.commit()
@@ -110,10 +90,12 @@ def update_order_status(order_number, new_status, additional_data=None):
         logger.error(f"Beklenmeyen hata: {e}")
         raise
 
-def get_orders_by_status(status, page=1, per_page=50, search=None):
+def get_orders_by_status(status, per_page=50, search=None, cursor=None):
     """
     Eski sistemde 'Order.query.filter_by(status=...)' yapılıyordu;
     şimdi 'status' bir tabloyu ifade ediyor. (ör. status='Created' -> OrderCreated tablosu)
+    Sayfalama (order_date, id) imleciyle yapılır; sonraki/önceki sayfa için dönen
+    next_cursor / prev_cursor kullanılır (gösterilen sayfa numarası çağıranda tutulur).
     """
     try:
         if status not in STATUS_TABLE_MAP:
@@ -123,6 +105,8 @@ def get_orders_by_status(status, page=1, per_page=50, search=None):
                 items = []
                 total = 0
                 pages = 0
+                next_cursor = None
+                prev_cursor = None
             return FakePaginate()
 
         table_cls = STATUS_TABLE_MAP[status]
@@ -131,13 +115,15 @@ def get_orders_by_status(status, page=1, per_page=50, search=None):
         # Arama filtresi
         if search:
             # order_number gibi kolonların var olduğunu varsayıyoruz
-            query = query.filter(table_cls.order_number.ilike(f'%{search}%'))
-
-        # Tarihe göre sıralama (aynı kolon adlarının her tabloda olduğunu varsayıyoruz)
-        query = query.order_by(table_cls.order_date.desc())
-
-        # Sayfalama
-        paginated_orders = query.paginate(page=page, per_page=per_page, error_out=False)
+            query = query.filter(search_filter(search, [table_cls.order_number]))
+
+        # Tarihe göre sıralama + imleçli sayfalama (OFFSET ve COUNT(*) yok)
+        paginated_orders = keyset_paginate(
+            query, table_cls,
+            cursor=cursor,
+            per_page=per_page,
+            count_key=f"{table_cls.__tablename__}:{search}" if search else None
+        )
         return paginated_orders
 
     except Exception as e:
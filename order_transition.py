@@ -0,0 +1,99 @@
+# order_transition.py
+# Siparişi statü tabloları arasında tek SQL ile taşır:
+# WITH moved AS (DELETE FROM <kaynak> ... RETURNING ...) INSERT INTO <hedef> ... SELECT ... FROM moved
+
+import logging
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from models import db, OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled
+from order_locator import record_order_locations
+from cache_layer import mark_dirty
+
+logger = logging.getLogger(__name__)
+
+MODEL_STATUS = {
+    OrderCreated: 'Created',
+    OrderPicking: 'Picking',
+    OrderShipped: 'Shipped',
+    OrderDelivered: 'Delivered',
+    OrderCancelled: 'Cancelled',
+}
+
+TRANSITION_BATCH_SIZE = 1000
+
+
+def _column_default(column):
+    """Python tarafı default (ör. datetime.utcnow) INSERT ... SELECT'te çalışmaz; burada hesaplanır."""
+    default = column.default
+    if default is None:
+        return None
+    if default.is_callable:
+        return default.arg(None)
+    if default.is_scalar:
+        return default.arg
+    return None
+
+
+def _build_transition_sql(from_model, to_model, override_columns):
+    src = from_model.__table__
+    dst = to_model.__table__
+    dst_cols = [c for c in dst.columns.keys() if c != 'id']
+
+    # Kaynakta da olan ve dışarıdan ezilmeyen kolonlar moved'dan gelir
+    moved_cols = [c for c in dst_cols if c in src.columns and c not in override_columns]
+    param_cols = [c for c in dst_cols if c not in moved_cols]
+
+    pg_dialect = postgresql.dialect()
+    q = pg_dialect.identifier_preparer.quote  # stockCode gibi büyük harfli kolonlar için
+
+    # INSERT ... SELECT listesinde tipsiz parametre text sayılır; hedef tipe cast edilir
+    select_exprs = [q(c) for c in moved_cols] + [
+        f"CAST(:p_{c} AS {dst.columns[c].type.compile(dialect=pg_dialect)})" for c in param_cols
+    ]
+    update_cols = [c for c in dst_cols if c != 'order_number']
+
+    sql = (
+        f"WITH moved AS ("
+        f"DELETE FROM {q(src.name)} WHERE order_number = ANY(:numbers) "
+        f"RETURNING {', '.join(q(c) for c in moved_cols)}) "
+        f"INSERT INTO {q(dst.name)} ({', '.join(q(c) for c in moved_cols + param_cols)}) "
+        f"SELECT {', '.join(select_exprs)} FROM moved "
+        f"ON CONFLICT (order_number) DO UPDATE SET "
+        f"{', '.join(f'{q(c)} = EXCLUDED.{q(c)}' for c in update_cols)} "
+        f"RETURNING order_number, id"
+    )
+    return text(sql), param_cols
+
+
+def transition_orders(order_numbers, from_model, to_model, extra_values=None):
+    """
+    order_numbers'taki siparişleri from_model tablosundan silip to_model tablosuna
+    aynı ifade içinde ekler. Hedefte zaten varsa (yarışan iki işçi) satır güncellenir.
+    extra_values: hedef tabloda set edilecek ek alanlar (ör. picking_start_time).
+    Yeni konumlar order_locator'a işlenir. Commit çağırana aittir. Dönen değer: taşınan order_number listesi.
+    """
+    numbers = list(dict.fromkeys(str(n) for n in order_numbers if n))
+    if not numbers or from_model is to_model:
+        return []
+
+    dst = to_model.__table__
+    overrides = {'status': MODEL_STATUS[to_model]}
+    overrides.update({k: v for k, v in (extra_values or {}).items() if k in dst.columns and k != 'id'})
+
+    stmt, param_cols = _build_transition_sql(from_model, to_model, overrides)
+    params = {}
+    for col in param_cols:
+        params[f"p_{col}"] = overrides[col] if col in overrides else _column_default(dst.columns[col])
+
+    moved = []
+    for i in range(0, len(numbers), TRANSITION_BATCH_SIZE):
+        batch = numbers[i:i + TRANSITION_BATCH_SIZE]
+        locations = db.session.execute(stmt, {**params, 'numbers': batch}).all()
+        record_order_locations(to_model, locations)
+        moved.extend(row[0] for row in locations)
+
+    if moved:
+        mark_dirty(db.session, 'orders')  # text() SQL oturum olaylarına görünmez
+        logger.info(f"{from_model.__tablename__} -> {to_model.__tablename__}: {len(moved)} sipariş taşındı.")
+    return moved
@@ -0,0 +1,157 @@
+# order_upsert.py
+# Sipariş statü tablolarına set tabanlı (tek SQL) yazım:
+# INSERT ... ON CONFLICT (order_number) DO UPDATE ... WHERE <değişmiş>
+
+import os
+import csv
+import logging
+import argparse
+from sqlalchemy import create_engine, or_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import db, OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled
+from order_locator import record_order_locations
+
+logger = logging.getLogger(__name__)
+
+# order_number üzerinde tekil index bekleyen tablolar
+UPSERT_MODELS = (OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled)
+
+# Senkronizasyonda mevcut satırda güncellenen kolonlar
+SYNC_UPDATE_COLUMNS = ('status', 'product_barcode', 'order_date', 'quantity', 'commission', 'details')
+
+UPSERT_BATCH_SIZE = 500
+
+
+def unique_index_name(model_cls):
+    return f"uq_{model_cls.__tablename__}_order_number"
+
+
+class DuplicateOrderNumbers(RuntimeError):
+    """Tekil index kurulamıyor: tabloda aynı order_number'dan birden fazla satır var."""
+
+
+def _duplicate_rows_sql(table, columns='a.*'):
+    # Aynı order_number'ın en yeni id'si dışındaki satırlar
+    return (
+        f"SELECT {columns} FROM {table} a WHERE EXISTS ("
+        f"SELECT 1 FROM {table} b WHERE b.order_number = a.order_number AND b.id > a.id)"
+    )
+
+
+def ensure_order_number_unique_indexes(engine):
+    """
+    ON CONFLICT (order_number) için gereken tekil index'leri oluşturur.
+    Uygulama açılışında çağrılır; index varsa hiçbir şey yapmaz. Veri silmez:
+    kopya satır varsa DuplicateOrderNumbers fırlatır, kopyalar
+    `python order_upsert.py --export kopyalar.csv --apply` ile temizlenmelidir.
+    """
+    with engine.begin() as conn:
+        existing = {
+            row[0] for row in conn.execute(text(
+                "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()"
+            ))
+        }
+        duplicates = {}
+        for model_cls in UPSERT_MODELS:
+            table = model_cls.__tablename__
+            index_name = unique_index_name(model_cls)
+            if index_name in existing:
+                continue
+            count = conn.execute(text(f"SELECT count(*) FROM ({_duplicate_rows_sql(table, 'a.id')}) d")).scalar()
+            if count:
+                duplicates[table] = count
+                continue
+            conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table} (order_number)"))
+            logger.info(f"{index_name} oluşturuldu.")
+
+    if duplicates:
+        raise DuplicateOrderNumbers(
+            f"order_number kopyaları yüzünden tekil index kurulamadı: {duplicates}. "
+            f"Kopyaları inceleyip silmek için: python order_upsert.py --export kopyalar.csv --apply"
+        )
+
+
+def remove_duplicate_orders(engine, export_path=None, apply=False):
+    """
+    Tekil index öncesi tek seferlik temizlik: her order_number'ın en yeni id'li
+    satırı kalır. Silinecek satırlar loglanır ve export_path verilirse CSV'ye yazılır;
+    apply=False iken hiçbir şey silinmez. Dönen: tablo -> satır sayısı.
+    """
+    counts = {}
+    writer = None
+    export_file = open(export_path, 'w', newline='', encoding='utf-8') if export_path else None
+    try:
+        with engine.begin() as conn:
+            for model_cls in UPSERT_MODELS:
+                table = model_cls.__tablename__
+                result = conn.execute(text(_duplicate_rows_sql(table)))
+                columns = list(result.keys())
+                rows = result.all()
+                counts[table] = len(rows)
+                if not rows:
+                    continue
+                for row in rows:
+                    logger.info(f"{table}: kopya satır id={row.id} order_number={row.order_number}")
+                if export_file is not None:
+                    if writer is None:
+                        writer = csv.writer(export_file)
+                    writer.writerow(['table'] + columns)
+                    writer.writerows([table] + list(row) for row in rows)
+                if apply:
+                    deleted = conn.execute(text(
+                        f"DELETE FROM {table} a USING {table} b "
+                        f"WHERE a.order_number = b.order_number AND a.id < b.id"
+                    )).rowcount
+                    logger.warning(f"{table}: {deleted} kopya sipariş satırı silindi.")
+    finally:
+        if export_file is not None:
+            export_file.close()
+    return counts
+
+
+def upsert_orders(model_cls, rows, update_columns=SYNC_UPDATE_COLUMNS):
+    """
+    rows: combine_line_items çıktısı gibi kolon->değer sözlükleri.
+    Yeni order_number'lar eklenir, mevcutlar sadece update_columns'tan biri
+    değiştiyse güncellenir; yazılan satırlar order_locator'a işlenir. Commit çağırana aittir.
+    Dönen değer: eklenen veya güncellenen satır sayısı.
+    """
+    if not rows:
+        return 0
+
+    # Aynı ifade içinde bir satır iki kez güncellenemez: order_number'a göre tekille
+    unique_rows = list({row['order_number']: row for row in rows}.values())
+    table = model_cls.__table__
+    affected = 0
+
+    for i in range(0, len(unique_rows), UPSERT_BATCH_SIZE):
+        batch = unique_rows[i:i + UPSERT_BATCH_SIZE]
+        insert_stmt = pg_insert(model_cls).values(batch)
+        excluded = insert_stmt.excluded
+        upsert_stmt = insert_stmt.on_conflict_do_update(
+            index_elements=['order_number'],
+            set_={col: excluded[col] for col in update_columns},
+            where=or_(*[table.c[col].is_distinct_from(excluded[col]) for col in update_columns])
+        ).returning(table.c.order_number, table.c.id)
+        locations = db.session.execute(upsert_stmt).all()
+        record_order_locations(model_cls, locations)
+        affected += len(locations)
+
+    return affected
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Sipariş tablolarındaki order_number kopyalarını listeler / siler (en yeni id kalır)."
+    )
+    parser.add_argument('--export', help='Silinecek satırların yazılacağı CSV dosyası')
+    parser.add_argument('--apply', action='store_true', help='Kopyaları gerçekten sil (yoksa sadece listelenir)')
+    args = parser.parse_args()
+
+    engine = create_engine(os.environ['DATABASE_URL'])
+    counts = remove_duplicate_orders(engine, export_path=args.export, apply=args.apply)
+    print(f"{'Silinen' if args.apply else 'Silinecek'} kopya satırlar: {counts}")
+    if args.apply:
+        ensure_order_number_unique_indexes(engine)
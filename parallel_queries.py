@@ -0,0 +1,59 @@
+# parallel_queries.py
+# Birbirinden bağımsız rapor sorgularını havuzdaki ayrı bağlantılarda aynı anda
+# çalıştırır; toplam süre sorguların toplamı yerine en yavaşı kadar olur.
+# Her sorgu kendi Session'ını açar, statement_timeout ile sınırlandırılır;
+# süresi dolan veya hata veren sorgunun sonucu boş gelir, diğerleri döner.
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+QUERY_TIMEOUT = 10  # saniye, sorgu başına
+MAX_WORKERS = 8
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='report-query')
+
+
+def _run(app, engine, func, args, timeout):
+    with app.app_context():
+        with Session(bind=engine) as session:
+            # Beklemeyi bırakınca sorgu veritabanında da dursun; bir saniye pay, zaman aşımı
+            # önce burada görülsün diye. Sorgu fonksiyonları hatayı yutmaz, failed'a düşer.
+            session.execute(text(f"SET LOCAL statement_timeout = {int((timeout + 1) * 1000)}"))
+            return func(session, *args)
+
+
+def run_parallel(queries, args=(), timeout=QUERY_TIMEOUT, default=()):
+    """
+    queries: {ad: func(session, *args)}. Hepsini aynı anda çalıştırır.
+    Dönen: (sonuçlar {ad: sonuç}, tamamlanamayanlar [ad]). Tamamlanamayanın sonucu default'tur.
+    """
+    app = current_app._get_current_object()
+    engine = db.engine
+    futures = {
+        name: _executor.submit(_run, app, engine, func, args, timeout)
+        for name, func in queries.items()
+    }
+
+    results, failed = {}, []
+    deadline = time.monotonic() + timeout
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            logger.warning(f"'{name}' sorgusu {timeout} sn içinde bitmedi, boş dönülüyor.")
+            results[name] = default
+            failed.append(name)
+        except Exception as e:
+            logger.error(f"'{name}' sorgusu hata verdi: {e}")
+            results[name] = default
+            failed.append(name)
+    return results, failed
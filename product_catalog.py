@@ -0,0 +1,69 @@
+# product_catalog.py
+# Ürün kataloğu sayfaları (model, renk) gruplarını listeler. Gruplar SQL'de
+# DISTINCT + LIMIT/OFFSET ile sayfalanır, ardından yalnızca o sayfadaki grupların
+# varyantları çekilir; sayfa süresi toplam SKU sayısına değil sayfa boyutuna bağlıdır.
+# Sıralama eski Python sıralamasıyla aynıdır: küçük harfe çevrilmiş model, renk
+# (COLLATE "C" = kod noktası sırası); index aynı ifadeler üzerindedir.
+
+import logging
+from sqlalchemy import text, func, tuple_
+
+from models import db, Product
+
+logger = logging.getLogger(__name__)
+
+CATALOG_INDEX_NAME = 'ix_products_catalog_group'
+CATALOG_INDEX_SQL = (
+    f'CREATE INDEX IF NOT EXISTS {CATALOG_INDEX_NAME} ON products ('
+    'lower(coalesce(product_main_id, \'\')) COLLATE "C", '
+    'lower(coalesce(color, \'\')) COLLATE "C", '
+    'coalesce(product_main_id, \'\') COLLATE "C", '
+    'coalesce(color, \'\') COLLATE "C")'
+)
+
+
+def ensure_product_catalog_index(engine):
+    """Katalog sıralaması ve varyant araması için ifade index'i (açılışta, idempotent)."""
+    with engine.begin() as conn:
+        conn.execute(text(CATALOG_INDEX_SQL))
+
+
+def _group_columns():
+    """Index ile birebir aynı ifadeler; planlayıcı ancak böyle eşleştirir."""
+    model = func.coalesce(Product.product_main_id, '')
+    color = func.coalesce(Product.color, '')
+    return (
+        func.lower(model).collate('C'),
+        func.lower(color).collate('C'),
+        model.collate('C'),
+        color.collate('C'),
+    )
+
+
+def catalog_group_count():
+    """Toplam (model, renk) grubu sayısı."""
+    groups = db.session.query(*_group_columns()).distinct().subquery()
+    return db.session.query(func.count()).select_from(groups).scalar() or 0
+
+
+def catalog_page(page, per_page):
+    """
+    page. sayfadaki grupları {(model, renk): [Product, ...]} olarak döner (grup sırası korunur).
+    Varyantlar sıralanmaz; sort_variants_by_size çağırana aittir.
+    """
+    page = max(page, 1)
+    columns = _group_columns()
+    keys = db.session.query(*columns).distinct() \
+        .order_by(*columns) \
+        .limit(per_page).offset((page - 1) * per_page).all()
+    if not keys:
+        return {}
+
+    grouped = {(model, color): [] for _, _, model, color in keys}
+    variants = Product.query.filter(
+        tuple_(columns[0], columns[1]).in_([(lower_model, lower_color) for lower_model, lower_color, _, _ in keys]),
+        tuple_(columns[2], columns[3]).in_(list(grouped))
+    ).all()
+    for product in variants:
+        grouped[(product.product_main_id or '', product.color or '')].append(product)
+    return grouped
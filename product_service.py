@@ -1,12 +1,13 @@
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-import base64
-import aiohttp
 import asyncio
 import json
 from datetime import datetime
 from models import db, Product
-from trendyol_api import API_KEY, API_SECRET, SUPPLIER_ID, BASE_URL
+from cache_layer import mark_dirty
+from sync_jobs import sync_job, report_progress, enqueue_for_request
+from trendyol_client import trendyol_client, supplier_path
+from adaptive_concurrency import AdaptiveConcurrency
 import logging
 
 # Loglama ayarları
@@ -22,28 +23,30 @@ product_service_bp = Blueprint('product_service', __name__)
 @product_service_bp.route('/fetch-trendyol-products', methods=['POST'])
 def fetch_trendyol_products_route():
     try:
-        # Asenkron fonksiyonu çağır
-        asyncio.run(fetch_trendyol_products_async())
-        flash('Ürün kataloğu başarıyla güncellendi!', 'success')
+        # Çekim arka plan işinde yapılır, istek hemen döner
+        job, created = enqueue_for_request('trendyol_products')
+        if created:
+            flash(f'Ürün kataloğu arka planda güncelleniyor (iş #{job.id}).', 'success')
+        else:
+            flash(f'Ürün kataloğu güncellemesi zaten çalışıyor (iş #{job.id}).', 'info')
     except Exception as e:
         logger.error(f"Hata: fetch_trendyol_products_route - {e}")
-        flash('Ürün kataloğu güncellenirken bir hata oluştu.', 'danger')
+        flash('Ürün kataloğu güncellemesi başlatılamadı.', 'danger')
 
     return redirect(url_for('get_products.get_products_list'))
 
 
+@sync_job('trendyol_products', 'Ürün kataloğu senkronizasyonu')
+def sync_trendyol_products_job():
+    asyncio.run(fetch_trendyol_products_async())
+
+
 async def fetch_trendyol_products_async():
     """
     Trendyol API'den tüm ürünleri asenkron olarak çeker
     """
     try:
-        auth_str = f"{API_KEY}:{API_SECRET}"
-        b64_auth_str = base64.b64encode(auth_str.encode()).decode('utf-8')
-        url = f"{BASE_URL}suppliers/{SUPPLIER_ID}/products"
-        headers = {
-            "Authorization": f"Basic {b64_auth_str}",
-            "Content-Type": "application/json"
-        }
+        path = supplier_path('products')
 
         # İlk isteği yaparak toplam ürün ve sayfa sayısını alalım
         params = {
@@ -52,57 +55,66 @@ async def fetch_trendyol_products_async():
             "approved": "true"  # Sadece onaylanmış ürünler
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, params=params) as response:
-                response_data = await response.json()
-                if response.status != 200:
-                    logger.error(f"API Error: {response.status} - {response_data}")
-                    return
+        response = await trendyol_client.get_async(path, params=params)
+        if response.status != 200:
+            logger.error(f"API Error: {response.status} - {response.text}")
+            return
+        response_data = response.json()
 
-                total_elements = response_data.get('totalElements', 0)
-                total_pages = response_data.get('totalPages', 1)
-                logger.info(f"Toplam ürün sayısı: {total_elements}, Toplam sayfa sayısı: {total_pages}")
+        total_elements = response_data.get('totalElements', 0)
+        total_pages = response_data.get('totalPages', 1)
+        logger.info(f"Toplam ürün sayısı: {total_elements}, Toplam sayfa sayısı: {total_pages}")
+        report_progress(f"{total_elements} ürün, {total_pages} sayfa çekiliyor")
 
-                # Tüm sayfalar için istek hazırlayalım
-                tasks = []
-                semaphore = asyncio.Semaphore(5)  # Aynı anda maksimum 5 istek
-                for page_number in range(total_pages):
-                    params_page = params.copy()
-                    params_page['page'] = page_number
-                    task = fetch_products_page(session, url, headers, params_page, semaphore)
-                    tasks.append(task)
+        # Tüm sayfalar için istek hazırlayalım
+        tasks = []
+        # Eşzamanlılık API'nin yanıtlarına göre ayarlanır (429/zaman aşımında düşer)
+        limiter = AdaptiveConcurrency('trendyol_products', initial=5, maximum=20)
+        for page_number in range(total_pages):
+            params_page = params.copy()
+            params_page['page'] = page_number
+            task = fetch_products_page(path, params_page, limiter)
+            tasks.append(task)
 
-                # Asenkron olarak tüm istekleri yapalım
-                pages_data = await asyncio.gather(*tasks)
+        # Asenkron olarak tüm istekleri yapalım
+        try:
+            pages_data = await asyncio.gather(*tasks)
+        finally:
+            concurrency = limiter.close()
 
-                # Gelen ürünleri birleştirelim
-                all_products_data = []
-                for products in pages_data:
-                    if products:
-                        all_products_data.extend(products)
+        # Gelen ürünleri birleştirelim
+        all_products_data = []
+        for products in pages_data:
+            if products:
+                all_products_data.extend(products)
 
-                logger.info(f"Toplam çekilen ürün sayısı: {len(all_products_data)}")
+        logger.info(
+            f"Toplam çekilen ürün sayısı: {len(all_products_data)} "
+            f"(eşzamanlılık: son {concurrency['level']} / en yüksek {concurrency['peak']})"
+        )
 
-                # Ürünleri işleyelim
-                process_all_products(all_products_data)
+        # Ürünleri işleyelim
+        report_progress(f"{len(all_products_data)} ürün kaydediliyor")
+        process_all_products(all_products_data)
 
     except Exception as e:
         logger.error(f"Hata: fetch_trendyol_products_async - {e}")
+        raise
 
 
-async def fetch_products_page(session, url, headers, params, semaphore):
+async def fetch_products_page(path, params, limiter):
     """
     Belirli bir sayfadaki ürünleri çeker
     """
-    async with semaphore:
+    async with limiter.slot():
         try:
-            async with session.get(url, headers=headers, params=params) as response:
-                if response.status != 200:
-                    logger.error(f"API isteği başarısız oldu: {response.status} - {await response.text()}")
-                    return []
-                data = await response.json()
-                products_data = data.get('content', [])
-                return products_data
+            response = await trendyol_client.get_async(path, params=params)
+            if response.status != 200:
+                logger.error(f"API isteği başarısız oldu: {response.status} - {response.text}")
+                return []
+            data = response.json()
+            products_data = data.get('content', [])
+            return products_data
         except Exception as e:
             logger.error(f"Hata: fetch_products_page - {e}")
             return []
@@ -165,6 +177,7 @@ def process_all_products(all_products_data):
         # Yeni ürünleri toplu olarak ekle
         if new_products:
             db.session.bulk_save_objects(new_products)
+            mark_dirty(db.session, 'products')  # bulk_save flush olaylarını tetiklemez
             logger.info(f"Toplam {len(new_products)} yeni ürün eklendi")
             
         # Güncellenmiş ürünleri kaydet
@@ -198,22 +211,13 @@ async def get_product_categories():
     Trendyol'daki tüm kategorileri çeker
     """
     try:
-        auth_str = f"{API_KEY}:{API_SECRET}"
-        b64_auth_str = base64.b64encode(auth_str.encode()).decode('utf-8')
-        url = f"{BASE_URL}product-categories"
-        headers = {
-            "Authorization": f"Basic {b64_auth_str}",
-            "Content-Type": "application/json"
-        }
+        response = await trendyol_client.get_async("product-categories")
+        if response.status != 200:
+            return jsonify({'success': False, 'error': f"API hatası: {response.status}"}), 500
+            
+        data = response.json()
+        return jsonify({'success': True, 'categories': data})
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status != 200:
-                    return jsonify({'success': False, 'error': f"API hatası: {response.status}"}), 500
-                    
-                data = await response.json()
-                return jsonify({'success': True, 'categories': data})
-                
     except Exception as e:
         logger.error(f"Hata: get_product_categories - {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -227,27 +231,17 @@ async def get_brands():
     try:
         name = request.args.get('name', '')
         
-        auth_str = f"{API_KEY}:{API_SECRET}"
-        b64_auth_str = base64.b64encode(auth_str.encode()).decode('utf-8')
-        
         if name:
-            url = f"{BASE_URL}brands/by-name?name={name}"
+            response = await trendyol_client.get_async("brands/by-name", params={"name": name})
         else:
-            url = f"{BASE_URL}brands" 
+            response = await trendyol_client.get_async("brands")
             
-        headers = {
-            "Authorization": f"Basic {b64_auth_str}",
-            "Content-Type": "application/json"
-        }
+        if response.status != 200:
+            return jsonify({'success': False, 'error': f"API hatası: {response.status}"}), 500
+            
+        data = response.json()
+        return jsonify({'success': True, 'brands': data})
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status != 200:
-                    return jsonify({'success': False, 'error': f"API hatası: {response.status}"}), 500
-                    
-                data = await response.json()
-                return jsonify({'success': True, 'brands': data})
-                
     except Exception as e:
         logger.error(f"Hata: get_brands - {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -259,22 +253,13 @@ async def get_category_attributes(category_id):
     Belirli bir kategorinin özelliklerini çeker
     """
     try:
-        auth_str = f"{API_KEY}:{API_SECRET}"
-        b64_auth_str = base64.b64encode(auth_str.encode()).decode('utf-8')
-        url = f"{BASE_URL}product-categories/{category_id}/attributes"
-        headers = {
-            "Authorization": f"Basic {b64_auth_str}",
-            "Content-Type": "application/json"
-        }
+        response = await trendyol_client.get_async(f"product-categories/{category_id}/attributes")
+        if response.status != 200:
+            return jsonify({'success': False, 'error': f"API hatası: {response.status}"}), 500
+            
+        data = response.json()
+        return jsonify({'success': True, 'attributes': data})
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status != 200:
-                    return jsonify({'success': False, 'error': f"API hatası: {response.status}"}), 500
-                    
-                data = await response.json()
-                return jsonify({'success': True, 'attributes': data})
-                
     except Exception as e:
         logger.error(f"Hata: get_category_attributes - {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -294,14 +279,6 @@ async def update_price_stock():
         if not items:
             return jsonify({'success': False, 'error': 'Güncellenecek ürün bulunamadı'}), 400
             
-        auth_str = f"{API_KEY}:{API_SECRET}"
-        b64_auth_str = base64.b64encode(auth_str.encode()).decode('utf-8')
-        url = f"{BASE_URL}suppliers/{SUPPLIER_ID}/products/price-and-inventory"
-        headers = {
-            "Authorization": f"Basic {b64_auth_str}",
-            "Content-Type": "application/json"
-        }
-        
         # API formatına uygun veri dönüşümü
         api_items = []
         for item in items:
@@ -315,33 +292,31 @@ async def update_price_stock():
             
         payload = {"items": api_items}
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload) as response:
-                response_data = await response.json()
-                
-                if response.status != 200:
-                    logger.error(f"API Error: {response.status} - {response_data}")
-                    return jsonify({'success': False, 'error': f"API hatası: {response_data}"}), 500
-                    
-                # Veritabanında da aynı güncellemeleri yapalım
-                for item in items:
-                    barcode = item.get('barcode')
-                    product = Product.query.filter_by(barcode=barcode).first()
-                    if product:
-                        product.quantity = item.get('quantity')
-                        product.sale_price = item.get('salePrice')
-                        product.list_price = item.get('listPrice', item.get('salePrice'))
-                        product.last_update_date = datetime.now()
-                        db.session.add(product)
-                
-                db.session.commit()
-                
-                return jsonify({
-                    'success': True, 
-                    'message': 'Ürün fiyat ve stok bilgileri güncellendi',
-                    'api_response': response_data
-                })
-                
+        response = await trendyol_client.post_async(supplier_path('products/price-and-inventory'), json=payload)
+        if response.status != 200:
+            logger.error(f"API Error: {response.status} - {response.text}")
+            return jsonify({'success': False, 'error': f"API hatası: {response.text}"}), 500
+        response_data = response.json()
+            
+        # Veritabanında da aynı güncellemeleri yapalım
+        for item in items:
+            barcode = item.get('barcode')
+            product = Product.query.filter_by(barcode=barcode).first()
+            if product:
+                product.quantity = item.get('quantity')
+                product.sale_price = item.get('salePrice')
+                product.list_price = item.get('listPrice', item.get('salePrice'))
+                product.last_update_date = datetime.now()
+                db.session.add(product)
+        
+        db.session.commit()
+        
+        return jsonify({
+            'success': True, 
+            'message': 'Ürün fiyat ve stok bilgileri güncellendi',
+            'api_response': response_data
+        })
+        
     except Exception as e:
         db.session.rollback()
         logger.error(f"Hata: update_price_stock - {e}")
@@ -3,7 +3,6 @@
 from flask import Blueprint, render_template, request, flash
 from datetime import datetime, date, time # date ve time importları
 import logging
-from decimal import Decimal, InvalidOperation # Decimal import
 
 # --- WTForms ---
 # Gerekli WTForms sınıflarını import et
@@ -16,10 +15,10 @@ from wtforms.validators import DataRequired, NumberRange, Optional, ValidationEr
 # Veritabanı modellerini import et (kendi projenizdeki yola göre ayarlayın)
 # Projenizin yapısına göre bu import yolunu düzeltmeniz gerekebilir.
 try:
-    from .models import db, OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled, Product
+    from .models import db
 except ImportError:
     try:
-         from models import db, OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled, Product
+         from models import db
     except ImportError as e:
          # Modelleri bulamazsa logla ve programı durdurmak yerine hata ver
          logging.error(f"Veritabanı modelleri import edilemedi! Hata: {e}")
@@ -28,6 +27,9 @@ except ImportError:
          # Şimdilik sadece loglayalım.
          pass
 
+# Kâr hesabı: tek sorgu + pandas (profit_engine.py)
+from profit_engine import load_profit_frame, compute_profit
+
 # --- Loglama Ayarları ---
 # Temel loglama yapılandırması
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -88,16 +90,16 @@ profit_bp = Blueprint('profit', __name__, url_prefix='/profit')
 def profit_report():
     """
     WTForms kullanarak formdan tarih aralığı ve maliyetleri alır,
-    N+1 sorgu problemini çözerek siparişleri analiz eder ve kar/zarar raporu oluşturur.
+    siparişleri profit_engine ile (tek sorgu + pandas) analiz eder ve kar/zarar raporu oluşturur.
     Form tanımı bu dosyanın içindedir. Grafik için temel veriyi hazırlar.
     """
     form = ProfitReportForm()
     # Başlangıç değerlerini tanımla
     analysis = []
-    total_profit = Decimal('0.0')
-    avg_profit = Decimal('0.0')
-    total_net_income = Decimal('0.0')
-    total_expenses_sum = Decimal('0.0')
+    total_profit = 0.0
+    avg_profit = 0.0
+    total_net_income = 0.0
+    total_expenses_sum = 0.0
     order_count = 0
     processed_count = 0
     chart_labels = [] # Grafik etiketleri (tarihler vb.)
@@ -105,10 +107,10 @@ def profit_report():
 
     if form.validate_on_submit(): # POST ve form geçerli ise
         try:
-            # Formdan doğrulanmış verileri Decimal'e çevirerek al
-            package_cost = Decimal(str(form.package_cost.data or 0))
-            employee_cost = Decimal(str(form.employee_cost.data or 0))
-            shipping_cost = Decimal(str(form.shipping_cost.data or 0))
+            # Formdan doğrulanmış adet başı maliyetler
+            package_cost = float(form.package_cost.data or 0)
+            employee_cost = float(form.employee_cost.data or 0)
+            shipping_cost = float(form.shipping_cost.data or 0)
             start_date_obj = form.start_date.data
             end_date_obj = form.end_date.data
 
@@ -120,123 +122,33 @@ def profit_report():
             logging.info(f"Tarih Aralığı: {start_datetime} - {end_datetime}")
             logging.info(f"Adet Başı Maliyetler -> Paket: {package_cost}, İşçilik: {employee_cost}, Kargo: {shipping_cost}")
 
-            # 1) İlgili siparişleri çek
-            orders = []
-            table_classes = [OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled] # Gerekirse düzenle
-
-            for cls in table_classes:
-                try:
-                    results = cls.query.filter(
-                        cls.order_date.between(start_datetime, end_datetime)
-                    ).all()
-                    orders.extend(results)
-                    logging.info(f"'{cls.__tablename__}' tablosundan {len(results)} sipariş bulundu.")
-                except Exception as db_err: # Model sorgulama hatasını yakala
-                    logging.error(f"'{cls.__tablename__}' tablosu sorgulanırken hata: {db_err}")
-                    flash(f"'{cls.__tablename__}' tablosundaki siparişler getirilirken bir sorun oluştu.", "danger")
-                    # Hata olsa da devam edebilir veya işlemi durdurabiliriz. Şimdilik devam edelim.
+            # 1) Siparişler tek sorguda (beş tablo + ürün maliyeti), hesap pandas ile
+            frame = load_profit_frame(start_datetime, end_datetime)
 
-            order_count = len(orders)
+            order_count = len(frame)
             logging.info(f"Belirtilen tarih aralığında toplam {order_count} sipariş kaydı bulundu (tüm tablolarda).")
 
-            if not orders:
+            if frame.empty:
                 flash("Belirtilen tarih aralığında hiç sipariş bulunamadı.", "warning")
             else:
-                # --- N+1 Sorgu Problemi Çözümü ---
-                unique_barcodes = {getattr(o, 'original_product_barcode', None) for o in orders}
-                valid_barcodes = {bc for bc in unique_barcodes if bc}
-
-                products_map = {}
-                if valid_barcodes:
-                    try:
-                        products_list = Product.query.filter(Product.original_product_barcode.in_(valid_barcodes)).all()
-                        products_map = {p.original_product_barcode: p for p in products_list}
-                        logging.info(f"İlişkili {len(products_map)} benzersiz ürün bilgisi çekildi.")
-                        missing_barcodes = valid_barcodes - set(products_map.keys())
-                        if missing_barcodes:
-                            logging.warning(f"Ürün tablosunda bulunamayan barkodlar: {missing_barcodes}")
-                    except Exception as prod_err:
-                        logging.error(f"Ürün bilgileri çekilirken hata: {prod_err}")
-                        flash("Ürün bilgileri getirilirken bir sorun oluştu. Maliyetler eksik olabilir.", "warning")
-                else:
-                    logging.warning("Siparişlerde geçerli ürün barkodu bulunamadı.")
-                # --- N+1 Çözümü Sonu ---
-
-                # 5) Siparişleri işle ve analiz listesini oluştur
-                for o in orders:
-                    product_barcode = getattr(o, 'original_product_barcode', None)
-                    product = products_map.get(product_barcode) if product_barcode else None
-
-                    current_product_cost = Decimal('0.0')
-                    if product and product.cost_try is not None:
-                        try:
-                            current_product_cost = Decimal(str(product.cost_try))
-                        except (InvalidOperation, TypeError):
-                             logging.warning(f"Ürün ID={product.id}, Barkod={product_barcode} için geçersiz maliyet: {product.cost_try}. 0 olarak alınıyor.")
-                    # Diğer durumlar için maliyet zaten 0
-
-                    try:
-                        amount_val = Decimal(str(o.amount)) if o.amount is not None else Decimal('0.0')
-                        discount_val = Decimal(str(o.discount)) if o.discount is not None else Decimal('0.0')
-                        commission_val = Decimal(str(o.commission)) if o.commission is not None else Decimal('0.0')
-
-                        net_income = (amount_val - discount_val) - commission_val
-                        total_expenses = current_product_cost + shipping_cost + package_cost + employee_cost
-                        profit = net_income - total_expenses
-
-                        total_profit += profit
-                        total_net_income += net_income
-                        total_expenses_sum += total_expenses
-
-                        analysis.append({
-                            "order_id": getattr(o, 'id', 'N/A'), # id alanı yoksa diye kontrol
-                            "order_table": getattr(o, '__tablename__', 'N/A'),
-                            "order_date": getattr(o, 'order_date', None), # Tarih objesi veya None
-                            "product": getattr(o, 'product_name', "Bilinmiyor"),
-                            "barcode": product_barcode or "YOK",
-                            "status": getattr(o, 'status', 'Bilinmiyor'),
-                            "net_income": net_income,
-                            "product_cost": current_product_cost,
-                            "other_costs": shipping_cost + package_cost + employee_cost,
-                            "total_expenses": total_expenses,
-                            "profit": profit,
-                        })
-                        processed_count += 1
-
-                    except (InvalidOperation, TypeError, ValueError) as calc_e:
-                        logging.error(f"Sipariş ID={getattr(o, 'id', 'N/A')} için hesaplama hatası: {calc_e}. Detaylar: Amount={o.amount}, Discount={o.discount}, Commission={o.commission}. Sipariş atlanıyor.")
-                        continue # Hatalı siparişi atla
-
-                # --- GRAFİK VERİSİ HAZIRLAMA (Günlük Kâr/Zarar) ---
-                if analysis:
-                    try:
-                        daily_profit_data = {}
-                        for item in analysis:
-                            item_date = item.get('order_date')
-                            if isinstance(item_date, datetime): # datetime objesi mi kontrol et
-                                date_str = item_date.strftime('%Y-%m-%d')
-                                daily_profit_data[date_str] = daily_profit_data.get(date_str, Decimal('0.0')) + item['profit']
-                            # else: Tarih yoksa veya geçersizse grafiğe ekleme
+                result, summary, daily_profit = compute_profit(
+                    frame, package_cost=package_cost, employee_cost=employee_cost, shipping_cost=shipping_cost
+                )
+                del frame
 
-                        if daily_profit_data:
-                            sorted_dates = sorted(daily_profit_data.keys())
-                            chart_labels = sorted_dates
-                            # Chart.js float bekler, Decimal'i float'a çevir
-                            chart_values = [float(daily_profit_data[date]) for date in sorted_dates]
-                            logging.info(f"Grafik için {len(chart_labels)} günlük veri noktası hazırlandı.")
-                        else:
-                             logging.info("Grafik oluşturmak için yeterli günlük veri bulunamadı (geçerli tarihli sipariş yok?).")
+                processed_count = summary['order_count']
+                total_profit = summary['total_profit']
+                avg_profit = summary['avg_profit']
+                total_net_income = summary['total_net_income']
+                total_expenses_sum = summary['total_expenses']
 
-                    except Exception as chart_e:
-                        logging.error(f"Grafik verisi hazırlanırken hata oluştu: {chart_e}")
-                        chart_labels = [] # Hata durumunda sıfırla
-                        chart_values = []
-                # --- GRAFİK VERİSİ HAZIRLAMA SONU ---
+                # Şablon satırlara item.alan diye erişir; namedtuple dict'ten çok daha küçük
+                analysis = list(result.itertuples(index=False, name='ProfitRow'))
 
-                # 6) Ortalama kârı hesapla
-                if processed_count > 0:
-                    avg_profit = total_profit / processed_count
-                # else: avg_profit zaten 0
+                # --- GRAFİK VERİSİ (Günlük Kâr/Zarar) ---
+                chart_labels = daily_profit.index.tolist()
+                chart_values = [float(v) for v in daily_profit.to_numpy()]
+                logging.info(f"Grafik için {len(chart_labels)} günlük veri noktası hazırlandı.")
 
                 logging.info(f"Hesaplama tamamlandı. İşlenen Sipariş Sayısı: {processed_count}")
                 logging.info(f"Toplam Net Gelir: {total_net_income:.2f}")
@@ -244,11 +156,7 @@ def profit_report():
                 logging.info(f"Toplam Kâr: {total_profit:.2f}")
                 logging.info(f"Ortalama Kâr: {avg_profit:.2f}")
 
-                if processed_count > 0 :
-                     flash(f"Rapor başarıyla oluşturuldu. {processed_count} sipariş analiz edildi.", "success")
-                elif order_count > 0:
-                     flash("Siparişler bulundu ancak hiçbiri işlenemedi. Logları kontrol edin.", "warning")
-                # else: Sipariş yoktu, zaten yukarıda flash mesajı verildi.
+                flash(f"Rapor başarıyla oluşturuldu. {processed_count} sipariş analiz edildi.", "success")
 
         except ValidationError as ve:
              flash(f"Form girişi hatalı: {ve}", "danger")
@@ -258,7 +166,7 @@ def profit_report():
             logging.exception("Profit report genel hata:") # Tam traceback logla
             # Hata durumunda tüm sonuçları sıfırla
             analysis, chart_labels, chart_values = [], [], []
-            total_profit, avg_profit, total_net_income, total_expenses_sum = (Decimal('0.0'),)*4
+            total_profit, avg_profit, total_net_income, total_expenses_sum = (0.0,)*4
             order_count, processed_count = 0, 0
 
 
@@ -267,8 +175,8 @@ def profit_report():
         'profit.html',
         form=form,
         analysis=analysis,
-        total_profit=total_profit, # Decimal olarak gönderilir
-        avg_profit=avg_profit,     # Decimal olarak gönderilir
+        total_profit=total_profit,
+        avg_profit=avg_profit,
         order_count=order_count,
         processed_count=processed_count,
         chart_labels=chart_labels, # Her zaman gönderilir (boş veya dolu)
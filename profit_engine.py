@@ -0,0 +1,102 @@
+# profit_engine.py
+# Kâr raporu hesaplaması, sütun bazlı. Beş sipariş tablosundan yalnızca gereken
+# kolonlar tek UNION ALL sorgusuyla çekilir, ürün maliyeti (cost_try) SQL'de
+# eklenir; net gelir / gider / kâr ve günlük toplamlar pandas dizileri üzerinde
+# hesaplanır (satır başına Python nesnesi veya Decimal dönüşümü yok).
+
+import logging
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, union_all, literal, func
+
+from models import db, OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled, Product
+
+logger = logging.getLogger(__name__)
+
+PROFIT_MODELS = [OrderCreated, OrderPicking, OrderShipped, OrderDelivered, OrderCancelled]
+
+# Rapor tablosunun kolonları (şablon bu adlarla okur)
+ANALYSIS_COLUMNS = [
+    'order_id', 'order_table', 'order_date', 'product', 'barcode', 'status',
+    'net_income', 'product_cost', 'other_costs', 'total_expenses', 'profit',
+]
+
+
+def _profit_query(start, end):
+    orders = union_all(*[
+        select(
+            literal(cls.__tablename__).label('order_table'),
+            cls.id.label('order_id'),
+            cls.order_date,
+            cls.product_name.label('product'),
+            cls.original_product_barcode.label('barcode'),
+            cls.status,
+            cls.amount,
+            cls.discount,
+            cls.commission,
+        ).where(cls.order_date.between(start, end))
+        for cls in PROFIT_MODELS
+    ]).subquery('o')
+
+    # Aynı barkoda birden fazla ürün satırı düşerse sipariş çoğalmasın
+    costs = select(
+        Product.original_product_barcode.label('barcode'),
+        func.max(Product.cost_try).label('product_cost'),
+    ).group_by(Product.original_product_barcode).subquery('c')
+
+    return select(orders, costs.c.product_cost).select_from(
+        orders.outerjoin(costs, costs.c.barcode == orders.c.barcode)
+    )
+
+
+def load_profit_frame(start, end):
+    """start-end arasındaki tüm siparişler: tek sorgu, sadece rapor kolonları."""
+    frame = pd.read_sql(_profit_query(start, end), db.session.connection())
+    logger.info(f"Kâr raporu için {len(frame)} sipariş satırı okundu.")
+    return frame
+
+
+def compute_profit(frame, package_cost=0.0, employee_cost=0.0, shipping_cost=0.0):
+    """
+    frame üzerinde kâr hesaplar; eksik tutar/maliyet 0 sayılır.
+    Dönen: (analiz DataFrame'i, özet sözlüğü, günlük kâr Series'i [tarih -> kâr]).
+    """
+    amount = frame['amount'].fillna(0).to_numpy(dtype=np.float64)
+    discount = frame['discount'].fillna(0).to_numpy(dtype=np.float64)
+    commission = frame['commission'].fillna(0).to_numpy(dtype=np.float64)
+    product_cost = pd.to_numeric(frame['product_cost'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    other_costs = float(package_cost) + float(employee_cost) + float(shipping_cost)
+
+    net_income = amount - discount - commission
+    total_expenses = product_cost + other_costs
+    profit = net_income - total_expenses
+
+    order_dates = pd.to_datetime(frame['order_date'])
+    analysis = pd.DataFrame({
+        'order_id': frame['order_id'],
+        'order_table': frame['order_table'],
+        # Şablon strftime çağırır; NaT yerine None
+        'order_date': order_dates.astype(object).where(order_dates.notna(), None),
+        'product': frame['product'].fillna('Bilinmiyor'),
+        'barcode': frame['barcode'].fillna('YOK'),
+        'status': frame['status'].fillna('Bilinmiyor'),
+        'net_income': net_income,
+        'product_cost': product_cost,
+        'other_costs': other_costs,
+        'total_expenses': total_expenses,
+        'profit': profit,
+    }, columns=ANALYSIS_COLUMNS)
+
+    count = len(analysis)
+    total_profit = float(profit.sum())
+    summary = {
+        'order_count': count,
+        'total_profit': total_profit,
+        'total_net_income': float(net_income.sum()),
+        'total_expenses': float(total_expenses.sum()),
+        'avg_profit': total_profit / count if count else 0.0,
+    }
+
+    # Tarihsiz siparişler grafiğe girmez (groupby NaT'yi atlar)
+    daily_profit = pd.Series(profit, index=frame.index).groupby(order_dates.dt.strftime('%Y-%m-%d')).sum()
+    return analysis, summary, daily_profit
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, jsonify
-import qrcode
-import os
+
+from render_cache import render_cache, PRODUCT_QR_OPTIONS
 
 qr_utils_bp = Blueprint('qr_utils', __name__)
 
@@ -8,26 +8,11 @@ qr_utils_bp = Blueprint('qr_utils', __name__)
 def generate_qr():
     """
     Trendyol'dan gelen barkod ile QR kod oluştur ve döndür.
+    Aynı barkodun QR'ı bir kez üretilir (render_cache).
     """
     barcode = request.args.get('barcode', '').strip()
     if not barcode:
         return jsonify({'success': False, 'message': 'Barkod eksik!'})
 
-    # QR kod oluşturma
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(barcode)
-    qr.make(fit=True)
-
-    # QR kodu kaydet
-    qr_dir = os.path.join('static', 'qr_codes')
-    os.makedirs(qr_dir, exist_ok=True)
-    qr_path = os.path.join(qr_dir, f"{barcode}.png")
-    qr.make_image(fill_color="black", back_color="white").save(qr_path)
-
-    # QR kod görselinin göreli yolunu döndür
-    return jsonify({'success': True, 'qr_code_path': f"/static/qr_codes/{barcode}.png"})
+    # QR kod görselinin yolunu döndür
+    return jsonify({'success': True, 'qr_code_path': render_cache.url('qr-png', barcode, **PRODUCT_QR_OPTIONS)})
@@ -0,0 +1,376 @@
+# render_cache.py
+# Barkod / QR / ürün etiketi görselleri için render önbelleği.
+# - Anahtar (sembol türü, içerik, seçenekler)'in sha1'idir; aynı kargo kodu ya da
+#   barkod aynı seçeneklerle bir kez çizilir.
+# - İki katman: süreç içinde MEMORY_ITEMS kayıtlık LRU, altında disk
+#   (static/render_cache/<tür>/<ab>/<anahtar>.<uzantı>). Disk tüm worker'lar
+#   arasında ortaktır; dosyalar atomik yazılır, içerik anahtardan türediği için
+#   tarayıcıda süresiz önbelleklenebilir.
+# - persist=False: sadece bellekte tutulur (ör. TOTP QR'ı, içinde gizli anahtar var).
+# - Toplu çizim (render_many) ortak süreç havuzunda (worker_pool) yapılır; bir günün etiketleri
+#   tek istekte, eksik olanlar paralel üretilir.
+# Renderer'lar @renderer('tür', uzantı, mimetype) ile kaydedilir.
+
+import io
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import barcode
+import qrcode
+from barcode.writer import SVGWriter, ImageWriter
+from flask import Blueprint, current_app, jsonify, request
+from PIL import Image, ImageDraw, ImageFont
+
+from login_logout import roles_required
+from worker_pool import worker_pool
+
+logger = logging.getLogger(__name__)
+
+RENDER_DIR_NAME = 'render_cache'
+MEMORY_ITEMS = 1024
+BATCH_LIMIT = 2000
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'fonts', 'arial.ttf')
+
+RENDERERS = {}  # tür -> (fonksiyon, uzantı, mimetype)
+
+render_cache_bp = Blueprint('render_cache', __name__)
+
+
+def renderer(symbology, extension, mimetype):
+    """Çizim fonksiyonunu kaydeder: func(payload, **seçenekler) -> bytes."""
+    def decorator(func):
+        RENDERERS[symbology] = (func, extension, mimetype)
+        return func
+    return decorator
+
+
+# --- Renderer'lar -----------------------------------------------------------
+
+@renderer('code128-svg', 'svg', 'image/svg+xml')
+def _code128_svg(payload, module_height=6, font_size=6, text_distance=2.2, quiet_zone=1):
+    # Varsayılanlar kargo etiketininkiyle aynı (barcode_utils.SHIPPING_BARCODE_OPTIONS)
+    barcode_class = barcode.get_barcode_class('code128')
+    buffer = io.BytesIO()
+    barcode_class(payload, writer=SVGWriter()).write(buffer, options={
+        'module_height': module_height,
+        'font_size': font_size,
+        'text_distance': text_distance,
+        'quiet_zone': quiet_zone,
+    })
+    return buffer.getvalue()
+
+
+@renderer('code128-png', 'png', 'image/png')
+def _code128_png(payload, module_width=0.3, module_height=12, font_size=10, text_distance=4, quiet_zone=2, dpi=300):
+    """PIL ile sayfaya yapıştırılacak barkodlar (toplu PDF) için raster Code128."""
+    barcode_class = barcode.get_barcode_class('code128')
+    buffer = io.BytesIO()
+    barcode_class(payload, writer=ImageWriter()).write(buffer, options={
+        'module_width': module_width,
+        'module_height': module_height,
+        'font_size': font_size,
+        'text_distance': text_distance,
+        'quiet_zone': quiet_zone,
+        'dpi': dpi,
+    })
+    return buffer.getvalue()
+
+
+@renderer('qr-png', 'png', 'image/png')
+def _qr_png(payload, box_size=10, border=4, error_correction='L'):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=getattr(qrcode.constants, f'ERROR_CORRECT_{error_correction}'),
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    qr.make_image(fill_color='black', back_color='white').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@renderer('product-label-png', 'png', 'image/png')
+def _product_label_png(payload, model='Model Bilinmiyor', color='Renk Bilinmiyor', size='Beden Bilinmiyor'):
+    """Code128 barkod + altında model / renk / beden."""
+    barcode_class = barcode.get_barcode_class('code128')
+    barcode_bytes = io.BytesIO()
+    barcode_class(payload, writer=ImageWriter()).write(barcode_bytes)
+    barcode_bytes.seek(0)
+
+    try:
+        font = ImageFont.truetype(FONT_PATH, 14)
+    except IOError:
+        font = ImageFont.load_default()
+
+    product_info = f"Model: {model}\nRenk: {color}\nBeden: {size}"
+    with Image.open(barcode_bytes) as barcode_image:
+        measure = ImageDraw.Draw(barcode_image)
+        left, top, right, bottom = measure.multiline_textbbox((0, 0), product_info, font=font)
+        text_width, text_height = right - left, bottom - top
+
+        combined_image = Image.new(
+            'RGB', (max(barcode_image.width, text_width + 10), barcode_image.height + text_height + 10), 'white'
+        )
+        combined_image.paste(barcode_image, (0, 0))
+        ImageDraw.Draw(combined_image).multiline_text(
+            (10, barcode_image.height + 5), product_info, font=font, fill='black'
+        )
+
+    output = io.BytesIO()
+    combined_image.save(output, format='PNG')
+    return output.getvalue()
+
+
+# --- Anahtar ve disk --------------------------------------------------------
+
+def render_key(symbology, payload, options):
+    raw = json.dumps([symbology, str(payload), sorted(options.items())], ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def relative_path(symbology, key):
+    """static klasörüne göre yol (url_for('static', filename=...) ile kullanılır)."""
+    return f"{RENDER_DIR_NAME}/{symbology}/{key[:2]}/{key}.{RENDERERS[symbology][1]}"
+
+
+def _write_atomic(full_path, content):
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    tmp_path = f"{full_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, full_path)
+
+
+def render_to_disk(static_root, symbology, payload, options):
+    """İşçi süreçte çalışır: dosya yoksa çizip yazar. Dönen: (anahtar, göreli yol, yeni mi)."""
+    key = render_key(symbology, payload, options)
+    relative = relative_path(symbology, key)
+    full_path = os.path.join(static_root, relative)
+    if os.path.exists(full_path):
+        return key, relative, False
+    _write_atomic(full_path, RENDERERS[symbology][0](payload, **options))
+    return key, relative, True
+
+
+class RenderCache:
+    def __init__(self, max_items=MEMORY_ITEMS):
+        self._max_items = max_items
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # anahtar -> bytes (None: diskte var, içerik okunmadı)
+        self._static_root = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+    def _root(self):
+        if self._static_root is None:
+            self._static_root = os.path.join(current_app.root_path, 'static')
+        return self._static_root
+
+    def _remember(self, key, content):
+        with self._lock:
+            if content is None and self._memory.get(key) is not None:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = content
+            self._memory.move_to_end(key)
+            while len(self._memory) > self._max_items:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, key):
+        """(bellekte mi, içerik). İçerik None ise dosya diskte."""
+        with self._lock:
+            if key not in self._memory:
+                return False, None
+            self._memory.move_to_end(key)
+            return True, self._memory[key]
+
+    def render(self, symbology, payload, persist=True, **options):
+        """Görselin baytları; bellek -> disk -> çizim sırasıyla."""
+        key = render_key(symbology, payload, options)
+        if not persist:
+            # Diskte karşılığı yok: path() bu kaydı "diskte var" sanmasın
+            key = f"mem:{key}"
+        _, content = self._lookup(key)
+        if content is not None:
+            self.hits += 1
+            return content
+
+        if persist:
+            full_path = os.path.join(self._root(), relative_path(symbology, key))
+            try:
+                with open(full_path, 'rb') as f:
+                    content = f.read()
+                self.disk_hits += 1
+            except FileNotFoundError:
+                content = None
+        if content is None:
+            content = RENDERERS[symbology][0](payload, **options)
+            self.renders += 1
+            if persist:
+                _write_atomic(full_path, content)
+        self._remember(key, content)
+        return content
+
+    def path(self, symbology, payload, **options):
+        """static'e göre göreli yol; dosya yoksa çizilir (tek stat, bellekte ise hiç)."""
+        key = render_key(symbology, payload, options)
+        relative = relative_path(symbology, key)
+        found, _ = self._lookup(key)
+        if found:
+            self.hits += 1
+            return relative
+        full_path = os.path.join(self._root(), relative)
+        if os.path.exists(full_path):
+            self.disk_hits += 1
+            self._remember(key, None)
+            return relative
+        content = RENDERERS[symbology][0](payload, **options)
+        self.renders += 1
+        _write_atomic(full_path, content)
+        self._remember(key, content)
+        return relative
+
+    def url(self, symbology, payload, **options):
+        return f"/static/{self.path(symbology, payload, **options)}"
+
+    def render_many(self, items):
+        """
+        items: [(tür, içerik, seçenekler)]. Bellekte olmayanlar süreç havuzunda
+        diske çizilir. Dönen: girdiyle aynı sırada göreli yollar (hata -> None).
+        """
+        static_root = self._root()
+        started = time.monotonic()
+        results = [None] * len(items)
+        pending = {}
+        for index, (symbology, payload, options) in enumerate(items):
+            key = render_key(symbology, payload, options)
+            found, _ = self._lookup(key)
+            if found:
+                self.hits += 1
+                results[index] = relative_path(symbology, key)
+            elif key in pending:
+                pending[key][1].append(index)
+            else:
+                pending[key] = ((symbology, payload, options), [index])
+
+        futures = [
+            (worker_pool.submit(render_to_disk, static_root, *job), indexes)
+            for job, indexes in pending.values()
+        ]
+        created = failed = 0
+        for future, indexes in futures:
+            try:
+                key, relative, new = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error(f"Toplu çizim hatası: {e}")
+                continue
+            created += new
+            self._remember(key, None)
+            for index in indexes:
+                results[index] = relative
+
+        self.renders += created
+        self.disk_hits += len(futures) - created - failed
+        logger.info(
+            f"Toplu çizim: {len(items)} istek, {len(pending)} tekil, {created} yeni, "
+            f"{failed} hata, {time.monotonic() - started:.2f} sn"
+        )
+        return results
+
+    def stats(self):
+        with self._lock:
+            size = len(self._memory)
+        return {'memory_items': size, 'hits': self.hits, 'disk_hits': self.disk_hits, 'renders': self.renders}
+
+
+render_cache = RenderCache()
+
+
+# --- Toplu çizim endpoint'i -------------------------------------------------
+
+PRODUCT_QR_OPTIONS = {}
+
+
+def _order_shipping_codes(order_numbers):
+    """order_number -> kargo kodu (shipping_barcode), tüm sipariş tablolarından."""
+    from order_locator import MODEL_BY_TABLE
+
+    wanted = {str(number) for number in order_numbers if number}
+    codes = {}
+    for model_cls in MODEL_BY_TABLE.values():
+        if len(codes) == len(wanted) or not hasattr(model_cls, 'shipping_barcode'):
+            continue
+        rows = model_cls.query.with_entities(model_cls.order_number, model_cls.shipping_barcode) \
+            .filter(model_cls.order_number.in_(list(wanted - set(codes)))).all()
+        for number, code in rows:
+            if code:
+                codes.setdefault(number, code)
+    return codes
+
+
+def _product_label_items(barcodes):
+    from models import Product
+
+    products = {
+        product.barcode: product
+        for product in Product.query.filter(Product.barcode.in_(barcodes)).all()
+    }
+    items = {}
+    for code in barcodes:
+        product = products.get(code)
+        if product is not None:
+            items[code] = ('product-label-png', code, {
+                'model': product.product_main_id or 'Model Bilinmiyor',
+                'color': product.color or 'Renk Bilinmiyor',
+                'size': product.size or 'Beden Bilinmiyor',
+            })
+    return items
+
+
+@render_cache_bp.route('/api/render/batch', methods=['POST'])
+@roles_required('admin', 'manager', 'worker')
+def render_batch():
+    """
+    Toplu etiket/barkod çizimi. Gövde (JSON):
+      {"order_numbers": [...]}                         -> kargo barkodları (code128 SVG)
+      {"barcodes": [...], "kind": "qr" | "label"}      -> ürün QR'ı / ürün etiketi
+    Dönen: {"items": {anahtar: url}, "missing": [...]}.
+    """
+    data = request.get_json(silent=True) or {}
+    order_numbers = [str(n).strip() for n in data.get('order_numbers') or [] if str(n).strip()]
+    barcodes = [str(b).strip() for b in data.get('barcodes') or [] if str(b).strip()]
+    if not order_numbers and not barcodes:
+        return jsonify({'success': False, 'message': 'order_numbers veya barcodes gerekli.'}), 400
+    if len(order_numbers) + len(barcodes) > BATCH_LIMIT:
+        return jsonify({'success': False, 'message': f'En fazla {BATCH_LIMIT} kayıt gönderilebilir.'}), 400
+
+    jobs = {}
+    if order_numbers:
+        from barcode_utils import SHIPPING_BARCODE_OPTIONS
+        codes = _order_shipping_codes(order_numbers)
+        jobs.update({
+            number: ('code128-svg', code, SHIPPING_BARCODE_OPTIONS) for number, code in codes.items()
+        })
+    if barcodes:
+        kind = data.get('kind', 'qr')
+        if kind == 'label':
+            jobs.update(_product_label_items(barcodes))
+        elif kind == 'qr':
+            jobs.update({code: ('qr-png', code, PRODUCT_QR_OPTIONS) for code in barcodes})
+        else:
+            return jsonify({'success': False, 'message': f'Bilinmeyen tür: {kind}'}), 400
+
+    keys = list(jobs)
+    paths = render_cache.render_many([jobs[key] for key in keys])
+    items = {key: f"/static/{path}" for key, path in zip(keys, paths, strict=True) if path}
+    missing = [key for key in order_numbers + barcodes if key not in items]
+    return jsonify({'success': True, 'items': items, 'missing': missing, 'cache': render_cache.stats()})
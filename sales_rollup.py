@@ -0,0 +1,166 @@
+# sales_rollup.py
+# daily_sales_rollup: gün x statü x ürün varyantı başına sipariş adedi, tutar, miktar
+# ve komisyon toplamı. all_orders üzerindeki statement seviyesi trigger'lar (transition
+# table'larla) her INSERT/UPDATE/DELETE'in farkını özete ekler/çıkarır; sipariş
+# senkronizasyonu, statü geçişleri ve ORM yazımları all_orders üzerinden buraya yansır.
+# Analiz uçları tarih aralığını beş tabloyu gruplamak yerine bu tablodan okur.
+#
+# Yeniden doldurma (tümü veya tarih aralığı):
+#   python sales_rollup.py [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+
+import os
+import logging
+import argparse
+from datetime import datetime
+from sqlalchemy import text, create_engine
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ['sale_date', 'status', 'product_main_id', 'merchant_sku', 'product_color', 'product_size']
+
+APPLY_FUNCTION = 'daily_sales_rollup_apply'
+TRUNCATE_FUNCTION = 'daily_sales_rollup_truncate'
+
+# all_orders satırlarından özet anahtarı ve ölçüleri (NULL anahtarlar '' olur)
+_AGGREGATE_SELECT = """
+SELECT order_date::date, coalesce(status, ''), coalesce(product_main_id, ''),
+       coalesce(merchant_sku, ''), coalesce(product_color, ''), coalesce(product_size, ''),
+       {sign} count(*), {sign} coalesce(sum(amount::numeric), 0),
+       {sign} coalesce(sum(quantity), 0), {sign} coalesce(sum(commission::numeric), 0)
+FROM {source}
+WHERE order_date IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5, 6
+"""
+
+_KEYS = ', '.join(KEY_COLUMNS)
+_MEASURES = 'order_count, total_amount, total_quantity, total_commission'
+
+_UPSERT = f"""
+INSERT INTO daily_sales_rollup AS r ({_KEYS}, {_MEASURES})
+{{select}}
+ON CONFLICT ({_KEYS}) DO UPDATE SET
+    order_count = r.order_count + EXCLUDED.order_count,
+    total_amount = r.total_amount + EXCLUDED.total_amount,
+    total_quantity = r.total_quantity + EXCLUDED.total_quantity,
+    total_commission = r.total_commission + EXCLUDED.total_commission
+"""
+
+
+def _apply_sql(source, sign):
+    return _UPSERT.format(select=_AGGREGATE_SELECT.format(source=source, sign=sign))
+
+
+def _function_sql():
+    return f"""
+CREATE OR REPLACE FUNCTION {APPLY_FUNCTION}() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        {_apply_sql('old_rows', '-')};
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        {_apply_sql('new_rows', '')};
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        -- Siparişi kalmayan anahtarlar silinir
+        DELETE FROM daily_sales_rollup r
+        WHERE r.order_count <= 0
+          AND r.sale_date IN (SELECT DISTINCT order_date::date FROM old_rows WHERE order_date IS NOT NULL);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION {TRUNCATE_FUNCTION}() RETURNS trigger AS $$
+BEGIN
+    TRUNCATE daily_sales_rollup;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+# (trigger adı, olay, REFERENCING)
+TRIGGERS = [
+    ('trg_all_orders_rollup_insert', 'INSERT', 'REFERENCING NEW TABLE AS new_rows'),
+    ('trg_all_orders_rollup_update', 'UPDATE', 'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('trg_all_orders_rollup_delete', 'DELETE', 'REFERENCING OLD TABLE AS old_rows'),
+]
+TRUNCATE_TRIGGER = 'trg_all_orders_rollup_truncate'
+
+
+def ensure_daily_sales_rollup(engine):
+    """
+    Trigger fonksiyonlarını günceller, eksik trigger'ları kurar; trigger yeni
+    kurulduysa özet all_orders'tan baştan doldurulur. Uygulama açılışında,
+    ensure_all_orders_table'dan sonra çağrılır.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(_function_sql()))
+
+        existing = {
+            row[0] for row in conn.execute(text(
+                "SELECT tgname FROM pg_trigger WHERE NOT tgisinternal"
+            ))
+        }
+        installed = False
+        for name, event, referencing in TRIGGERS:
+            if name in existing:
+                continue
+            conn.execute(text(
+                f"CREATE TRIGGER {name} AFTER {event} ON all_orders {referencing} "
+                f"FOR EACH STATEMENT EXECUTE FUNCTION {APPLY_FUNCTION}()"
+            ))
+            installed = True
+        if TRUNCATE_TRIGGER not in existing:
+            conn.execute(text(
+                f"CREATE TRIGGER {TRUNCATE_TRIGGER} AFTER TRUNCATE ON all_orders "
+                f"FOR EACH STATEMENT EXECUTE FUNCTION {TRUNCATE_FUNCTION}()"
+            ))
+            installed = True
+
+        if installed:
+            rebuild_daily_sales_rollup(conn)
+
+
+def rebuild_daily_sales_rollup(conn, start_date=None, end_date=None):
+    """
+    Özeti all_orders'tan yeniden hesaplar; start_date/end_date (date) verilirse yalnızca
+    o günleri. all_orders yazmaya kapatılır ki hesap sırasında gelen değişiklik kaybolmasın.
+    """
+    conn.execute(text("LOCK TABLE all_orders IN SHARE MODE"))
+
+    conditions, params = [], {}
+    if start_date:
+        conditions.append("{day} >= :start_date")
+        params['start_date'] = start_date
+    if end_date:
+        conditions.append("{day} <= :end_date")
+        params['end_date'] = end_date
+
+    if conditions:
+        conn.execute(text(
+            f"DELETE FROM daily_sales_rollup WHERE {' AND '.join(conditions).format(day='sale_date')}"
+        ), params)
+        source = f"(SELECT * FROM all_orders WHERE {' AND '.join(conditions).format(day='order_date::date')}) AS a"
+    else:
+        conn.execute(text("DELETE FROM daily_sales_rollup"))
+        source = 'all_orders'
+    inserted = conn.execute(text(_apply_sql(source, '')), params).rowcount or 0
+    logger.info(f"daily_sales_rollup yeniden hesaplandı: {inserted} satır.")
+    return inserted
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="daily_sales_rollup tablosunu all_orders'tan yeniden doldurur.")
+    parser.add_argument('--start', type=_parse_date, help='YYYY-MM-DD (dahil)')
+    parser.add_argument('--end', type=_parse_date, help='YYYY-MM-DD (dahil)')
+    args = parser.parse_args()
+
+    engine = create_engine(os.environ['DATABASE_URL'])
+    with engine.begin() as conn:
+        rebuild_daily_sales_rollup(conn, args.start, args.end)
@@ -0,0 +1,139 @@
+# search_index.py
+# Metin araması: pg_trgm GIN index'leri + isim/başlık için tsvector kolonları.
+# '%q%' ILIKE, trigram index ile tablo taramasına düşmeden çalışır;
+# isimler ayrıca tsvector üzerinden önek eşleşmesiyle (ahm yıl -> Ahmet Yılmaz) aranır.
+# Tüm blueprint'ler search_filter / apply_search üzerinden arar; sayfalı sonuç
+# listeleri search_page ile sadece istenen sayfayı yükler.
+
+import re
+import logging
+from sqlalchemy import text, func, or_, literal
+
+logger = logging.getLogger(__name__)
+
+# (index adı, tablo, kolon/ifade) -> CREATE INDEX ... USING gin (kolon gin_trgm_ops)
+TRIGRAM_INDEXES = [
+    ('trgm_all_orders_order_number', 'all_orders', 'order_number'),
+    ('trgm_orders_created_order_number', 'orders_created', 'order_number'),
+    ('trgm_orders_picking_order_number', 'orders_picking', 'order_number'),
+    ('trgm_orders_shipped_order_number', 'orders_shipped', 'order_number'),
+    ('trgm_orders_delivered_order_number', 'orders_delivered', 'order_number'),
+    ('trgm_orders_cancelled_order_number', 'orders_cancelled', 'order_number'),
+    ('trgm_products_barcode', 'products', 'barcode'),
+    ('trgm_products_product_main_id', 'products', 'product_main_id'),
+    ('trgm_products_title', 'products', 'title'),
+    ('trgm_yeni_siparisler_siparis_no', 'yeni_siparisler', 'siparis_no'),
+    ('trgm_yeni_siparisler_musteri_adi', 'yeni_siparisler', 'musteri_adi'),
+    ('trgm_yeni_siparisler_musteri_soyadi', 'yeni_siparisler', 'musteri_soyadi'),
+    ('trgm_user_logs_action', 'user_logs', 'action'),
+    ('trgm_user_logs_details', 'user_logs', '(details::text)'),  # JSONB, metin olarak aranır
+]
+
+# Mevcut tablolara eklenecek tsvector kolonları (modeldeki Computed ile aynı ifade)
+VECTOR_COLUMNS = [
+    ('products', "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(product_main_id, ''))"),
+    ('yeni_siparisler', "to_tsvector('simple', coalesce(musteri_adi, '') || ' ' || coalesce(musteri_soyadi, ''))"),
+]
+
+# ensure_search_indexes pg_trgm'yi kuramazsa similarity() kullanılmaz
+TRIGRAM_AVAILABLE = True
+
+
+def ensure_search_indexes(engine):
+    """
+    pg_trgm eklentisini, trigram index'lerini ve tsvector kolonlarını kurar.
+    Uygulama açılışında çağrılır; hepsi IF NOT EXISTS ile idempotent.
+    Eklenti kurulamazsa (yetki) aramalar index'siz çalışmaya devam eder.
+    """
+    global TRIGRAM_AVAILABLE
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as e:
+        logger.warning(f"pg_trgm kurulamadı, trigram index'leri atlanıyor: {e}")
+        TRIGRAM_AVAILABLE = False
+
+    with engine.begin() as conn:
+        for table, expression in VECTOR_COLUMNS:
+            conn.execute(text(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS ({expression}) STORED"
+            ))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)"
+            ))
+
+        if TRIGRAM_AVAILABLE:
+            for index_name, table, column in TRIGRAM_INDEXES:
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING gin ({column} gin_trgm_ops)"
+                ))
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def prefix_tsquery(term):
+    """'ahm yıl' -> to_tsquery('simple', 'ahm:* & yıl:*'); kelime yoksa None."""
+    words = re.findall(r'\w+', term.lower())
+    if not words:
+        return None
+    return func.to_tsquery('simple', ' & '.join(f"{w}:*" for w in words))
+
+
+def search_filter(term, trigram_columns=(), vector_column=None):
+    """
+    trigram_columns'tan birinde alt dize olarak geçen veya vector_column'da
+    kelime önekleri eşleşen satırlar için WHERE koşulu.
+    """
+    term = (term or '').strip()
+    conditions = [col.ilike(_like_pattern(term), escape='\\') for col in trigram_columns]
+    if vector_column is not None:
+        tsquery = prefix_tsquery(term)
+        if tsquery is not None:
+            conditions.append(vector_column.op('@@')(tsquery))
+    return or_(*conditions) if conditions else literal(False)
+
+
+def search_rank(term, trigram_columns=(), vector_column=None):
+    """Sıralama için benzerlik puanı (en iyi trigram benzerliği + ts_rank)."""
+    term = (term or '').strip()
+    scores = []
+    if TRIGRAM_AVAILABLE:
+        scores = [func.coalesce(func.similarity(col, term), 0) for col in trigram_columns]
+    if vector_column is not None:
+        tsquery = prefix_tsquery(term)
+        if tsquery is not None:
+            scores.append(func.ts_rank(vector_column, tsquery))
+    if not scores:
+        return literal(0)
+    return func.greatest(*scores) if len(scores) > 1 else scores[0]
+
+
+def apply_search(query, term, trigram_columns=(), vector_column=None, ranked=True):
+    """
+    Sorguya arama filtresi ekler; ranked ise en alakalı sonuçlar öne alınır
+    (çağıranın order_by'ı ikincil sıralama olarak eklenebilir).
+    Sayfalı sonuç için search_page kullanılır.
+    """
+    query = query.filter(search_filter(term, trigram_columns, vector_column))
+    if ranked:
+        query = query.order_by(search_rank(term, trigram_columns, vector_column).desc())
+    return query
+
+
+def search_page(query, term, trigram_columns=(), vector_column=None, page=1, per_page=50,
+                ranked=True, order_by=()):
+    """
+    Arama + sayfalama: eşleşmelerin sadece istenen sayfası yüklenir.
+    order_by alaka sırasından sonra (ranked=False ise tek başına) uygulanır.
+    Terim boşsa filtre eklenmez, sorgu olduğu gibi sayfalanır.
+    Dönen: Flask-SQLAlchemy Pagination (items, total, pages, has_next, ...).
+    """
+    if (term or '').strip():
+        query = apply_search(query, term, trigram_columns, vector_column, ranked)
+    if order_by:
+        query = query.order_by(*order_by)
+    return query.paginate(page=max(page or 1, 1), per_page=per_page, error_out=False)
@@ -2,6 +2,9 @@ from flask import Blueprint, render_template, request, redirect, url_for, jsonif
 import json
 from datetime import datetime
 from models import db, SiparisFisi, Product
+from cache_layer import cached
+from get_products import catalog_page_data
+from label_pdf import packing_slips_pdf, MAX_ITEMS
 from PIL import Image
 import os
 
@@ -12,32 +15,6 @@ def json_loads_filter(s):
     return json.loads(s)
 
 
-# ------------------------------------------------------------
-# YARDIMCI FONKSİYONLAR (Gruplama & Beden Sıralama)
-# ------------------------------------------------------------
-def group_products_by_model_and_color(products):
-    """
-    Product tablosundan gelen kayıtları (model, renk) ikilisine göre gruplar.
-    Örn: grouped_products[(model_id, color)] = [list_of_products]
-    """
-    grouped_products = {}
-    for product in products:
-        # product_main_id veya color eksikse, boş string ile geçici olarak dolduralım
-        key = (product.product_main_id or '', product.color or '')
-        grouped_products.setdefault(key, []).append(product)
-    return grouped_products
-
-def sort_variants_by_size(product_group):
-    """
-    Ürünlerin 'size' alanını (beden) büyükten küçüğe doğru sıralar.
-    Numerik değilse, alfabetik ters sırada sıralama yapar.
-    """
-    try:
-        return sorted(product_group, key=lambda x: float(x.size), reverse=True)
-    except (ValueError, TypeError):
-        return sorted(product_group, key=lambda x: x.size, reverse=True)
-
-
 # ------------------------------------------------------------
 # YENİ ROTA: /siparis_fisi_urunler
 # ------------------------------------------------------------
@@ -47,29 +24,16 @@ def siparis_fisi_urunler():
     Product tablosundaki ürünleri (model_main_id, color) bazında gruplar,
     sayfalama yapar ve 'siparis_fisi_urunler.html' şablonuna gönderir.
     """
-    # Tüm veya bir filtreyle çekebilirsiniz (örneğin hidden=False).
-    products = Product.query.all()
-
-    # 1) Gruplama: (model, color) bazında
-    grouped_products = group_products_by_model_and_color(products)
-
-    # 2) Sayfalama ayarları
     page = request.args.get('page', 1, type=int)
     per_page = 9
-    total_groups = len(grouped_products)
-
-    # 3) Grupları keylerine göre sıralayalım
-    sorted_keys = sorted(grouped_products.keys())
-    paginated_keys = sorted_keys[(page - 1) * per_page : page * per_page]
 
-    # 4) Her grup içindeki product listelerini 'size' alanına göre sırala
-    paginated_product_groups = {
-        key: sort_variants_by_size(grouped_products[key])
-        for key in paginated_keys
-    }
+    # Gruplar SQL'de sayfalanır (ürün kataloğuyla aynı sıra), varyantlar bedene göre sıralı;
+    # ürünler değişene kadar sayfa verisi önbellekten gelir
+    page_data = cached('products', ['catalog', page, per_page], lambda: catalog_page_data(page, per_page))
+    paginated_product_groups = {(model_id, color): group for model_id, color, group in page_data['groups']}
 
-    # 5) Toplam sayfa hesabı
-    total_pages = (total_groups + per_page - 1) // per_page
+    # Toplam sayfa hesabı
+    total_pages = (page_data['total_groups'] + per_page - 1) // per_page
 
     return render_template(
         "siparis_fisi_urunler.html",  # Bu şablonu oluşturmalısınız
@@ -189,6 +153,38 @@ def toplu_yazdir(fis_ids):
         return jsonify({"mesaj": "Hata oluştu", "error": str(e)}), 500
 
 
+@siparis_fisi_bp.route("/siparis_fisi/toplu_pdf/<fis_ids>")
+def toplu_pdf(fis_ids):
+    """
+    Seçili fişleri tarayıcıda tek tek yazdırmak yerine sunucuda
+    tek, çok sayfalı PDF olarak üretir (barkodlar dahil).
+    """
+    try:
+        id_list = [int(id_) for id_ in fis_ids.split(',')]
+    except ValueError:
+        return jsonify({"mesaj": "Geçersiz fiş numarası"}), 400
+    if len(id_list) > MAX_ITEMS:
+        return jsonify({"mesaj": f"En fazla {MAX_ITEMS} fiş seçilebilir"}), 400
+
+    fisler = SiparisFisi.query.filter(SiparisFisi.siparis_id.in_(id_list)).all()
+    if not fisler:
+        return jsonify({"mesaj": "Seçili fişler bulunamadı"}), 404
+    order = {fis_id: index for index, fis_id in enumerate(id_list)}
+    fisler.sort(key=lambda fis: order[fis.siparis_id])
+
+    try:
+        response = packing_slips_pdf(fisler)
+    except Exception as e:
+        return jsonify({"mesaj": "PDF oluşturulamadı", "error": str(e)}), 500
+
+    # Yazdırma tarihlerini güncelle
+    current_time = datetime.now()
+    for fis in fisler:
+        fis.print_date = current_time
+    db.session.commit()
+    return response
+
+
 # =====================
 # 5) Fiş Detay Sayfası
 # =====================
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
 from models import db, Order, Product, YeniSiparis, SiparisUrun
+from search_index import search_filter, search_rank, search_page
 from datetime import datetime
 import json
 from logger_config import app_logger, order_logger
@@ -7,6 +8,8 @@ import traceback
 
 logger = order_logger
 
+SEARCH_PER_PAGE = 100  # hızlı aramada sayfa başına en fazla sipariş
+
 siparisler_bp = Blueprint('siparisler_bp', __name__)
 
 @siparisler_bp.route('/yeni-siparis', methods=['GET', 'POST'])
@@ -31,13 +34,11 @@ def yeni_siparis():
             # Filtreleme
             if siparis_no:
                 logger.debug("Sipariş numarasına göre filtreleme: %s", siparis_no)
-                query = query.filter(YeniSiparis.siparis_no.ilike(f'%{siparis_no}%'))
+                query = query.filter(search_filter(siparis_no, [YeniSiparis.siparis_no]))
 
             if musteri_adi:
                 logger.debug("Müşteri adına göre filtreleme: %s", musteri_adi)
-                query = query.filter(
-                    (YeniSiparis.musteri_adi + ' ' + YeniSiparis.musteri_soyadi).ilike(f'%{musteri_adi}%')
-                )
+                query = query.filter(search_filter(musteri_adi, vector_column=YeniSiparis.search_vector))
 
             if durum:
                 logger.debug("Duruma göre filtreleme: %s", durum)
@@ -179,32 +180,41 @@ def siparis_ara():
         # Base query
         logger.debug("Temel sorgu oluşturuluyor.")
         query = YeniSiparis.query
+        page = request.args.get('page', 1, type=int)
+        per_page = min(request.args.get('per_page', SEARCH_PER_PAGE, type=int), SEARCH_PER_PAGE)
+        by_date = (YeniSiparis.siparis_tarihi.desc(),)
+        # İsimde alt dize (trigram ILIKE) + kelime önekleri (tsvector)
+        name_columns = [YeniSiparis.musteri_adi, YeniSiparis.musteri_soyadi]
 
-        # Arama alanına göre filtreleme
+        # Arama alanına göre filtreleme; sonuçlar alakaya, sonra tarihe göre sayfalı
         if field == 'siparis_no':
             logger.debug("Sipariş numarası alanında arama yapılıyor: %s", search_query)
-            query = query.filter(YeniSiparis.siparis_no.ilike(f'%{search_query}%'))
+            sonuc_sayfasi = search_page(query, search_query, [YeniSiparis.siparis_no],
+                                        page=page, per_page=per_page, order_by=by_date)
         elif field == 'musteri':
             logger.debug("Müşteri alanında arama yapılıyor: %s", search_query)
-            query = query.filter(
-                (YeniSiparis.musteri_adi + ' ' + YeniSiparis.musteri_soyadi).ilike(f'%{search_query}%')
-            )
+            sonuc_sayfasi = search_page(query, search_query, name_columns,
+                                        vector_column=YeniSiparis.search_vector,
+                                        page=page, per_page=per_page, order_by=by_date)
         elif field == 'durum':
             logger.debug("Durum alanında arama yapılıyor: %s", search_query)
             query = query.filter(YeniSiparis.durum.ilike(f'%{search_query}%'))
+            sonuc_sayfasi = search_page(query, None, page=page, per_page=per_page, order_by=by_date)
         else:  # 'all' veya başka bir değer için
             logger.debug("Tüm alanlarda arama yapılıyor: %s", search_query)
-            query = query.filter(
-                db.or_(
-                    YeniSiparis.siparis_no.ilike(f'%{search_query}%'),
-                    (YeniSiparis.musteri_adi + ' ' + YeniSiparis.musteri_soyadi).ilike(f'%{search_query}%'),
-                    YeniSiparis.durum.ilike(f'%{search_query}%')
-                )
+            query = query.filter(db.or_(
+                search_filter(search_query, [YeniSiparis.siparis_no, *name_columns],
+                              vector_column=YeniSiparis.search_vector),
+                YeniSiparis.durum.ilike(f'%{search_query}%')
+            )).order_by(
+                search_rank(search_query, [YeniSiparis.siparis_no, *name_columns],
+                            vector_column=YeniSiparis.search_vector).desc()
             )
+            sonuc_sayfasi = search_page(query, None, page=page, per_page=per_page, order_by=by_date)
 
-        # Siparişleri al ve son 100 ile sınırla
-        siparisler = query.order_by(YeniSiparis.siparis_tarihi.desc()).limit(100).all()
-        logger.debug("Toplam %d sipariş bulundu. (Limit 100)", len(siparisler))
+        siparisler = sonuc_sayfasi.items
+        logger.debug("Toplam %d sipariş bulundu, sayfa %d: %d kayıt.",
+                     sonuc_sayfasi.total, sonuc_sayfasi.page, len(siparisler))
 
         # JSON için formatla
         sonuclar = [{
@@ -221,7 +231,11 @@ def siparis_ara():
         return jsonify({
             'success': True,
             'siparisler': sonuclar,
-            'count': len(sonuclar)
+            'count': len(sonuclar),
+            'total': sonuc_sayfasi.total,
+            'page': sonuc_sayfasi.page,
+            'pages': sonuc_sayfasi.pages,
+            'has_next': sonuc_sayfasi.has_next
         })
 
     except Exception as e:
@@ -247,7 +261,7 @@ def kendi_siparislerim():
         # Sipariş numarasına göre filtreleme
         if siparis_no:
             logger.debug("Sipariş numarasına göre filtreleme uygulanıyor: %s", siparis_no)
-            query = query.filter(YeniSiparis.siparis_no.ilike(f'%{siparis_no}%'))
+            query = query.filter(search_filter(siparis_no, [YeniSiparis.siparis_no]))
 
         # Siparişleri getir
         siparisler = query.order_by(YeniSiparis.siparis_tarihi.desc()).all()
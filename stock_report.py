@@ -1,14 +1,14 @@
-
 from flask import Blueprint, render_template
 from models import Product
 from sqlalchemy import func
+from cache_layer import cached
 
 stock_report_bp = Blueprint('stock_report', __name__)
 
-@stock_report_bp.route('/stock-report')
-def stock_report():
+
+def _stock_stats():
     # Stok durumunu grupla ve hesapla
-    stock_stats = Product.query.with_entities(
+    rows = Product.query.with_entities(
         Product.product_main_id,
         Product.color,
         Product.size,
@@ -18,5 +18,11 @@ def stock_report():
         Product.color,
         Product.size
     ).all()
-    
+    return [dict(row._mapping) for row in rows]
+
+
+@stock_report_bp.route('/stock-report')
+def stock_report():
+    # Ürün tablosu değişene kadar önbellekten (şablon satırlara stat.alan diye erişir)
+    stock_stats = cached('products', ['stock_report'], _stock_stats)
     return render_template('stock_report.html', stock_stats=stock_stats)
@@ -0,0 +1,259 @@
+# sync_jobs.py
+# Uzun süren Trendyol senkronizasyonları HTTP isteğinin dışında, süreç içi bir iş
+# havuzunda çalışır. Endpoint işi sync_jobs tablosuna yazıp iş no'su ile hemen döner;
+# ilerleme ve sonuç aynı tablodan okunur (geçmiş kalıcıdır).
+# - Aynı türden tek aktif iş: kısmi unique index (ux_sync_jobs_active); ikinci istek
+#   mevcut işin no'sunu alır. Tüm gunicorn worker'ları için geçerlidir.
+# - Çalışan işler HEARTBEAT_INTERVAL'da bir heartbeat_at günceller; süreç ölürse iş
+#   STALE_AFTER sonra başarısız sayılır ve yenisi başlatılabilir.
+# İş fonksiyonları modüllerinde @sync_job('tür', params={'ad': tip}) ile kaydedilir;
+# /jobs üzerinden sadece tanımlı parametreler, doğru tipte kabul edilir.
+
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, jsonify, request, session
+from sqlalchemy import update, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import db, SyncJob
+from login_logout import roles_required
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 2
+HEARTBEAT_INTERVAL = 30  # saniye
+STALE_AFTER = timedelta(seconds=HEARTBEAT_INTERVAL * 4)
+ACTIVE_STATUSES = ('queued', 'running')
+HISTORY_LIMIT = 50
+
+JOB_FUNCTIONS = {}  # tür -> (fonksiyon, açıklama)
+JOB_PARAMS = {}  # tür -> {parametre: tip} (/jobs'tan kabul edilenler)
+
+_current = threading.local()
+
+sync_jobs_bp = Blueprint('sync_jobs', __name__)
+
+
+def sync_job(job_type, label=None, params=None):
+    """
+    İş fonksiyonunu kaydeder. Fonksiyon app context içinde, params'ı kwargs olarak alır.
+    params: {ad: bool|int|str}; /jobs endpoint'i sadece bunları kabul eder.
+    """
+    def decorator(func):
+        JOB_FUNCTIONS[job_type] = (func, label or job_type)
+        JOB_PARAMS[job_type] = dict(params or {})
+        return func
+    return decorator
+
+
+def _coerce_param(name, value, kind):
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        if str(value).strip().lower() in ('1', 'true', 'on', 'yes'):
+            return True
+        if str(value).strip().lower() in ('0', 'false', 'off', 'no', ''):
+            return False
+    elif kind is int:
+        if not isinstance(value, bool):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                pass
+    elif kind is str and isinstance(value, str):
+        return value
+    raise ValueError(f"{name}: geçersiz değer ({value!r})")
+
+
+def validate_job_params(job_type, raw):
+    """Dışarıdan gelen parametreleri işin tanımına göre süzer; bilinmeyen/hatalı değerde ValueError."""
+    if not isinstance(raw, dict):
+        raise ValueError("Parametreler JSON nesnesi olmalı.")
+    allowed = JOB_PARAMS.get(job_type, {})
+    unknown = sorted(set(raw) - set(allowed))
+    if unknown:
+        raise ValueError(f"Bilinmeyen parametre: {', '.join(unknown)}")
+    return {name: _coerce_param(name, value, allowed[name]) for name, value in raw.items()}
+
+
+def report_progress(message):
+    """Çalışan işin ilerleme metnini günceller; iş dışında çağrılırsa bir şey yapmaz."""
+    job_id = getattr(_current, 'job_id', None)
+    if job_id is None:
+        return
+    job_runner.update(job_id, progress=str(message)[:1000])
+
+
+class JobRunner:
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._max_workers = max_workers
+        self._executor = None
+        self._app = None
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self, app):
+        """Uygulama açılışında bir kez çağrılır."""
+        if self._executor is not None:
+            return
+        self._app = app
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='sync-job')
+        threading.Thread(target=self._heartbeat, name='sync-job-heartbeat', daemon=True).start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def enqueue(self, job_type, params=None, user_id=None):
+        """
+        İşi kaydedip havuza verir. Aynı türden aktif iş varsa yenisi açılmaz.
+        Dönen: (SyncJob, yeni_mi).
+        """
+        if job_type not in JOB_FUNCTIONS:
+            raise KeyError(f"Bilinmeyen iş türü: {job_type}")
+        self._expire_stale(job_type)
+
+        while True:
+            job_id = self._insert(job_type, params, user_id)
+            if job_id is not None:
+                break
+            active = SyncJob.query.filter(
+                SyncJob.job_type == job_type, SyncJob.status.in_(ACTIVE_STATUSES)
+            ).first()
+            if active is not None:
+                return active, False
+            # Çakışan iş bu arada bitti; tekrar dene
+
+        self._executor.submit(self._run, job_id)
+        logger.info(f"{job_type} işi kuyruğa alındı (#{job_id}).")
+        return db.session.get(SyncJob, job_id), True
+
+    def _insert(self, job_type, params, user_id):
+        """Aktif iş yoksa yeni satır ekleyip id'sini, varsa None döner."""
+        stmt = pg_insert(SyncJob.__table__).values(
+            job_type=job_type,
+            status='queued',
+            params=params or {},
+            requested_by=user_id,
+            created_at=datetime.utcnow(),
+            heartbeat_at=datetime.utcnow(),
+        ).on_conflict_do_nothing(
+            index_elements=['job_type'],
+            index_where=text("status IN ('queued', 'running')"),  # index koşuluyla birebir
+        ).returning(SyncJob.__table__.c.id)
+        job_id = db.session.execute(stmt).scalar()
+        db.session.commit()
+        return job_id
+
+    def update(self, job_id, **values):
+        """İş satırını çağıranın oturumundan bağımsız, kendi bağlantısıyla günceller."""
+        values.setdefault('heartbeat_at', datetime.utcnow())
+        with self._app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(update(SyncJob.__table__).where(SyncJob.__table__.c.id == job_id).values(**values))
+
+    def _expire_stale(self, job_type):
+        limit = datetime.utcnow() - STALE_AFTER
+        expired = SyncJob.query.filter(
+            SyncJob.job_type == job_type,
+            SyncJob.status.in_(ACTIVE_STATUSES),
+            SyncJob.heartbeat_at < limit,
+        ).update({
+            'status': 'failed',
+            'error': 'İşi çalıştıran süreç yanıt vermiyor (heartbeat kesildi).',
+            'finished_at': datetime.utcnow(),
+        }, synchronize_session=False)
+        if expired:
+            logger.warning(f"{job_type}: {expired} yarım kalmış iş başarısız sayıldı.")
+        db.session.commit()
+
+    def _run(self, job_id):
+        with self._app.app_context():
+            job = db.session.get(SyncJob, job_id)
+            func, label = JOB_FUNCTIONS[job.job_type]
+            params = dict(job.params or {})
+            db.session.remove()
+
+            with self._lock:
+                self._running.add(job_id)
+            _current.job_id = job_id
+            self.update(job_id, status='running', started_at=datetime.utcnow(), progress=f"{label} başladı")
+            try:
+                func(**params)
+            except Exception as e:
+                logger.exception(f"İş #{job_id} ({label}) başarısız:")
+                db.session.rollback()
+                self.update(job_id, status='failed', error=str(e)[:2000], finished_at=datetime.utcnow())
+            else:
+                self.update(job_id, status='succeeded', finished_at=datetime.utcnow())
+                logger.info(f"İş #{job_id} ({label}) tamamlandı.")
+            finally:
+                _current.job_id = None
+                with self._lock:
+                    self._running.discard(job_id)
+                db.session.remove()
+
+    def _heartbeat(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                with self._app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(
+                            update(SyncJob.__table__)
+                            .where(SyncJob.__table__.c.id.in_(running))
+                            .values(heartbeat_at=datetime.utcnow())
+                        )
+            except Exception as e:
+                logger.error(f"İş heartbeat güncellenemedi: {e}")
+
+
+job_runner = JobRunner()
+
+
+def enqueue_for_request(job_type, params=None):
+    """Endpoint'ler için: oturumdaki kullanıcı adına işi kuyruğa alır."""
+    return job_runner.enqueue(job_type, params=params, user_id=session.get('user_id'))
+
+
+@sync_jobs_bp.route('/jobs/<job_type>', methods=['POST'])
+@roles_required('admin', 'manager')
+def start_job(job_type):
+    if job_type not in JOB_FUNCTIONS:
+        return jsonify({'success': False, 'message': 'Bilinmeyen iş türü.'}), 404
+    try:
+        params = validate_job_params(job_type, request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    job, created = enqueue_for_request(job_type, params)
+    return jsonify({'success': True, 'created': created, 'job': job.to_dict()}), 202
+
+
+@sync_jobs_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@roles_required('admin', 'manager')
+def job_status(job_id):
+    job = db.session.get(SyncJob, job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'İş bulunamadı.'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+
+@sync_jobs_bp.route('/jobs', methods=['GET'])
+@roles_required('admin', 'manager')
+def job_history():
+    query = SyncJob.query
+    job_type = request.args.get('type')
+    if job_type:
+        query = query.filter(SyncJob.job_type == job_type)
+    jobs = query.order_by(SyncJob.created_at.desc()).limit(HISTORY_LIMIT).all()
+    return jsonify({'success': True, 'jobs': [job.to_dict() for job in jobs]})
@@ -0,0 +1,78 @@
+# tests/test_search_routes.py
+# Arama route'larının search_page çağrısı: sorgu (alaka + ikincil sıralama dahil)
+# PostgreSQL diyalektinde derlenir; veritabanı gerekmez, sayfa boş döner.
+#   python -m pytest -q tests
+
+import os
+import sys
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy.dialects import postgresql
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import get_products  # noqa: E402
+import siparisler  # noqa: E402
+import search_index  # noqa: E402
+from models import db  # noqa: E402
+
+
+class EmptyPagination(Pagination):
+    def _query_items(self):
+        return []
+
+    def _query_count(self):
+        return 0
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    calls = []
+
+    def fake_search_page(query, term, trigram_columns=(), vector_column=None, page=1, per_page=50,
+                         ranked=True, order_by=()):
+        query = search_index.apply_search(query, term, trigram_columns, vector_column, ranked)
+        sql = str(query.order_by(*order_by).statement.compile(dialect=postgresql.dialect()))
+        calls.append({'term': term, 'sql': sql, 'page': page, 'per_page': per_page})
+        return EmptyPagination(page=page, per_page=per_page, error_out=False)
+
+    monkeypatch.setattr(get_products, 'search_page', fake_search_page)
+    monkeypatch.setattr(siparisler, 'search_page', fake_search_page)
+    return calls
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__, root_path=ROOT, template_folder=os.path.join(ROOT, 'templates'))
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', SECRET_KEY='test', TESTING=True)
+    db.init_app(app)
+    app.register_blueprint(get_products.get_products_bp)
+    app.register_blueprint(siparisler.siparisler_bp)
+    return app.test_client()
+
+
+def test_search_products_with_term(client, captured):
+    response = client.get('/search_products', query_string={'query': 'ahmet', 'page': 2})
+    assert response.status_code == 200
+    assert len(captured) == 1
+    call = captured[0]
+    assert call['term'] == 'ahmet'
+    assert call['page'] == 2
+    assert call['per_page'] == get_products.SEARCH_PER_PAGE
+    # Alaka sırasından sonra birincil anahtar (barcode) ile sabit sıralama
+    order_clause = call['sql'].rsplit('ORDER BY', 1)[1]
+    assert 'products.barcode' in order_clause
+
+
+def test_siparis_ara_customer_substring(client, captured):
+    response = client.get('/api/siparisler/search', query_string={'q': 'lmaz', 'field': 'musteri'})
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
+    sql = captured[0]['sql']
+    # İsmin ortasındaki parça (Yılmaz -> lmaz) ILIKE ile, kelime önekleri tsvector ile
+    assert 'yeni_siparisler.musteri_adi ILIKE' in sql
+    assert 'yeni_siparisler.musteri_soyadi ILIKE' in sql
+    assert '@@ to_tsquery' in sql
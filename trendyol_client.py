@@ -0,0 +1,334 @@
+# trendyol_client.py
+# Trendyol API'ye giden tüm istekler için ortak istemci.
+# - Tek, uzun ömürlü aiohttp oturumu (keep-alive havuzu); istemcinin kendi olay
+#   döngüsü ayrı bir thread'de çalışır. asyncio.run ile açılıp kapanan döngüler ve
+#   senkron kod aynı havuzu kullanır, her çağrıda TLS el sıkışması yapılmaz.
+# - Süreç geneli token bucket: saniyede RATE_PER_SECOND istek, RATE_BURST'e kadar
+#   birikir. 429 gelirse Retry-After süresince tüm istekler bekletilir.
+# - 429 ve 5xx/zaman aşımlarında jitter'lı üstel geri çekilmeyle yeniden deneme
+#   (5xx ve zaman aşımı yalnızca idempotent metotlarda tekrarlanır).
+# - Uç bazında gecikme/hata metrikleri: trendyol_client.metrics.snapshot(),
+#   GET /api/trendyol-metrics.
+# - İstek bir AdaptiveConcurrency slot'u içinde yapılıyorsa sonuç (gecikme, 429,
+#   zaman aşımı) slot'a bildirilir; sayfalı çekimlerin eşzamanlılığı buna göre ayarlanır.
+#
+# Kullanım:
+#   response = trendyol_client.get(f"suppliers/{SUPPLIER_ID}/orders", params=...)
+#   response = await trendyol_client.get_async(...)
+#   response.status, response.json(), response.text
+
+import os
+import re
+import json
+import time
+import atexit
+import base64
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+
+import aiohttp
+from flask import Blueprint, jsonify
+
+from trendyol_api import API_KEY, API_SECRET, SUPPLIER_ID, BASE_URL
+from login_logout import roles_required
+import adaptive_concurrency
+from adaptive_concurrency import current_slot
+
+logger = logging.getLogger(__name__)
+
+RATE_PER_SECOND = float(os.getenv('TRENDYOL_RATE_PER_SECOND', '10'))
+RATE_BURST = int(os.getenv('TRENDYOL_RATE_BURST', '20'))
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5  # saniye
+BACKOFF_MAX = 30
+REQUEST_TIMEOUT = 30  # saniye, istek başına
+CONNECT_TIMEOUT = 10
+POOL_SIZE = 50
+KEEPALIVE_TIMEOUT = 60
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE'}
+LATENCY_SAMPLES = 500  # uç başına p95 için saklanan son ölçüm
+
+trendyol_client_bp = Blueprint('trendyol_client', __name__)
+
+
+class TrendyolResponse:
+    """Gövdesi okunmuş yanıt; bağlantı havuza hemen geri döner."""
+
+    def __init__(self, status, text, headers, elapsed=None, throttled=0):
+        self.status = status
+        self.text = text
+        self.headers = headers
+        self.elapsed = elapsed  # son denemenin süresi (sn)
+        self.throttled = throttled  # bu istek için alınan 429 sayısı
+
+    @property
+    def status_code(self):
+        return self.status
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    def json(self):
+        return json.loads(self.text) if self.text else None
+
+
+class TokenBucket:
+    """Yalnızca istemci döngüsünde kullanılır; kilit gerekmez."""
+
+    def __init__(self, rate, burst):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def pause(self, seconds):
+        """429 sonrası: süre dolana kadar kimseye token verme."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class EndpointMetrics:
+    """Uç bazında deneme sayısı, hata, 429, yeniden deneme ve gecikme."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, endpoint, status, elapsed, retried=False):
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = {
+                    'requests': 0, 'errors': 0, 'throttled': 0, 'retries': 0,
+                    'total_ms': 0.0, 'max_ms': 0.0, 'last_status': None,
+                    'samples': deque(maxlen=LATENCY_SAMPLES),
+                }
+            elapsed_ms = elapsed * 1000
+            stats['requests'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['samples'].append(elapsed_ms)
+            stats['last_status'] = status
+            if status is None or status >= 400:
+                stats['errors'] += 1
+            if status == 429:
+                stats['throttled'] += 1
+            if retried:
+                stats['retries'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for endpoint, stats in self._stats.items():
+                samples = sorted(stats['samples'])
+                result[endpoint] = {
+                    'requests': stats['requests'],
+                    'errors': stats['errors'],
+                    'throttled': stats['throttled'],
+                    'retries': stats['retries'],
+                    'avg_ms': round(stats['total_ms'] / stats['requests'], 1),
+                    'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+                    'max_ms': round(stats['max_ms'], 1),
+                    'last_status': stats['last_status'],
+                }
+            return result
+
+
+def _endpoint_key(method, path):
+    """Metrik anahtarı: satıcı no ve kimlikler şablonlaşır (suppliers/{id}/claims/{id}/approve)."""
+    path = path.split('?', 1)[0]
+    if path.startswith(BASE_URL):
+        path = path[len(BASE_URL):]
+    path = re.sub(r'/(\d+|[0-9a-fA-F-]{16,})(?=/|$)', '/{id}', '/' + path.lstrip('/'))
+    return f"{method} {path}"
+
+
+def _backoff(attempt):
+    """Full jitter: 0 ile BACKOFF_BASE * 2^attempt arası rastgele."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After') or response.headers.get('retry-after')
+    try:
+        return min(float(value), BACKOFF_MAX) if value else None
+    except ValueError:
+        return None
+
+
+class TrendyolClient:
+    def __init__(self, base_url=BASE_URL, api_key=API_KEY, api_secret=API_SECRET,
+                 rate=RATE_PER_SECOND, burst=RATE_BURST):
+        self.base_url = base_url
+        credentials = base64.b64encode(f"{api_key}:{api_secret}".encode('utf-8')).decode('utf-8')
+        self.headers = {
+            "Authorization": f"Basic {credentials}",
+            "Content-Type": "application/json",
+        }
+        self.metrics = EndpointMetrics()
+        self._rate = rate
+        self._burst = burst
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._session = None
+        self._bucket = None
+
+    def _ensure_loop(self):
+        """İstemci döngüsünü ilk kullanımda (ve fork sonrası yeniden) başlatır."""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='trendyol-client', daemon=True)
+                thread.start()
+                if self._pid is None:
+                    atexit.register(self.close)
+                self._loop, self._thread, self._pid = loop, thread, os.getpid()
+                self._session = None
+                self._bucket = TokenBucket(self._rate, self._burst)
+            return self._loop
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=POOL_SIZE, keepalive_timeout=KEEPALIVE_TIMEOUT, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+            )
+        return self._session
+
+    def _url(self, path):
+        return path if path.startswith('http') else self.base_url + path.lstrip('/')
+
+    async def _send(self, method, path, params, json_body, timeout):
+        """İstemci döngüsünde çalışır: hız sınırı, istek, gerekirse yeniden deneme."""
+        session = self._get_session()
+        url = self._url(path)
+        endpoint = _endpoint_key(method, path)
+        request_timeout = aiohttp.ClientTimeout(total=timeout, connect=CONNECT_TIMEOUT) if timeout else None
+        attempt = 0
+        throttled = 0
+        while True:
+            await self._bucket.acquire()
+            started = time.monotonic()
+            try:
+                async with session.request(method, url, params=params, json=json_body, timeout=request_timeout) as resp:
+                    response = TrendyolResponse(resp.status, await resp.text(), dict(resp.headers),
+                                                time.monotonic() - started, throttled)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Bağlantı kurulamadıysa istek gitmemiştir; POST da tekrarlanabilir
+                retryable = method in IDEMPOTENT_METHODS or isinstance(e, aiohttp.ClientConnectorError)
+                if not retryable or attempt >= MAX_RETRIES:
+                    self.metrics.record(endpoint, None, time.monotonic() - started)
+                    raise
+                self.metrics.record(endpoint, None, time.monotonic() - started, retried=True)
+                delay = _backoff(attempt)
+                logger.warning(f"{endpoint}: {type(e).__name__} {e}, {delay:.1f} sn sonra tekrar ({attempt + 1}/{MAX_RETRIES})")
+            else:
+                retryable = response.status == 429 or (
+                    response.status in RETRY_STATUSES and method in IDEMPOTENT_METHODS
+                )
+                if not retryable or attempt >= MAX_RETRIES:
+                    self.metrics.record(endpoint, response.status, time.monotonic() - started)
+                    return response
+                self.metrics.record(endpoint, response.status, time.monotonic() - started, retried=True)
+                delay = _retry_after(response) or _backoff(attempt)
+                if response.status == 429:
+                    throttled += 1
+                    self._bucket.pause(delay)
+                logger.warning(f"{endpoint}: HTTP {response.status}, {delay:.1f} sn sonra tekrar ({attempt + 1}/{MAX_RETRIES})")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _submit(self, method, path, params, json_body, timeout):
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("TrendyolClient istemci döngüsünün içinden senkron çağrılamaz.")
+        return asyncio.run_coroutine_threadsafe(self._send(method, path, params, json_body, timeout), loop)
+
+    def request(self, method, path, params=None, json=None, timeout=None):
+        """Senkron istek. path BASE_URL'e göredir (tam URL de verilebilir)."""
+        return self._submit(method.upper(), path, params, json, timeout).result()
+
+    async def request_async(self, method, path, params=None, json=None, timeout=None):
+        """Herhangi bir olay döngüsünden beklenebilir; istek istemci döngüsünde yapılır."""
+        slot = current_slot.get()
+        try:
+            response = await asyncio.wrap_future(self._submit(method.upper(), path, params, json, timeout))
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if slot is not None:
+                slot.failed()
+            raise
+        if slot is not None:
+            slot.observe(response.status, response.elapsed, response.throttled)
+        return response
+
+    def get(self, path, params=None, **kwargs):
+        return self.request('GET', path, params=params, **kwargs)
+
+    def put(self, path, json=None, **kwargs):
+        return self.request('PUT', path, json=json, **kwargs)
+
+    def post(self, path, json=None, **kwargs):
+        return self.request('POST', path, json=json, **kwargs)
+
+    async def get_async(self, path, params=None, **kwargs):
+        return await self.request_async('GET', path, params=params, **kwargs)
+
+    async def put_async(self, path, json=None, **kwargs):
+        return await self.request_async('PUT', path, json=json, **kwargs)
+
+    async def post_async(self, path, json=None, **kwargs):
+        return await self.request_async('POST', path, json=json, **kwargs)
+
+    def close(self):
+        with self._lock:
+            loop, session = self._loop, self._session
+            if loop is None or self._pid != os.getpid():
+                return
+            try:
+                if session is not None and not session.closed:
+                    asyncio.run_coroutine_threadsafe(session.close(), loop).result(timeout=5)
+            except Exception as e:
+                logger.warning(f"Trendyol oturumu kapatılamadı: {e}")
+            loop.call_soon_threadsafe(loop.stop)
+            self._loop = self._session = None
+
+
+trendyol_client = TrendyolClient()
+
+
+def supplier_path(suffix=''):
+    """suppliers/<SUPPLIER_ID>/<suffix>"""
+    return f"suppliers/{SUPPLIER_ID}/{suffix.lstrip('/')}" if suffix else f"suppliers/{SUPPLIER_ID}"
+
+
+@trendyol_client_bp.route('/api/trendyol-metrics', methods=['GET'])
+@roles_required('admin', 'manager')
+def trendyol_metrics():
+    return jsonify({
+        'success': True,
+        'endpoints': trendyol_client.metrics.snapshot(),
+        'concurrency': adaptive_concurrency.snapshot(),
+    })
@@ -2,13 +2,13 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from datetime import datetime
 import traceback
 import json
-import base64
-import requests
 
 # Yeni tablolar (Created, Picking vs.) ve DB objesi
 from models import db, OrderCreated, OrderPicking, Product
-# Trendyol API kimlikleri ve BASE_URL
-from trendyol_api import API_KEY, API_SECRET, SUPPLIER_ID, BASE_URL
+from order_transition import transition_orders
+# Trendyol API istemcisi (ortak bağlantı havuzu, hız sınırı, yeniden deneme)
+from trendyol_api import SUPPLIER_ID
+from trendyol_client import trendyol_client, supplier_path
 
 update_service_bp = Blueprint('update_service', __name__)
 
@@ -21,26 +21,17 @@ def update_order_status_to_picking(supplier_id, shipment_package_id, lines):
     lines: [{ "lineId": <int>, "quantity": <int> }, ...]
     """
     try:
-        url = f"{BASE_URL}suppliers/{supplier_id}/shipment-packages/{shipment_package_id}"
-
-        credentials = f"{API_KEY}:{API_SECRET}"
-        encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-
-        headers = {
-            "Authorization": f"Basic {encoded_credentials}",
-            "Content-Type": "application/json"
-        }
+        path = f"suppliers/{supplier_id}/shipment-packages/{shipment_package_id}"
 
         payload = {
             "lines": lines,
             "params": {},
             "status": "Picking"
         }
-        print(f"PUT {url}")
-        print(f"Headers: {headers}")
+        print(f"PUT {path}")
         print(f"Payload: {json.dumps(payload, ensure_ascii=False)}")
 
-        response = requests.put(url, headers=headers, data=json.dumps(payload), timeout=30)
+        response = trendyol_client.put(path, json=payload)
 
         print(f"API yanıtı: Status Code={response.status_code}, Response Text={response.text}")
 
@@ -194,24 +185,17 @@ def confirm_packing():
             else:
                 flash(f"Trendyol API güncellemesi sırasında hata. Paket ID: {sp_id}", 'danger')
 
-        # 7) Veritabanı tarafında OrderCreated -> OrderPicking taşı
-        # (order_created kaydını al, OrderPicking'e ekle, OrderCreated'tan sil)
-        data = order_created.__dict__.copy()
-        data.pop('_sa_instance_state', None)
-
-        # Kolonları, OrderPicking tablosunda var olanlarla filtreleyelim
-        picking_cols = {c.name for c in OrderPicking.__table__.columns}
-        data = {k: v for k, v in data.items() if k in picking_cols}
-
-        # Yeni picking kaydı oluştur
-        new_picking_record = OrderPicking(**data)
-        # picking tablosunda ek kolonlar varsa set edebilirsiniz:
-        new_picking_record.picking_start_time = datetime.utcnow()
-
-        db.session.add(new_picking_record)
-        db.session.delete(order_created)
+        # 7) Veritabanı tarafında OrderCreated -> OrderPicking taşı (tek SQL: DELETE ... RETURNING + INSERT)
+        db.session.expunge(order_created)
+        moved = transition_orders(
+            [order_number], OrderCreated, OrderPicking,
+            extra_values={'picking_start_time': datetime.utcnow()}
+        )
         db.session.commit()
-        print(f"Taşıma tamam: OrderCreated -> OrderPicking. Order num: {order_number}")
+        if moved:
+            print(f"Taşıma tamam: OrderCreated -> OrderPicking. Order num: {order_number}")
+        else:
+            print(f"Sipariş başka bir işlemde taşınmış: {order_number}")
 
         # 8) Bir sonraki created siparişi bul
         next_created = OrderCreated.query.order_by(OrderCreated.order_date).first()
@@ -236,16 +220,7 @@ def fetch_orders_from_api():
     """
     Trendyol API'den siparişleri çeker (basit örnek).
     """
-    auth_str = f"{API_KEY}:{API_SECRET}"
-    b64_auth_str = base64.b64encode(auth_str.encode()).decode('utf-8')
-
-    url = f"{BASE_URL}suppliers/{SUPPLIER_ID}/orders"
-    headers = {
-        "Authorization": f"Basic {b64_auth_str}",
-        "Content-Type": "application/json"
-    }
-
-    response = requests.get(url, headers=headers)
+    response = trendyol_client.get(supplier_path('orders'))
     if response.status_code == 200:
         return response.json()
     else:
@@ -257,11 +232,7 @@ def update_package_to_picking(supplier_id, package_id, line_id, quantity):
     Tek bir lineId ve quantity için (daha eski örnek). Yukarıda 'update_order_status_to_picking' ile benzer işler yapıyor.
     Bu fonksiyon belki artık kullanılmayabilir, ama isterseniz koruyun.
     """
-    url = f"{BASE_URL}suppliers/{supplier_id}/shipment-packages/{package_id}"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Basic {base64.b64encode(f'{API_KEY}:{API_SECRET}'.encode()).decode()}"
-    }
+    path = f"suppliers/{supplier_id}/shipment-packages/{package_id}"
 
     payload = {
         "lines": [{
@@ -272,13 +243,12 @@ def update_package_to_picking(supplier_id, package_id, line_id, quantity):
         "status": "Picking"
     }
 
-    print(f"Sending API request to URL: {url}")
-    print(f"Headers: {headers}")
+    print(f"Sending API request to: {path}")
     print(f"Payload: {payload}")
 
-    response = requests.put(url, headers=headers, json=payload)
+    response = trendyol_client.put(path, json=payload)
 
     if response.status_code == 200:
-        print(f"Paket başarıyla Picking statüsüne güncellendi. Yanıt: {response.json()}")
+        print(f"Paket başarıyla Picking statüsüne güncellendi. Yanıt: {response.text}")
     else:
         print(f"Paket güncellenemedi! Hata kodu: {response.status_code}, Yanıt: {response.text}")
@@ -0,0 +1,74 @@
+# user_cache.py
+# Kimlik/rol bilgisi için süreç içi TTL + LRU önbellek.
+# load_user, roles_required ve check_role her istekte users tablosuna gitmez;
+# kullanıcıyı değiştiren işlemler (onay, rol, silme, TOTP) invalidate_user çağırır.
+# Önbellek süreç başınadır; diğer worker'larda değişiklik en geç USER_CACHE_TTL sonra görülür.
+
+import time
+import threading
+from collections import OrderedDict
+from flask_login import UserMixin
+
+from models import db, User
+
+USER_CACHE_TTL = 300  # saniye
+USER_CACHE_MAX = 1024
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+class CachedUser(UserMixin):
+    """Oturumdan bağımsız, salt okunur kullanıcı özeti (parola ve TOTP sırrı tutulmaz)."""
+
+    __slots__ = ('id', 'username', 'first_name', 'last_name', 'email', 'role', 'status', 'totp_confirmed')
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.first_name = user.first_name
+        self.last_name = user.last_name
+        self.email = user.email
+        self.role = user.role
+        self.status = user.status
+        self.totp_confirmed = user.totp_confirmed
+
+    @property
+    def is_active(self):
+        return self.status == 'active'
+
+
+def get_cached_user(user_id):
+    """user_id için CachedUser; kullanıcı yoksa None. Önbellekte değilse tek sorgu."""
+    if user_id is None:
+        return None
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(user_id)
+        if hit and hit[1] > now:
+            _cache.move_to_end(user_id)
+            return hit[0]
+
+    user = db.session.get(User, user_id)
+    snapshot = CachedUser(user) if user else None
+
+    with _lock:
+        _cache[user_id] = (snapshot, now + USER_CACHE_TTL)
+        _cache.move_to_end(user_id)
+        while len(_cache) > USER_CACHE_MAX:
+            _cache.popitem(last=False)
+    return snapshot
+
+
+def invalidate_user(user_id=None):
+    """Tek kullanıcıyı (veya user_id verilmezse hepsini) önbellekten çıkarır."""
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(int(user_id), None)
@@ -0,0 +1,208 @@
+# user_log_partitions.py
+# user_logs: "timestamp" üzerinde aylık RANGE partition'lı tablo, details JSONB.
+# - ensure_user_log_partitions: açılışta tabloyu kurar; eski (partition'sız, Text details)
+#   tabloyu bir kereye mahsus taşır ve önümüzdeki ayların partition'larını açar.
+# - maintain_user_logs: günlük iş; yeni ayları açar, saklama süresini geçen ayları
+#   user_log_daily'ye özetleyip partition'ı düşürür (DELETE yok, DROP TABLE).
+
+import os
+import logging
+from datetime import date
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+RETENTION_MONTHS = int(os.getenv('USER_LOG_RETENTION_MONTHS', '12'))
+MONTHS_AHEAD = 2
+ADVISORY_LOCK_KEY = 482170  # birden fazla worker aynı anda taşıma yapmasın
+
+CREATE_PARENT_SQL = """
+CREATE TABLE user_logs (
+    id BIGSERIAL NOT NULL,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    action VARCHAR(255) NOT NULL,
+    details JSONB,
+    "timestamp" TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    ip_address VARCHAR(45),
+    page_url VARCHAR(255),
+    PRIMARY KEY (id, "timestamp")
+) PARTITION BY RANGE ("timestamp")
+"""
+
+# Partitioned index'ler; yeni partition'lara otomatik uygulanır
+INDEX_SQL = [
+    'CREATE INDEX IF NOT EXISTS ix_user_logs_timestamp ON user_logs ("timestamp" DESC)',
+    'CREATE INDEX IF NOT EXISTS ix_user_logs_user_id_timestamp ON user_logs (user_id, "timestamp" DESC)',
+    # details @> '{"Sayfa": "Ürün Listesi"}' gibi anahtar filtreleri için
+    'CREATE INDEX IF NOT EXISTS ix_user_logs_details ON user_logs USING gin (details jsonb_path_ops)',
+]
+
+# Eski Text details içinde JSON olmayan değerler string olarak saklanır
+TRY_JSONB_SQL = """
+CREATE OR REPLACE FUNCTION user_logs_try_jsonb(value text) RETURNS jsonb AS $$
+BEGIN
+    RETURN value::jsonb;
+EXCEPTION WHEN others THEN
+    RETURN to_jsonb(value);
+END;
+$$ LANGUAGE plpgsql IMMUTABLE
+"""
+
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + (month.month - 1) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"user_logs_{month.year:04d}_{month.month:02d}"
+
+
+def _relkind(conn, name):
+    return conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {'name': name}
+    ).scalar()
+
+
+def create_month_partition(conn, month):
+    """
+    month ayının partition'ını açar (varsa dokunmaz). O aya ait satırlar
+    default partition'a düşmüşse önce yeni partition'a taşınır.
+    """
+    name = partition_name(month)
+    if _relkind(conn, name):
+        return False
+    start, end = month, _add_months(month, 1)
+    params = {'start': start, 'end': end}
+    conn.execute(text(f"CREATE TABLE {name} (LIKE user_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM user_logs_default "
+        f"WHERE \"timestamp\" >= :start AND \"timestamp\" < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), params)
+    conn.execute(text(
+        f"ALTER TABLE user_logs ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    logger.info(f"{name} partition'ı oluşturuldu.")
+    return True
+
+
+def _migrate_legacy_table(conn):
+    """Partition'sız eski user_logs'u yeni yapıya kopyalar ve siler."""
+    logger.info("user_logs partition'lı yapıya taşınıyor...")
+    conn.execute(text("ALTER TABLE user_logs RENAME TO user_logs_legacy"))
+    # İsimler şema genelinde tekil; yeni tablo aynı isimleri kullanacak
+    conn.execute(text("ALTER SEQUENCE IF EXISTS user_logs_id_seq RENAME TO user_logs_legacy_id_seq"))
+    conn.execute(text("ALTER INDEX IF EXISTS user_logs_pkey RENAME TO user_logs_legacy_pkey"))
+    for index_name in ('trgm_user_logs_action', 'trgm_user_logs_details'):
+        conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+
+    bounds = conn.execute(text(
+        'SELECT min("timestamp"), max("timestamp") FROM user_logs_legacy'
+    )).first()
+
+    _create_parent(conn)
+    if bounds and bounds[0]:
+        month = _month_start(bounds[0].date())
+        last = _month_start(bounds[1].date())
+        while month <= last:
+            create_month_partition(conn, month)
+            month = _add_months(month, 1)
+
+    conn.execute(text(TRY_JSONB_SQL))
+    copied = conn.execute(text(
+        'INSERT INTO user_logs (id, user_id, action, details, "timestamp", ip_address, page_url) '
+        'SELECT id, user_id, action, user_logs_try_jsonb(details), '
+        'coalesce("timestamp", \'1970-01-01\'), ip_address, page_url FROM user_logs_legacy'
+    )).rowcount
+    conn.execute(text(
+        "SELECT setval('user_logs_id_seq', (SELECT coalesce(max(id), 0) + 1 FROM user_logs), false)"
+    ))
+    conn.execute(text("DROP TABLE user_logs_legacy"))
+    logger.info(f"user_logs taşındı: {copied} kayıt.")
+
+
+def _create_parent(conn):
+    conn.execute(text(CREATE_PARENT_SQL))
+    conn.execute(text("CREATE TABLE user_logs_default PARTITION OF user_logs DEFAULT"))
+    for sql in INDEX_SQL:
+        conn.execute(text(sql))
+
+
+def ensure_user_log_partitions(engine):
+    """
+    Uygulama açılışında çağrılır: tablo yoksa kurar, eski tabloyu taşır,
+    bu ay ve önümüzdeki MONTHS_AHEAD ayın partition'larını açar.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': ADVISORY_LOCK_KEY})
+        kind = _relkind(conn, 'user_logs')
+        if kind is None:
+            _create_parent(conn)
+        elif kind != 'p':
+            _migrate_legacy_table(conn)
+        else:
+            for sql in INDEX_SQL:
+                conn.execute(text(sql))
+
+        current = _month_start(date.today())
+        for offset in range(MONTHS_AHEAD + 1):
+            create_month_partition(conn, _add_months(current, offset))
+
+
+def _existing_partitions(conn):
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'user_logs'"
+    ))
+    partitions = {}
+    for (name,) in rows:
+        try:
+            _, _, year, month = name.split('_')
+            partitions[date(int(year), int(month), 1)] = name
+        except ValueError:
+            continue  # user_logs_default
+    return partitions
+
+
+def maintain_user_logs(engine, retention_months=RETENTION_MONTHS):
+    """
+    Günlük bakım: gelecek ayların partition'larını açar; saklama süresini geçen
+    her ayı user_log_daily'ye (gün, kullanıcı, aksiyon, adet) özetleyip düşürür.
+    Özet ve DROP aynı transaction'da yapılır.
+    """
+    current = _month_start(date.today())
+    cutoff = _add_months(current, -retention_months)
+
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': ADVISORY_LOCK_KEY})
+        for offset in range(MONTHS_AHEAD + 1):
+            create_month_partition(conn, _add_months(current, offset))
+
+    with engine.connect() as conn:
+        partitions = _existing_partitions(conn)
+
+    for month, name in sorted(partitions.items()):
+        if month >= cutoff:
+            continue
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': ADVISORY_LOCK_KEY})
+            if not _relkind(conn, name):
+                continue  # başka bir worker düşürdü
+            conn.execute(text(
+                f"INSERT INTO user_log_daily (day, user_id, action, event_count) "
+                f"SELECT \"timestamp\"::date, user_id, action, count(*) FROM {name} "
+                f"GROUP BY 1, 2, 3 "
+                f"ON CONFLICT (day, user_id, action) DO UPDATE "
+                f"SET event_count = user_log_daily.event_count + EXCLUDED.event_count"
+            ))
+            conn.execute(text(f"ALTER TABLE user_logs DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        logger.info(f"{name} özetlendi ve silindi (saklama: {retention_months} ay).")
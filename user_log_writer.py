@@ -0,0 +1,127 @@
+# user_log_writer.py
+# Kullanıcı loglarını istek akışından çıkarır: log_user_action olayı sınırlı bir
+# kuyruğa bırakır, arka plandaki yazıcı iş parçacığı her BATCH_SIZE olayda veya
+# FLUSH_INTERVAL saniyede bir tek çok satırlı INSERT ile yazar.
+# Kuyruk doluysa olay düşürülür ve sayılır (sayfa hiçbir zaman beklemez).
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from models import db, UserLog
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 10000
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 0.5  # saniye
+
+
+class UserLogWriter:
+    def __init__(self, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._engine = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self, app):
+        """Uygulama açılışında bir kez çağrılır."""
+        if self._thread is not None:
+            return
+        with app.app_context():
+            self._engine = db.engine
+        self._thread = threading.Thread(target=self._run, name='user-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def stop(self, timeout=5):
+        """Kuyrukta kalanları yazıp iş parçacığını durdurur."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, row):
+        """row: UserLog kolon sözlüğü. Bloklamaz; kuyruk doluysa olay düşer."""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            # Her olayda log basmamak için seyrek uyar
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"Kullanıcı log kuyruğu dolu, {dropped} olay düşürüldü.")
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'pending': self._queue.qsize(),
+            }
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._collect_batch()
+            if batch:
+                self._write(batch)
+
+    def _collect_batch(self):
+        """BATCH_SIZE olay toplanana ya da FLUSH_INTERVAL dolana kadar bekler."""
+        batch = []
+        deadline = time.monotonic() + self._flush_interval
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        table = UserLog.__table__
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(table.insert().values(batch))
+            written, failed = len(batch), 0
+        except Exception as e:
+            # Tek bozuk satır (ör. silinmiş kullanıcı) tüm grubu kaybettirmesin
+            logger.error(f"Kullanıcı logları toplu yazılamadı, tek tek deneniyor: {e}")
+            written = failed = 0
+            for row in batch:
+                try:
+                    with self._engine.begin() as conn:
+                        conn.execute(table.insert().values(row))
+                    written += 1
+                except Exception as row_error:
+                    failed += 1
+                    logger.error(f"Log kaydedilemedi: {row_error}")
+        with self._lock:
+            self.written += written
+            self.failed += failed
+
+
+user_log_writer = UserLogWriter()
@@ -2,6 +2,9 @@ from flask import Blueprint, render_template, request, session
 from flask_login import current_user
 from models import db, UserLog, User
 from login_logout import roles_required
+from sqlalchemy import cast, Text
+from search_index import search_filter, search_page
+from user_log_writer import user_log_writer
 from datetime import datetime, timedelta
 import json
 import urllib.parse
@@ -54,6 +57,18 @@ def extract_page_from_referrer(referrer: str) -> str:
         return PAGE_NAME_MAP.get(page, 'Doğrudan Giriş') if page else 'Doğrudan Giriş'
     return 'Doğrudan Giriş'
 
+def _details_dict(details):
+    """details JSONB; taşınan eski kayıtlarda JSON olmayan metin string olarak gelir."""
+    if isinstance(details, dict):
+        return details
+    if isinstance(details, str):
+        try:
+            parsed = json.loads(details)
+            return parsed if isinstance(parsed, dict) else {'Ek Detaylar': details}
+        except ValueError:
+            return {'Ek Detaylar': details}
+    return {}
+
 def log_user_action(action: str, details: dict = None, force_log: bool = False, log_level: str = "INFO") -> None:
     """
     Aksiyon: 'UPDATE: product_list' vb.
@@ -96,15 +111,27 @@ def log_user_action(action: str, details: dict = None, force_log: bool = False,
             else:
                 extended_details['Ek Detaylar'] = details
 
+        if user_id is None:
+            # user_id zorunlu; oturumsuz istekler zaten kaydedilemiyordu
+            return
+
+        row = {
+            'user_id': user_id,
+            'action': action,  # DB'de ham halde saklanır, 'UPDATE: product_list'
+            'details': extended_details,  # JSONB
+            'timestamp': datetime.utcnow(),
+            'ip_address': request.remote_addr,
+            'page_url': request.url,
+        }
+
+        # Normalde arka plan yazıcısına bırakılır (istek INSERT beklemez)
+        if user_log_writer.running:
+            user_log_writer.submit(row)
+            return
+
+        # Yazıcıyla aynı şekilde Core INSERT; id partition'lı tablonun BIGSERIAL'ından gelir
         try:
-            new_log = UserLog(
-                user_id=user_id,
-                action=action,  # DB'de ham halde saklanır, 'UPDATE: product_list'
-                details=json.dumps(extended_details, ensure_ascii=False),
-                ip_address=request.remote_addr,
-                page_url=request.url
-            )
-            db.session.add(new_log)
+            db.session.execute(UserLog.__table__.insert().values(row))
             db.session.commit()
         except Exception as e:
             db.session.rollback()
@@ -127,9 +154,7 @@ def view_logs():
     if user_id:
         query = query.filter(UserLog.user_id == user_id)
     if action_filter:
-        query = query.filter(UserLog.action.ilike(f'%{action_filter}%'))
-    if keyword:
-        query = query.filter(UserLog.details.ilike(f'%{keyword}%'))
+        query = query.filter(search_filter(action_filter, [UserLog.action]))
 
     try:
         if start_date_str:
@@ -145,10 +170,12 @@ def view_logs():
     except ValueError as ve:
         logging.error(f"Bitiş tarihi hatalı: {ve}")
 
-    logs = query.order_by(UserLog.timestamp.desc()).paginate(page=page, per_page=per_page)
+    # Anahtar kelime detaylarda aranır; loglar alakaya değil zamana göre listelenir
+    logs = search_page(query, keyword, [cast(UserLog.details, Text)], page=page, per_page=per_page,
+                       ranked=False, order_by=(UserLog.timestamp.desc(),))
     for log in logs.items:
         try:
-            log.details_dict = json.loads(log.details) if log.details else {}
+            log.details_dict = _details_dict(log.details)
         except Exception as e:
             log.details_dict = {}
             logging.error(f"Log detayları yüklenemedi: {e}")
@@ -157,34 +184,39 @@ def view_logs():
     return render_template('user_logs.html', logs=logs, users=users)
 
 
+import os
+import csv
 import io
-import pandas as pd
-from flask import send_file
+import zlib
+import tempfile
+import xlsxwriter
+from flask import Response, send_file, stream_with_context
+from sqlalchemy import func
 
-@user_logs_bp.route('/user-logs/export', methods=['GET'])
-@roles_required('admin', 'manager')
-def export_logs():
-    """
-    Kullanıcı loglarını filtreye göre Excel'e aktaran endpoint.
-    """
+EXPORT_FETCH_SIZE = 1000
+EXPORT_BASE_COLUMNS = ["Tarih", "Kullanıcı", "IP", "Ham Aksiyon", "Açıklama", "Sayfa"]
+XLSX_MAX_ROWS = 1048576  # Excel çalışma sayfası satır sınırı (başlık dahil)
+
+
+def _export_query():
+    """Filtreli log sorgusu; ORM nesnesi yerine sadece gereken kolonlar."""
     user_id = request.args.get('user_id', type=int)
     action_filter = request.args.get('action')
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
     keyword = request.args.get('keyword', type=str)
 
-    query = UserLog.query.join(User)
+    query = db.session.query(UserLog).join(User)
 
     # Filtreler
     if user_id:
         query = query.filter(UserLog.user_id == user_id)
     if action_filter:
-        query = query.filter(UserLog.action.ilike(f'%{action_filter}%'))
+        query = query.filter(search_filter(action_filter, [UserLog.action]))
     if keyword:
-        query = query.filter(UserLog.details.ilike(f'%{keyword}%'))
+        query = query.filter(search_filter(keyword, [cast(UserLog.details, Text)]))
 
     # Tarih
-    from datetime import datetime, timedelta
     try:
         if start_date_str:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
@@ -199,33 +231,105 @@ def export_logs():
     except ValueError:
         pass
 
-    # Veriyi çek
-    logs = query.order_by(UserLog.timestamp.desc()).all()
+    return query
+
+
+def _export_detail_keys(query):
+    """Ek kolonlar: filtreye uyan loglardaki details anahtarları (SQL'de, satırlar belleğe alınmadan)."""
+    keys = query.with_entities(func.jsonb_object_keys(UserLog.details)) \
+        .filter(func.jsonb_typeof(UserLog.details) == 'object') \
+        .distinct().all()
+    return sorted(k for (k,) in keys if k not in ('İşlem', 'Sayfa'))
+
+
+def _export_rows(query, detail_keys):
+    """Sunucu taraflı imleçle EXPORT_FETCH_SIZE'lık parçalar halinde satır üretir."""
+    rows = query.with_entities(
+        UserLog.timestamp, User.username, UserLog.ip_address, UserLog.action, UserLog.details
+    ).order_by(UserLog.timestamp.desc()).yield_per(EXPORT_FETCH_SIZE)
+
+    for timestamp, username, ip_address, action, details in rows:
+        details_dict = _details_dict(details)
+        yield [
+            timestamp.strftime('%Y-%m-%d %H:%M:%S') if timestamp else '',
+            username,
+            ip_address,
+            action,
+            details_dict.get('İşlem', ''),
+            details_dict.get('Sayfa', ''),
+        ] + [str(details_dict[k]) if k in details_dict else '' for k in detail_keys]
+
+
+def _stream_csv(query, detail_keys, compress):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    gzipper = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip başlığı
+
+    def flush():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return gzipper.compress(data) if gzipper else data
+
+    buffer.write('\ufeff')  # Excel'in UTF-8'i tanıması için BOM
+    writer.writerow(EXPORT_BASE_COLUMNS + detail_keys)
+    for i, row in enumerate(_export_rows(query, detail_keys), 1):
+        writer.writerow(row)
+        if i % EXPORT_FETCH_SIZE == 0:
+            yield flush()
+    yield flush()
+    if gzipper:
+        yield gzipper.flush()
 
-    # DataFrame'e çevir
-    data = []
-    for log in logs:
-        try:
-            details_dict = json.loads(log.details) if log.details else {}
-        except:
-            details_dict = {}
-
-        data.append({
-            "Tarih": log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            "Kullanıcı": log.user.username,
-            "IP": log.ip_address,
-            "Ham Aksiyon": log.action,
-            "Açıklama": details_dict.get('İşlem', ''),
-            "Sayfa": details_dict.get('Sayfa', ''),
-            **{k: str(v) for k, v in details_dict.items()
-               if k not in ['İşlem','Sayfa']}
-        })
-
-    # Excel oluştur
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df = pd.DataFrame(data)
-        df.to_excel(writer, index=False, sheet_name='Loglar')
-
-    output.seek(0)
-    return send_file(output, download_name='kullanici_loglari.xlsx', as_attachment=True)
+
+@user_logs_bp.route('/user-logs/export', methods=['GET'])
+@roles_required('admin', 'manager')
+def export_logs():
+    """
+    Kullanıcı loglarını filtreye göre dışa aktaran endpoint.
+    format=xlsx (varsayılan): xlsxwriter constant_memory ile geçici dosyaya satır satır yazılır.
+    format=csv: doğrudan yanıta akıtılır; gzip=1 ile sıkıştırılır.
+    Her iki durumda da bellek kullanımı satır sayısından bağımsızdır.
+    Excel'in satır sınırını (XLSX_MAX_ROWS) aşan aktarımlar gzip'li CSV olarak verilir.
+    """
+    query = _export_query()
+    detail_keys = _export_detail_keys(query)
+    export_format = request.args.get('format', 'xlsx')
+
+    headers = {}
+    if export_format != 'csv':
+        row_count = query.order_by(None).count()
+        if row_count > XLSX_MAX_ROWS - 1:  # ilk satır başlık
+            logging.warning(f"Log aktarımı {row_count} satır, Excel sınırını aşıyor; gzip'li CSV veriliyor.")
+            export_format = 'csv'
+            headers['X-Export-Fallback'] = f'xlsx-row-limit; rows={row_count}'
+
+    if export_format == 'csv':
+        compress = request.args.get('gzip') == '1' or bool(headers)
+        filename = 'kullanici_loglari.csv' + ('.gz' if compress else '')
+        headers['Content-Disposition'] = f'attachment; filename={filename}'
+        return Response(
+            stream_with_context(_stream_csv(query, detail_keys, compress)),
+            mimetype='application/gzip' if compress else 'text/csv; charset=utf-8',
+            headers=headers
+        )
+
+    # Excel: constant_memory satırları sırayla diske yazar (xlsx bir zip; yanıta ancak bitince akar)
+    tmp = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False)
+    tmp.close()
+    try:
+        workbook = xlsxwriter.Workbook(tmp.name, {'constant_memory': True})
+        worksheet = workbook.add_worksheet('Loglar')
+        worksheet.write_row(0, 0, EXPORT_BASE_COLUMNS + detail_keys)
+        for row_index, row in enumerate(_export_rows(query, detail_keys), 1):
+            # Sayımdan sonra eklenen loglar sınırı aşarsa sessizce kesilmesin
+            if worksheet.write_row(row_index, 0, row) == -1:
+                raise OverflowError(f"Excel satır sınırı aşıldı ({XLSX_MAX_ROWS}); format=csv kullanın.")
+        workbook.close()
+
+        response = send_file(tmp.name, download_name='kullanici_loglari.xlsx', as_attachment=True)
+    except Exception:
+        os.unlink(tmp.name)
+        raise
+    response.call_on_close(lambda: os.unlink(tmp.name))
+    return response
@@ -0,0 +1,56 @@
+# worker_pool.py
+# CPU'ya bağlı işler (görsel türevleri, barkod/etiket çizimi, toplu PDF sayfaları)
+# için süreç genelinde tek ProcessPoolExecutor.
+# - Havuz ilk submit'te açılır ve image_derivatives, render_cache, label_pdf
+#   arasında paylaşılır; toplam en fazla MAX_WORKERS işçi süreç olur.
+# - Başlatma yöntemi forkserver: çok thread'li sunucudan (werkzeug, APScheduler,
+#   log yazıcı, iş havuzu) fork edilen çocuk başka thread'in tuttuğu bir kilidi
+#   devralıp kilitlenebilir. forkserver süreci yalnızca PRELOAD modüllerini yükler;
+#   ana modül (python3 app.py) çocuklarda '__mp_main__' olarak içe aktarılır, app.py
+#   bu durumda kurulum ve arka plan servislerini atlar.
+# - Süreç kapanırken havuz kapatılır (atexit).
+
+import os
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+START_METHOD = 'forkserver'
+PRELOAD = ['image_derivatives', 'render_cache', 'label_pdf']  # işçi fonksiyonlarının modülleri
+
+
+class WorkerPool:
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._max_workers = max_workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            # gunicorn vb. sonradan fork ederse çocuk kendi havuzunu açar
+            if self._executor is None or self._pid != os.getpid():
+                context = multiprocessing.get_context(START_METHOD)
+                context.set_forkserver_preload(PRELOAD)
+                self._executor = ProcessPoolExecutor(max_workers=self._max_workers, mp_context=context)
+                self._pid = os.getpid()
+                logger.info(f"İşçi havuzu açıldı: {self._max_workers} süreç ({START_METHOD})")
+            return self._executor
+
+    def submit(self, func, *args, **kwargs):
+        return self._pool().submit(func, *args, **kwargs)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+worker_pool = WorkerPool()
+atexit.register(worker_pool.shutdown)